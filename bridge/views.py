@@ -33,7 +33,8 @@ def broadcast_account(account:MT5Account):
         }
         p.produce(
             "account_challenge_initiate", 
-            json.dumps(data, cls=EnhancedJSONEncoder).encode("utf-8")
+            json.dumps(data, cls=EnhancedJSONEncoder).encode("utf-8"),
+            key=str(account.login)
         )
     
     elif competition:
@@ -44,7 +45,8 @@ def broadcast_account(account:MT5Account):
         }
         p.produce(
             "account_competition_initiate", 
-            json.dumps(data, cls=EnhancedJSONEncoder).encode("utf-8")
+            json.dumps(data, cls=EnhancedJSONEncoder).encode("utf-8"),
+            key=str(account.login)
         )
     p.flush()
 
@@ -63,7 +65,8 @@ def broadcast_account_with_challenge(account:MT5Account, challenge):
         }
         p.produce(
             "account_challenge_initiate", 
-            json.dumps(data, cls=EnhancedJSONEncoder).encode("utf-8")
+            json.dumps(data, cls=EnhancedJSONEncoder).encode("utf-8"),
+            key=str(account.login)
         )
     p.flush()
 
@@ -76,7 +79,8 @@ def broadcast_account_with_competition(account:MT5Account, competition):
         }
         p.produce(
             "account_competition_initiate", 
-            json.dumps(data, cls=EnhancedJSONEncoder).encode("utf-8")
+            json.dumps(data, cls=EnhancedJSONEncoder).encode("utf-8"),
+            key=str(account.login)
         )
     p.flush()
 
@@ -312,4 +312,36 @@ MT5ACCOUNT_PASSWORD_KEY=os.getenv('MT5ACCOUNT_PASSWORD_KEY')
 ADMIN_EMAILS = json.loads(os.getenv("ADMIN_EMAILS", "[]"))
 
 LOGIN_START = os.getenv("LOGIN_START", 4000)
-LOGIN_END = os.getenv("LOGIN_END", 4500)
\ No newline at end of file
+LOGIN_END = os.getenv("LOGIN_END", 4500)
+#In-memory monitoring
+MONITOR_COLUMNAR_REVALUATION = os.getenv("MONITOR_COLUMNAR_REVALUATION", "false").lower() == "true"
+# Max messages per consume() call and how long (seconds) to wait filling a batch
+MONITOR_CONSUME_BATCH_SIZE = int(os.getenv("MONITOR_CONSUME_BATCH_SIZE", 500))
+MONITOR_CONSUME_WAIT = float(os.getenv("MONITOR_CONSUME_WAIT", 0.1))
+# Run several monitor instances, each owning the logins of its assigned account partitions
+MONITOR_SHARDED = os.getenv("MONITOR_SHARDED", "false").lower() == "true"
+# Local state snapshot for fast restarts (disabled when empty), written every N seconds
+MONITOR_SNAPSHOT_PATH = os.getenv("MONITOR_SNAPSHOT_PATH", "")
+MONITOR_SNAPSHOT_INTERVAL = float(os.getenv("MONITOR_SNAPSHOT_INTERVAL", 60))
+# Minimum deals kept per login, challenges with larger rule windows keep more
+MONITOR_DEAL_RETENTION = int(os.getenv("MONITOR_DEAL_RETENTION", 200))
+# Competition metrics are written to Redis in one pipeline every N seconds or once this many logins are dirty
+MONITOR_METRICS_FLUSH_INTERVAL = float(os.getenv("MONITOR_METRICS_FLUSH_INTERVAL", 1.0))
+MONITOR_METRICS_MAX_PENDING = int(os.getenv("MONITOR_METRICS_MAX_PENDING", 500))
+# WebSocket messages waiting in the broadcaster (latest per group), oldest dropped beyond this
+MONITOR_BROADCAST_MAX_PENDING = int(os.getenv("MONITOR_BROADCAST_MAX_PENDING", 10000))
+# Park single-symbol accounts in a trigger-price index, ticks skip them until a limit or watermark is reached
+MONITOR_BREACH_INDEX = os.getenv("MONITOR_BREACH_INDEX", "false").lower() == "true"
+# Evaluators run by the monitoring engine on the shared account state (challenge, competition, rating)
+MONITOR_EVALUATORS = os.getenv("MONITOR_EVALUATORS", "challenge,competition")
+# Seconds between two account rating runs of the rating evaluator
+MONITOR_RATING_INTERVAL = float(os.getenv("MONITOR_RATING_INTERVAL", 3600))
+# Prometheus /metrics port of the rule engine and of run_bridge (0 leaves metrics off), needs prometheus_client
+MONITOR_METRICS_PORT = int(os.getenv("MONITOR_METRICS_PORT", 0))
+BRIDGE_METRICS_PORT = int(os.getenv("BRIDGE_METRICS_PORT", 0))
+# Encoding of ticks, positions, deals and accounts on Kafka: "json" or "binary" (msgpack / struct, see sub_manager/wire)
+KAFKA_WIRE_FORMAT = os.getenv("KAFKA_WIRE_FORMAT", "json")
+# Seconds between two flushes of the bridge tick publisher (latest tick per symbol, e.g. 0.1-0.25)
+BRIDGE_TICK_FLUSH_INTERVAL = float(os.getenv("BRIDGE_TICK_FLUSH_INTERVAL", 0.2))
+# Seconds a login's account refresh waits for more position / deal events before the bridge fetches and publishes it
+BRIDGE_ACCOUNT_REFRESH_WINDOW = float(os.getenv("BRIDGE_ACCOUNT_REFRESH_WINDOW", 0.5))
@@ -0,0 +1,76 @@
+import bisect, math
+from typing import Dict, List, Set, Tuple
+
+
+class BreachIndex:
+    """
+    Per-symbol sorted trigger prices of accounts whose whole exposure is one side of
+    one symbol. Such an account's equity is linear in a single price (bid for buys,
+    ask for sells), so the price band inside which none of its floors, highs or lows
+    can move is solved in closed form. A tick only has to evaluate the accounts whose
+    band edge the new price reached.
+
+    due() takes the triggered accounts out of the index, the caller evaluates them and
+    places a fresh band around the new price.
+    """
+    BID, ASK = 0, 1
+
+    def __init__(self):
+        # (symbol, price side) -> sorted [(lower edge, login)] and sorted [(upper edge, login)]
+        self.lows: Dict[Tuple[str, int], List[Tuple[float, int]]] = {}
+        self.highs: Dict[Tuple[str, int], List[Tuple[float, int]]] = {}
+        self.bands: Dict[int, Tuple[str, int, float, float]] = {}  # login -> (symbol, side, low, high)
+        self.members: Dict[str, Set[int]] = {}                     # symbol -> indexed logins
+
+    def __contains__(self, login: int) -> bool:
+        return login in self.bands
+
+    def __len__(self) -> int:
+        return len(self.bands)
+
+    def place(self, login: int, symbol: str, side: int, low: float, high: float):
+        self.remove(login)
+        key = (symbol, side)
+        bisect.insort(self.lows.setdefault(key, []), (low, login))
+        bisect.insort(self.highs.setdefault(key, []), (high, login))
+        self.bands[login] = (symbol, side, low, high)
+        self.members.setdefault(symbol, set()).add(login)
+
+    def remove(self, login: int):
+        band = self.bands.pop(login, None)
+        if band is None:
+            return
+        symbol, side, low, high = band
+        self._discard(self.lows[(symbol, side)], (low, login))
+        self._discard(self.highs[(symbol, side)], (high, login))
+        self.members[symbol].discard(login)
+
+    def clear(self):
+        self.lows.clear()
+        self.highs.clear()
+        self.bands.clear()
+        self.members.clear()
+
+    def indexed(self, symbol: str) -> Set[int]:
+        return self.members.get(symbol, set())
+
+    def due(self, symbol: str, bid: float, ask: float) -> List[int]:
+        """Remove and return the accounts on a symbol whose band the new prices reached"""
+        due = []
+        for side, price in ((self.BID, bid), (self.ASK, ask)):
+            lows = self.lows.get((symbol, side))
+            if lows:
+                due.extend(login for _, login in lows[bisect.bisect_left(lows, (price,)):])
+            highs = self.highs.get((symbol, side))
+            if highs:
+                due.extend(login for _, login in highs[:bisect.bisect_right(highs, (price, math.inf))])
+        due = list(dict.fromkeys(due))
+        for login in due:
+            self.remove(login)
+        return due
+
+    @staticmethod
+    def _discard(entries: List[Tuple[float, int]], entry: Tuple[float, int]):
+        i = bisect.bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
@@ -0,0 +1,115 @@
+import asyncio, threading, time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from sub_manager.logging_config import get_prop_logger
+from sub_manager.telemetry import BROADCAST_PENDING, CHANNEL_SECONDS
+
+logger = get_prop_logger('monitoring')
+
+
+class ChannelBroadcaster:
+    """
+    Channel-layer fan-out from one background asyncio thread.
+
+    publish() only records the message under (group, type) and returns: a newer
+    payload for the same key replaces the pending one (conflated), and when
+    `max_pending` keys are waiting the oldest is dropped. The sender thread keeps one
+    persistent event loop, so the channels_redis connections are reused instead of
+    async_to_sync bridging a loop per call.
+    """
+    REPORT_INTERVAL = 60.0
+
+    def __init__(self, channel_layer, max_pending: int = 10000):
+        self.channel_layer = channel_layer
+        self.max_pending = max_pending
+        self.pending: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.loop = None
+        self.wakeup = None
+        self.thread = None
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.max_depth = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.last_report = time.monotonic()
+        BROADCAST_PENDING.set_function(lambda: len(self.pending))
+
+    def start(self):
+        if self.thread is not None:
+            return
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), name="channel-broadcaster", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def publish(self, group: str, message: dict):
+        """Queue a group_send without blocking the caller"""
+        if self.thread is None:
+            self.start()
+        key = (group, message.get("type", ""))
+        with self.lock:
+            if key in self.pending:
+                self.conflated += 1
+                self.pending.move_to_end(key)
+            elif len(self.pending) >= self.max_pending:
+                self.pending.popitem(last=False)
+                self.dropped += 1
+            self.pending[key] = message
+            self.max_depth = max(self.max_depth, len(self.pending))
+        self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            depth = len(self.pending)
+        return {
+            "depth": depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "avg_latency_ms": (self.latency_total / self.sent * 1000) if self.sent else 0.0,
+            "max_latency_ms": self.latency_max * 1000,
+        }
+
+    def _run(self, ready: threading.Event):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.wakeup = asyncio.Event()
+        ready.set()
+        self.loop.run_until_complete(self._sender())
+
+    def _drain(self):
+        with self.lock:
+            batch = list(self.pending.items())
+            self.pending.clear()
+        return batch
+
+    async def _sender(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            for (group, _), message in self._drain():
+                started = time.perf_counter()
+                try:
+                    await self.channel_layer.group_send(group, message)
+                    elapsed = time.perf_counter() - started
+                    CHANNEL_SECONDS.observe(elapsed)
+                    self.sent += 1
+                    self.latency_total += elapsed
+                    self.latency_max = max(self.latency_max, elapsed)
+                except Exception as err:
+                    self.failed += 1
+                    logger.error(f"Error broadcasting to {group}: {err}")
+            self._maybe_report()
+
+    def _maybe_report(self):
+        if time.monotonic() - self.last_report < self.REPORT_INTERVAL:
+            return
+        self.last_report = time.monotonic()
+        logger.info(f"Broadcaster stats: {self.stats()}")
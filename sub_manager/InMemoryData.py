@@ -9,7 +9,7 @@ class ViolationDict(TypedDict):
     message: str
 
 
-@dataclass
+@dataclass(slots=True)
 class AccountData:
     # mt5_user_id: Optional[int] 
     login: int
@@ -123,8 +123,8 @@ class DealData:
     dealer: Optional[int] = None
 
     # Deal details
-    action: Optional[str] = None      # Buy/Sell/etc
-    entry: Optional[str] = None       # Entry direction
+    action: Optional[int] = None      # Buy/Sell/etc
+    entry: Optional[int] = None       # Entry direction
     symbol: Optional[str] = None
     comment: Optional[str] = None
     reason: Optional[str] = None
@@ -179,13 +179,40 @@ class DealData:
     updated_at: Optional[datetime] = None
 
 
+@dataclass(slots=True)
+class PositionRecord:
+    """Open position as the rule engine keeps it: the PositionData fields it reads, no __dict__"""
+    position_id: int
+    login: int
+    symbol: str
+    action: int = 0
+    volume: int = 0
+    contract_size: float = 0.0
+    price_open: float = 0.0
+    profit: float = 0.0
+
+
+@dataclass(slots=True)
+class DealRecord:
+    """Deal as the rule engine keeps it: what the HFT, grid and martingale rules read"""
+    deal: int
+    login: int
+    position_id: Optional[int] = None
+    symbol: Optional[str] = None
+    action: Optional[int] = None      # MT5 deal action, 0 buy / 1 sell
+    entry: Optional[int] = None       # MT5 deal entry, 0 in / 1 out / 2 inout
+    volume: int = 0
+    profit: float = 0.0
+    time: Optional[int] = None
+
+
 @dataclass
 class DailyDrawdownData:
     login: int                           # MT5 account login
     date: date                           # The day of the drawdown
     equity_high: Decimal = Decimal("0")  # highest equity seen that day
     equity_low: Decimal = Decimal("0")   # lowest equity seen that day
-    drawdown_percent: Decimal = Decimal("0")  # (high - low) / high * 100
+    drawdown_percent: Decimal = Decimal("0")  # (high - equity) / high * 100
 
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
@@ -196,7 +223,7 @@ class AccountTotalDrawdownData:
     login: int                                  # MT5 account login
     equity_peak: Decimal = Decimal("0")         # all-time high equity
     equity_low: Decimal = Decimal("0")          # lowest equity since peak
-    drawdown_percent: Decimal = Decimal("0")    # (peak - low) / peak * 100
+    drawdown_percent: Decimal = Decimal("0")    # (peak - equity) / peak * 100
 
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
@@ -285,7 +312,7 @@ class PropFirmChallengeData:
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-@dataclass
+@dataclass(slots=True)
 class TickData:
     symbol: str      
     datetime: int                 
@@ -297,6 +324,23 @@ class TickData:
     volume_ext: int       
 
 
+@dataclass
+class SymbolSpecData:
+    symbol: str
+    digits: int = 0
+    contract_size: float = 0.0      # units per lot
+    tick_size: float = 0.0
+    tick_value: float = 0.0
+    currency_base: str = ""
+    currency_profit: str = ""       # PnL is in this currency
+    currency_margin: str = ""
+    calc_mode: int = 0
+    margin_initial: float = 0.0
+    margin_maintenance: float = 0.0
+    margin_rate_initial: float = 1.0
+    margin_rate_maintenance: float = 1.0
+
+
 @dataclass
 class CompetitionData:
     """
@@ -0,0 +1,104 @@
+import time
+from django.conf import settings
+from typing import Dict, List, Optional, Tuple, Type, Union
+
+from sub_manager.logging_config import get_prop_logger
+
+logger = get_prop_logger('monitoring')
+
+
+class Evaluator:
+    """
+    Per-account logic run on the engine's shared state. The engine decodes every
+    message once, revalues the account and updates its watermarks and drawdowns,
+    then hands the result to each enabled evaluator.
+    """
+    name = ""
+    # Topics only this evaluator needs, the engine subscribes to them when it is enabled
+    topics: Tuple[str, ...] = ()
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def evaluate(self, acc, dd, total_dd):
+        """Called with the freshly revalued account and its daily / total drawdown"""
+
+    def fire(self, login: Optional[int], kind: str):
+        """Called for scheduler deadlines the engine does not handle itself"""
+
+
+class CompetitionEvaluator(Evaluator):
+    """Competition scoring: metrics and leaderboard score, throttled per login"""
+    name = "competition"
+    topics = ("account_competition_initiate", "competition.control")
+
+    def evaluate(self, acc, dd, total_dd):
+        # Scores need the competition mapping anyway, other logins never reach Redis
+        if acc.login not in self.engine.account_competition:
+            return
+        if self.engine.should_update_leaderboard(acc.login):
+            self.engine.update_competition_metrics(acc.login)
+
+
+class ChallengeEvaluator(Evaluator):
+    """Challenge rules: drawdown floors and profit target from the account's rule plan"""
+    name = "challenge"
+    topics = ("account_challenge_initiate", "accounts.deal", "accounts.deal.remove", "accounts.deal.update")
+
+    def evaluate(self, acc, dd, total_dd):
+        engine = self.engine
+        challenge = engine.account_challenge.get(acc.login)
+        if not challenge:
+            return
+
+        #broadcast after equity/drawdown updates
+        if engine.should_broadcast(acc.login):
+            engine._broadcast_account_stats(acc.login)
+
+        plan = engine._rule_plan(acc.login)
+        if dd and total_dd:
+            plan.observe(float(dd.equity_high), float(total_dd.equity_peak))
+        broken_rules = engine.rule_checker.check_account_rules(acc, plan)
+
+        if len(broken_rules) == 0:
+            engine._park(acc.login)
+        else:
+            logger.info(f"Account rules broken {acc.login}: {[rule['type'] for rule in broken_rules]}")
+            engine.lock_account.add(acc.login)
+            engine._handle_account_rules_violation(acc.login, broken_rules)
+            engine._challenge_failed(acc.login, broken_rules, challenge)
+
+
+class RatingEvaluator(Evaluator):
+    """Account rating: hands the stats of every account to Celery on a fixed interval"""
+    name = "rating"
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        self.interval = settings.MONITOR_RATING_INTERVAL
+        engine.scheduler.schedule(None, "rating", time.time() + self.interval)
+
+    def fire(self, login: Optional[int], kind: str):
+        if kind != "rating":
+            return
+        self.engine.scheduler.schedule(None, "rating", time.time() + self.interval)
+        self.engine.analyze_account_rating()
+
+
+# Evaluators run in this order whatever order they are enabled in: scoring reads the
+# account before a failed challenge removes it
+EVALUATORS: Dict[str, Type[Evaluator]] = {
+    CompetitionEvaluator.name: CompetitionEvaluator,
+    ChallengeEvaluator.name: ChallengeEvaluator,
+    RatingEvaluator.name: RatingEvaluator,
+}
+
+
+def evaluator_names(names: Union[str, List[str], Tuple[str, ...]]) -> List[str]:
+    """Validated evaluator names in run order, from a list or a comma separated string"""
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = set(names) - set(EVALUATORS)
+    if unknown:
+        raise ValueError(f"Unknown evaluators {sorted(unknown)}, expected some of {list(EVALUATORS)}")
+    return [name for name in EVALUATORS if name in names]
@@ -0,0 +1,146 @@
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from sub_manager.logging_config import get_prop_logger
+
+logger = get_prop_logger('monitoring')
+
+
+class CompetitionMetricsBuffer:
+    """
+    In-process buffer in front of Redis for competition metrics.
+
+    Trade counters and competition membership are kept in memory (loaded from Redis
+    once per login), metric hashes and leaderboard scores are collected per login and
+    written in one non-transactional pipeline every `interval` seconds or when
+    `max_pending` logins are dirty. The tick path never waits on a Redis round-trip
+    for metrics except the first time a login is seen.
+    """
+    COUNTERS = ("total_trades", "winning_trades")
+
+    def __init__(self, redis, interval: float = 1.0, max_pending: int = 500, meta_ttl: float = 5.0):
+        self.redis = redis
+        self.interval = interval
+        self.max_pending = max_pending
+        self.meta_ttl = meta_ttl
+        self.last_flush = time.monotonic()
+
+        self.counters: Dict[int, Dict[str, int]] = {}
+        self.membership: Dict[int, Tuple[Optional[str], float]] = {}  # login -> (competition uuid, loaded at)
+        self.meta: Dict[str, Tuple[dict, float]] = {}                  # competition uuid -> (meta hash, loaded at)
+
+        self.pending_incr: Dict[int, Dict[str, int]] = {}
+        self.pending_user: Dict[int, Dict[str, str]] = {}
+        self.pending_scores: Dict[str, Dict[int, float]] = {}          # leaderboard key -> login -> score
+        self.pending_competitions: Set[str] = set()
+
+    #===============================================================================================
+    # READS (memory first)
+    #===============================================================================================
+    def trade_counts(self, login: int) -> Tuple[int, int]:
+        counters = self.counters.get(login)
+        if counters is None:
+            total, winning = self.redis.hmget(f"user:{login}", *self.COUNTERS)
+            counters = self.counters[login] = {"total_trades": int(total or 0), "winning_trades": int(winning or 0)}
+        return counters["total_trades"], counters["winning_trades"]
+
+    def competition_of(self, login: int) -> Optional[str]:
+        entry = self.membership.get(login)
+        if entry is not None and (entry[0] is not None or time.monotonic() - entry[1] < self.meta_ttl):
+            return entry[0]
+        competition_uuid = self.redis.hget(f"user:{login}", "competition_uuid")
+        self.membership[login] = (competition_uuid, time.monotonic())
+        return competition_uuid
+
+    def competition_meta(self, competition_uuid: str) -> dict:
+        entry = self.meta.get(competition_uuid)
+        if entry is not None and time.monotonic() - entry[1] < self.meta_ttl:
+            return entry[0]
+        meta = self.redis.hgetall(f"competition:{competition_uuid}:meta") or {}
+        self.meta[competition_uuid] = (meta, time.monotonic())
+        return meta
+
+    #===============================================================================================
+    # WRITES (buffered)
+    #===============================================================================================
+    def join(self, login: int, competition_uuid: str):
+        """Account registered to a competition (its Redis hash is initialised by the caller)"""
+        self.membership[login] = (competition_uuid, time.monotonic())
+        self.counters[login] = {"total_trades": 0, "winning_trades": 0}
+        self.pending_incr.pop(login, None)
+
+    def leave(self, login: int):
+        self.membership[login] = (None, time.monotonic())
+
+    def forget_competition(self, competition_uuid: str):
+        self.meta.pop(competition_uuid, None)
+
+    def record_trade(self, login: int, won: bool):
+        self.trade_counts(login)
+        counters = self.counters[login]
+        deltas = self.pending_incr.setdefault(login, {})
+        counters["total_trades"] += 1
+        deltas["total_trades"] = deltas.get("total_trades", 0) + 1
+        if won:
+            counters["winning_trades"] += 1
+            deltas["winning_trades"] = deltas.get("winning_trades", 0) + 1
+
+    def set_user(self, login: int, mapping: Dict[str, str]):
+        self.pending_user.setdefault(login, {}).update(mapping)
+
+    def set_score(self, competition_uuid: str, login: int, score: float):
+        self.pending_scores.setdefault(f"competition:{competition_uuid}:leaderboard", {})[login] = score
+        self.pending_competitions.add(competition_uuid)
+
+    def remove_login(self, login: int):
+        """Forget the cached counters and membership, the next read reloads them from Redis"""
+        self.counters.pop(login, None)
+        self.membership.pop(login, None)
+
+    #===============================================================================================
+    # FLUSH
+    #===============================================================================================
+    def maybe_flush(self) -> Set[str]:
+        if time.monotonic() - self.last_flush < self.interval and len(self.pending_user) < self.max_pending:
+            return set()
+        return self.flush()
+
+    def flush(self) -> Set[str]:
+        """Write everything pending in one pipeline, returns the competitions whose leaderboard changed"""
+        self.last_flush = time.monotonic()
+        if not (self.pending_incr or self.pending_user or self.pending_scores):
+            return set()
+
+        incr, users, scores, competitions = self.pending_incr, self.pending_user, self.pending_scores, self.pending_competitions
+        self.pending_incr, self.pending_user, self.pending_scores, self.pending_competitions = {}, {}, {}, set()
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for login, deltas in incr.items():
+                for field, amount in deltas.items():
+                    pipe.hincrby(f"user:{login}", field, amount)
+            for login, mapping in users.items():
+                counters = self.counters.get(login)
+                if counters:
+                    # Counters may have moved since the metrics were computed
+                    mapping.update({field: str(value) for field, value in counters.items()})
+                pipe.hset(f"user:{login}", mapping=mapping)
+            for key, members in scores.items():
+                pipe.zadd(key, members)
+            pipe.execute()
+            return competitions
+        except Exception as err:
+            logger.error(f"Failed to flush competition metrics: {err}")
+            self._requeue(incr, users, scores, competitions)
+            return set()
+
+    def _requeue(self, incr, users, scores, competitions):
+        for login, deltas in incr.items():
+            pending = self.pending_incr.setdefault(login, {})
+            for field, amount in deltas.items():
+                pending[field] = pending.get(field, 0) + amount
+        for login, mapping in users.items():
+            self.pending_user[login] = {**mapping, **self.pending_user.get(login, {})}
+        for key, members in scores.items():
+            self.pending_scores[key] = {**members, **self.pending_scores.get(key, {})}
+        self.pending_competitions |= competitions
@@ -1,18 +1,30 @@
 from confluent_kafka import Producer
-import MT5Manager, time, traceback
-from datetime import date
+import MT5Manager, sys, time, traceback
+from datetime import date, timedelta
 from datetime import time as dtime
 from django.utils.timezone import now
-from typing import List, Dict, Tuple, Union
+from django.utils.dateparse import parse_datetime
+from typing import List, Dict, Tuple, Union, Optional
+from django.conf import settings
 from stanum_web.tasks import *
 from asgiref.sync import async_to_sync
 from sub_manager.InMemoryData import *
 from sub_manager.InMemoryRuleChecker import *
 from sub_manager.logging_config import get_prop_logger
-from sub_manager.producer import redis_client
+from sub_manager.producer import redis_client, channel_layer
 
-from confluent_kafka import Consumer, Producer
+from confluent_kafka import Consumer, Producer, OFFSET_BEGINNING, OFFSET_END
 from .USDCurrencyConverter import USDCurrencyConverter
+from .InMemoryStore import SymbolSpecTable, SymbolIndex, TradeRateWindow, StrategyTracker, DealRing
+from .InMemoryRevaluation import ColumnarRevaluation, ExposureBook, columnar_available
+from .InMemorySharding import PartitionOwnership, assign_all, instance_id
+from .InMemorySnapshot import MonitorSnapshot
+from .InMemoryMetrics import CompetitionMetricsBuffer
+from .InMemoryBroadcaster import ChannelBroadcaster
+from .InMemoryScheduler import DeadlineScheduler, day_start
+from .InMemoryBreachIndex import BreachIndex
+from .InMemoryEvaluators import EVALUATORS, Evaluator, evaluator_names
+from . import telemetry, wire
 
 logger = get_prop_logger('monitoring')
 
@@ -23,31 +35,94 @@ def decimal_default(obj):
     raise TypeError
 
 class InMemoryPropMonitoring:
-    def __init__(self):
+    # State written to / restored from snapshots, everything else is derived or transient
+    SNAPSHOT_FIELDS = ("local_accounts", "positions", "deals", "account_challenge", "account_competition",
+                       "daily_drawdowns", "total_drawdown", "account_watermarks", "violation_counts",
+                       "challenge_start")
+
+    # Longest a login parked in the breach index goes without a full evaluation
+    BREACH_REFRESH_INTERVAL = 10.0
+
+    # Seconds between two samples of the in-memory account / position gauges
+    METRICS_SAMPLE_INTERVAL = 5.0
+
+    # Seconds an ended competition's Redis data (and its finalize lock) is kept
+    COMPETITION_RESULTS_TTL = 7 * 24 * 60 * 60
+
+    # Topics every instance reads in full, their offsets are not part of partition ownership
+    BROADCAST_TOPICS = ("competition.control", "symbols.spec")
+
+    # Topics read whichever evaluators are enabled, see InMemoryEvaluators for the rest
+    ACCOUNT_TOPICS = ("accounts.state", "accounts.load",
+                      "accounts.position", "accounts.position.remove", "accounts.position.update")
+
+    def __init__(self, columnar: Optional[bool] = None, breach_index: Optional[bool] = None,
+                 evaluators: Optional[Union[str, List[str], Tuple[str, ...]]] = None):
         # self.bridge = bridge
         self.rule_checker = InMemoryRuleChecker()
         self.converter = USDCurrencyConverter()
 
         self.local_accounts: Dict[int, AccountData] = {}
-        self.positions: Dict[int, List[PositionData]] = {}
-        self.deals: Dict[int, List[DealData]] = {}
+        self.positions: Dict[int, Dict[int, PositionRecord]] = {}  # login -> position_id -> position
+        self.deals: Dict[int, DealRing] = {}  # login -> deal id -> deal, bounded (see _deal_capacity)
+        self.trade_rates: Dict[int, TradeRateWindow] = {}  # login -> recent entry deals (HFT limits)
+        self.strategies: Dict[int, StrategyTracker] = {}  # login -> entry deals in time order (grid/martingale)
         self.account_challenge: Dict[int, PropFirmChallengeData] = {}
         self.account_competition: Dict[int, CompetitionData] = {}
 
         self.symbol:Dict[str, TickData] = {}
+        self.symbol_index = SymbolIndex()
+        # Contract sizes and profit currencies from the bridge's symbols.spec topic
+        self.symbol_specs = SymbolSpecTable()
+        self.exposure = ExposureBook(self.symbol_specs.units)
+
+        # Optional vectorized (numpy) revaluation backend, see InMemoryRevaluation
+        self.revaluation: Optional[ColumnarRevaluation] = None
+        if settings.MONITOR_COLUMNAR_REVALUATION if columnar is None else columnar:
+            if columnar_available():
+                self.revaluation = ColumnarRevaluation(self.symbol_specs.units)
+            else:
+                logger.warning("Columnar revaluation requested but numpy is not installed, using per-position revaluation")
 
         self.daily_drawdowns: Dict[int, Dict[date, DailyDrawdownData]] = {}
         self.total_drawdown: Dict[int, AccountTotalDrawdownData] = {}
         self.account_watermarks: Dict[int, AccountWatermarksData] = {}
+        # login -> absolute breach thresholds of the current step, see _rule_plan
+        self.rule_plans: Dict[int, RulePlan] = {}
+        # Trigger prices of single-symbol accounts, ticks skip them until a band edge is reached
+        self.breach_index: Optional[BreachIndex] = None
+        if settings.MONITOR_BREACH_INDEX if breach_index is None else breach_index:
+            self.breach_index = BreachIndex()
 
         self.violation_counts: Dict[int, Dict[str, int]] = {} 
 
+        # Calendar rules (trading days, daily rollover) fire from the scheduler, not per tick
+        self.scheduler = DeadlineScheduler()
+        self.challenge_start: Dict[int, date] = {}
+        self.today: date = now().date()
+        self.scheduler.schedule(None, "day_rollover", day_start(self.today + timedelta(days=1)))
+
+        # Trade counters, competition membership and pending metric writes (flushed by run())
+        self.metrics = CompetitionMetricsBuffer(
+            redis_client, settings.MONITOR_METRICS_FLUSH_INTERVAL, settings.MONITOR_METRICS_MAX_PENDING
+        )
+
+        # WebSocket fan-out runs on its own thread, the tick path only enqueues
+        self.broadcaster = ChannelBroadcaster(channel_layer, settings.MONITOR_BROADCAST_MAX_PENDING)
+
+        # Set by run() when the rule engine is sharded or restored from a snapshot
+        self.ownership: Optional[PartitionOwnership] = None
+
         self.count = 0
         self.last_update_time = {}
         self.last_broadcast_time = {}
         self.lock_account: Set[int] = set()
 
-        logger.info("InMemoryMonitor Initialized")
+        # Challenge rules, competition scoring and rating share the state above, one engine runs them all
+        names = evaluator_names(settings.MONITOR_EVALUATORS if evaluators is None else evaluators)
+        self.evaluators: List[Evaluator] = [EVALUATORS[name](self) for name in names]
+
+        logger.info(f"InMemoryMonitor Initialized ({', '.join(names)})")
     
     def remove_account(self, login):
         self.cleanup_completed_account(login)
@@ -57,13 +132,14 @@ class InMemoryPropMonitoring:
     def update_account(self, acc: AccountData):
         try:
             self.local_accounts[acc.login] = acc
+            self._unpark(acc.login)
             logger.info(f"Updated Account {acc.login}")
             challenge = self.account_challenge.get(acc.login)
             if not challenge:
                 return
             
             # Check if profit target met
-            if self.rule_checker._check_profit(acc, challenge):
+            if self.rule_checker._check_profit(acc, self._rule_plan(acc.login)):
                 self.lock_account.add(acc.login)
                 # Both conditions met - determine next action based on phase
                 if (challenge.challenge_type == 'two_step') and (acc.step == 1):
@@ -87,18 +163,22 @@ class InMemoryPropMonitoring:
     #############################################################################################################
     ## POSITION
     #############################################################################################################
-    def add_position(self, pos:PositionData):
+    def add_position(self, pos:PositionRecord, replay: bool = False):
+        """Replayed positions (see PartitionOwnership) rebuild state without raising violations again"""
         try:
-            self.positions.setdefault(pos.login, []).append(pos)
+            pos_entry = self.positions.setdefault(pos.login, {})
+            is_new = pos.position_id not in pos_entry
+            pos_entry[pos.position_id] = pos
+            self._track_position(pos, is_new)
             #update equity with new position included
             self.update_account_equity(pos.login)
 
             logger.info(f"Position Addedd {pos.login}")
 
-            positions = self.deals.get(pos.login, [])
+            positions = self.positions.get(pos.login, {}).values()
             challenge = self.account_challenge.get(pos.login)
 
-            if challenge:
+            if challenge and not replay:
                 violations:List[ViolationDict] = []
                 violations.extend(self.rule_checker._check_symbol_limit(pos, positions, challenge))
                 self._handle_trade_violations(pos.login, pos.symbol, violations)
@@ -106,52 +186,82 @@ class InMemoryPropMonitoring:
         except Exception as err:
             logger.debug(f"Error while updating position {str(err)}")
 
-    def update_position(self, pos: PositionData):
+    def update_position(self, pos: PositionRecord):
         try:
             pos_entry = self.positions.get(pos.login, None)
-            if not pos_entry:
+            if not pos_entry or pos.position_id not in pos_entry:
                 return  # nothing to update
 
-            for i, existing in enumerate(pos_entry):
-                if existing.position_id == pos.position_id:
-                    # overwrite with fresh data
-                    pos_entry[i] = pos
-                    break
+            # overwrite with fresh data (keeps original insertion order)
+            pos_entry[pos.position_id] = pos
+            self._track_position(pos, False)
             logger.info(f"Position Updated {pos.login}")
         except Exception as err:
             logger.debug(f"Error while updating position {str(err)}")
 
-    def remove_position(self, pos: PositionData):
+    def remove_position(self, pos: PositionRecord):
         try:
             pos_entry = self.positions.get(pos.login, None)
             if pos_entry:
-                for i in pos_entry:
-                    if i.position_id == pos.position_id:
-                        pos_entry.remove(i) #Remove Position
-                        break   # stop after removing
+                existing = pos_entry.pop(pos.position_id, None) #Remove Position
+                if existing:
+                    self._untrack_position(existing)
             logger.info(f"Position Removed {pos.login}")
         except Exception as err:
             logger.debug(f"Error while removing position {str(err)}")
     
+    def _track_position(self, pos: PositionRecord, is_new: bool):
+        """Keep the symbol index and revaluation aggregates in step with the position store"""
+        if is_new:
+            self.symbol_index.add(pos.symbol, pos.login)
+            self.converter.slot(pos.symbol)
+        self.exposure.upsert(pos)
+        if self.revaluation:
+            self.revaluation.upsert(pos)
+        self._unpark(pos.login)
+
+    def _untrack_position(self, pos: PositionRecord):
+        self.symbol_index.remove(pos.symbol, pos.login)
+        self.exposure.remove(pos.login, pos.position_id)
+        if self.revaluation:
+            self.revaluation.remove(pos.login, pos.position_id)
+        self._unpark(pos.login)
+
+    def _untrack_login(self, login: int):
+        self.symbol_index.drop_login(login)
+        self.exposure.drop_login(login)
+        if self.revaluation:
+            self.revaluation.drop_login(login)
+        self._unpark(login)
+
     def _clear_positions(self, login):
-        self.positions[login] = []
+        self.positions[login] = {}
+        self._untrack_login(login)
         logger.info(f"Position cleared for {login}")
 
     #############################################################################################################
     ## DEALS
     #############################################################################################################
     
-    def add_deal(self, deal:DealData):
+    def add_deal(self, deal:DealRecord, replay: bool = False):
+        """Replayed deals still feed the rate windows and strategy trackers, only the alerts are skipped"""
         try:
-            self.deals.setdefault(deal.login, []).append(deal)
+            deal_entry = self._deal_store(deal.login)
+            if deal.deal not in deal_entry:
+                if deal_entry.seen(deal.deal):
+                    return  # re-delivered after it was evicted, it was counted when it first arrived
+                self._track_deal(deal)
+            deal_entry[deal.deal] = deal
             logger.info(f"Deal Addedd {deal.login}")
 
-            deals = self.deals.get(deal.login, [])
             challenge = self.account_challenge.get(deal.login)
-            if challenge:
+            if challenge and not replay:
                 violations:List[ViolationDict] = []
-                violations.extend(self.rule_checker._check_hft(deals, challenge))
-                violations.extend(self.rule_checker._check_prohibited_strategies(deals, challenge))
+                trades_1_min, trades_1_hr = self.trade_rates[deal.login].counts() if deal.login in self.trade_rates else (0, 0)
+                violations.extend(self.rule_checker._check_hft(trades_1_min, trades_1_hr, challenge))
+                tracker = self.strategies.get(deal.login)
+                if tracker:
+                    violations.extend(self.rule_checker._check_prohibited_strategies(tracker, challenge))
 
                 #Handle the Trade Violations
                 self._handle_trade_violations(deal.login, deal.symbol, violations)
@@ -159,35 +269,78 @@ class InMemoryPropMonitoring:
         except Exception as err:
             logger.debug(f"Error while updating deal {str(err)}")
 
-    def update_deal(self, deal: DealData):
+    def update_deal(self, deal: DealRecord, replay: bool = False):
+        """Updates only rebuild state and raise no violations, replayed or not"""
         try:
             deal_entry = self.deals.get(deal.login, None)
-            if not deal_entry:
+            if not deal_entry or deal.deal not in deal_entry:
                 return  # nothing to update
 
-            for i, existing in enumerate(deal_entry):
-                if existing.deal == deal.deal:
-                    # overwrite with fresh data
-                    deal_entry[i] = deal
-                    break
+            # overwrite with fresh data (keeps original insertion order)
+            deal_entry[deal.deal] = deal
+            tracker = self.strategies.get(deal.login)
+            if StrategyTracker.is_entry(deal):
+                self._strategy_tracker(deal.login).update(deal)
+            elif tracker:
+                tracker.remove(deal.deal)
             logger.info(f"Deal Updated {deal.login}")
         except Exception as err:
             logger.debug(f"Error while updating deal {str(err)}")
 
-    def remove_deal(self, deal: DealData):
+    def remove_deal(self, deal: DealRecord):
         try:
             deal_entry = self.deals.get(deal.login, None)
             if deal_entry:
-                for i in deal_entry:
-                    if i.deal == deal.deal:
-                        deal_entry.remove(i) #Remove Position
-                        break   # stop after removing
+                deal_entry.pop(deal.deal, None) #Remove Deal
+            tracker = self.strategies.get(deal.login)
+            if tracker:
+                tracker.remove(deal.deal)
             logger.info(f"Deal Removed {deal.login}")
         except Exception as err:
             logger.debug(f"Error while removing deal {str(err)}")
     
+    def _track_deal(self, deal: DealRecord):
+        # Only real entry deals (buy/sell with entry IN or INOUT) count towards HFT and strategy rules
+        if not StrategyTracker.is_entry(deal):
+            return
+        self._strategy_tracker(deal.login).add(deal)
+        if deal.time:
+            self.trade_rates.setdefault(deal.login, TradeRateWindow()).add(deal.time)
+
+    def _deal_capacity(self, login: int) -> int:
+        """Deals to retain for a login: the longest window any active deal rule needs"""
+        # grid needs the last few entries, martingale the previous one
+        capacity = max(StrategyTracker.GRID_SIZE, 2)
+        challenge = self.account_challenge.get(login)
+        if challenge:
+            # every entry deal of the HFT hour window, so it can be rebuilt on restore
+            capacity = max(capacity, challenge.max_trades_per_hour + 1)
+        return max(capacity, settings.MONITOR_DEAL_RETENTION)
+
+    def _deal_store(self, login: int) -> DealRing:
+        deal_entry = self.deals.get(login)
+        if deal_entry is None:
+            deal_entry = self.deals[login] = DealRing(self._deal_capacity(login))
+        return deal_entry
+
+    def _strategy_tracker(self, login: int) -> StrategyTracker:
+        tracker = self.strategies.get(login)
+        if tracker is None:
+            tracker = self.strategies[login] = StrategyTracker(self._deal_capacity(login))
+        return tracker
+
+    def _resize_deal_retention(self, login: int):
+        """Challenge limits changed the retention window of a login"""
+        capacity = self._deal_capacity(login)
+        if login in self.deals:
+            self.deals[login].resize(capacity)
+        if login in self.strategies:
+            self.strategies[login].capacity = capacity
+
     def _clear_deals(self, login):
-        self.deals[login] = []
+        self.deals.pop(login, None)
+        self.trade_rates.pop(login, None)
+        self.strategies.pop(login, None)
         logger.info(f"Deals cleared for {login}")
 
     def _handle_trade_violations(self, login, symbol, violations:List[ViolationDict]):
@@ -220,11 +373,19 @@ class InMemoryPropMonitoring:
         """Remove all data for completed/failed accounts"""
         self.local_accounts.pop(login, None)
         self.positions.pop(login, None) 
+        self._untrack_login(login)
         self.deals.pop(login, None) 
+        self.trade_rates.pop(login, None)
+        self.strategies.pop(login, None)
         self.account_challenge.pop(login, None)
         self.daily_drawdowns.pop(login, None)
         self.total_drawdown.pop(login, None)
+        self.rule_plans.pop(login, None)
         self.violation_counts.pop(login, None)
+        self.scheduler.cancel_login(login)
+        self.challenge_start.pop(login, None)
+        # Cached trade counters would overwrite Redis if the login came back (partition reassigned)
+        self.metrics.remove_login(login)
         logger.info(f"Cleaned up completed account {login}")
 
     def _move_to_step_2(self, login, challenge:PropFirmChallengeData):
@@ -315,12 +476,15 @@ class InMemoryPropMonitoring:
             self.total_drawdown[login].equity_peak = account.equity
             self.total_drawdown[login].equity_low = account.equity
             self.total_drawdown[login].drawdown_percent = Decimal("0")
+        self._compile_rule_plan(login)
         
         if login in self.positions:
-            self.positions[login] = []
+            self.positions[login] = {}
+        self._untrack_login(login)
 
-        if login in self.deals:
-            self.deals[login] = []
+        self.deals.pop(login, None)
+        self.trade_rates.pop(login, None)
+        self.strategies.pop(login, None)
 
         if login in self.violation_counts:
             self.violation_counts[login] = {}
@@ -331,136 +495,98 @@ class InMemoryPropMonitoring:
         self.total_drawdown.pop(login, None)       # remove total dd for this account
         self.daily_drawdowns.pop(login, None)      # remove all daily dd for this account
 
+    def _compile_rule_plan(self, login: int) -> Optional[RulePlan]:
+        """Build the absolute thresholds of the account's current challenge step"""
+        account = self.local_accounts.get(login)
+        challenge = self.account_challenge.get(login)
+        if not account or not challenge:
+            self.rule_plans.pop(login, None)
+            return None
+        plan = self.rule_plans[login] = self.rule_checker.compile_plan(account, challenge)
+        self._unpark(login)
+        return plan
+
+    def _rule_plan(self, login: int) -> Optional[RulePlan]:
+        """Compiled plan of a login, recompiled when the account state moved to another step"""
+        plan = self.rule_plans.get(login)
+        account = self.local_accounts.get(login)
+        if plan is None or (account is not None and account.step != plan.step):
+            plan = self._compile_rule_plan(login)
+        return plan
+
     def OnTick(self, symbol: str, tick:TickData):
         try:
             self.symbol[symbol] = tick
             #Update the currency conversion
             self.converter.update_from_tick(symbol, tick.bid, tick.ask)
-
-            accounts =  self.get_accounts_with_symbol(symbol)
+            if self.revaluation:
+                self._reprice_symbol(symbol, tick)
+
+            if self.breach_index is not None:
+                # Accounts whose band edge was reached leave the index, evaluate everything not parked
+                self.breach_index.due(symbol, tick.bid, tick.ask)
+                logins = self.symbol_index.logins_except(symbol, self.breach_index.indexed(symbol))
+                accounts = [self.local_accounts[login] for login in logins
+                            if login in self.local_accounts and login not in self.lock_account]
+            else:
+                accounts = self.get_accounts_with_symbol(symbol)
             # print(f"ACCOUNTS WITH SYMBOL({symbol})", len(accounts))
             for acc in accounts:
-                # print("Running account", acc.login)
-                if acc.login in self.lock_account:
-                    continue
-                
-                # Add to lock set
-                self.lock_account.add(acc.login)
+                self._evaluate_account(acc)
 
-                try:
-                    _acc = self.update_account_equity(acc.login)
-                    self.update_account_watermarks(_acc.login, _acc.balance, _acc.equity)
-                    dd = self.update_drawdown(acc.login)
-                    total_dd = self.update_total_drawdown(acc.login)
-                    
-                    if self.should_update_leaderboard(acc.login):  # Throttle this
-                        self.update_competition_metrics(acc.login)
+        except Exception as err:
+            logger.error("Error processing OnTick", exc_info=True)
+            traceback.print_exc()
 
-                    challenge = self.account_challenge.get(acc.login)
-                    if not challenge:
-                        continue
-                    
-                    #broadcast after equity/drawdown updates
-                    if self.should_broadcast(acc.login):
-                        self._broadcast_account_stats(acc.login)
+    def _evaluate_account(self, acc: AccountData):
+        """Revalue one account and run its tick rules"""
+        # print("Running account", acc.login)
+        if acc.login in self.lock_account:
+            return
+        
+        # Add to lock set
+        self.lock_account.add(acc.login)
 
-                    broken_rules = self.rule_checker.check_account_rules(acc, challenge, dd, total_dd) 
-                    
-                    if len(broken_rules) == 0:
-                        #Check If the rules configuration is not for a funded account
-                        if challenge.challenge_class not in ['skill_check_funding', 'challenge_funding']:
-                            # Check if minimum days requirement met
-                            if not self.rule_checker._check_min_days(acc, challenge):
-                                # logger.info(f"NO ACCOUNT VIOLATIONS BUT MIN DAYS NOT REACHED YET {acc.login}")
-                                continue
-
-                            # logger.info(f"NO ACCOUNT VIOLATIONS BUT TARGET PROFIT NOT YET MADE {acc.login}")
-                            continue
-                    else:
-                        print("Handling account violation")
-                        self.lock_account.add(acc.login)
-                        self._handle_account_rules_violation(acc.login, broken_rules)
-                        print("Failing account")
-                        self._challenge_failed(acc.login, broken_rules, challenge)
+        try:
+            _acc = self.update_account_equity(acc.login)
+            self.update_account_watermarks(_acc.login, _acc.balance, _acc.equity)
+            dd = self.update_drawdown(acc.login)
+            total_dd = self.update_total_drawdown(acc.login)
 
-                except Exception as err:
-                    logger.error(f"Error processing account {acc.login}: {err}", exc_info=True)
-                
-                finally: 
-                    self.lock_account.discard(acc.login)
+            for evaluator in self.evaluators:
+                evaluator.evaluate(acc, dd, total_dd)
 
         except Exception as err:
-            logger.error("Error processing OnTick", exc_info=True)
-            traceback.print_exc()
+            logger.error(f"Error processing account {acc.login}: {err}", exc_info=True)
+        
+        finally: 
+            self.lock_account.discard(acc.login)
     
     def get_accounts_with_symbol(self, symbol: str) -> List[AccountData]:
         accounts = []
-        for login, account in self.local_accounts.items():
+        for login in self.symbol_index.logins(symbol):
             # Skip accounts that are in the lock set
             if login in self.lock_account:
                 continue
-            pos_list = self.positions.get(login, [])
-            for pos in pos_list:
-                if pos.symbol == symbol:
-                    accounts.append(account)
-                    break  # no need to check more positions for this login
+            account = self.local_accounts.get(login)
+            if account:
+                accounts.append(account)
         return accounts
 
     def update_account_equity(self, login: int):
         try:
             """Recalculate account equity, margin, free margin for a given account."""
-            positions = self.positions.get(login, [])
             account = self.local_accounts.get(login, None)
             if not account:
                 return  # no account to update
 
             balance = account.balance
-            profit = Decimal("0")
-            margin = Decimal("0")
             leverage = Decimal(account.margin_leverage or 100)
 
-            # logger.info(f"Starting calculation: Balance-{balance} Positions-{len(positions)}")
-
-            for pos in positions:
-                price = self.symbol.get(pos.symbol)
-                # print("SYMBOL", price.ask, price.bid)
-                if not price:
-                    continue
-
-                # Validate tick data
-                if price.bid <= 0 or price.ask <= 0:
-                    logger.warning(f"Invalid tick data for {pos.symbol}: bid={price.bid}, ask={price.ask}")
-                    continue
-
-                current_bid = Decimal(str(price.bid))
-                current_ask = Decimal(str(price.ask))
-                volume_in_lots = Decimal(pos.volume / 10000)
-                contract_size = Decimal(pos.contract_size or 100000)
-
-                if pos.action == 0:  # BUY
-                    pnl = (current_bid - Decimal(pos.price_open)) * volume_in_lots * contract_size
-                    margin_price = current_ask
-                else:  # SELL
-                    pnl = (pos.price_open - current_ask) * volume_in_lots * contract_size
-                    margin_price = current_bid
-
-                quote_currency = self.converter.get_quote_currency(pos.symbol)
-                pnl = self.converter.to_usd(pnl, quote_currency)
-
-                # print(f"Position {pos.symbol}: Action={pos.action}, Volume={pos.volume}, "
-                # f"OpenPrice={pos.price_open}, CurrentBid={current_bid}, CurrentAsk={current_ask}")
-                # print(f"Calculated PnL: {pnl}, Contract Size: {contract_size}")
-                # print(f"Volume in lots: {volume_in_lots}")
-                # print("---")
-
-                profit += pnl
-                # print(f"Profit-{profit}")
-                position_margin = (volume_in_lots * contract_size * margin_price) / leverage
-                margin += position_margin
-
-                # update position state
-                pos.profit = float(pnl)
-                # pos.time_update = int(time.time())
+            if self.revaluation:
+                profit, margin = self._revalue_columnar(login, leverage)
+            else:
+                profit, margin = self._revalue_exposure(login, leverage)
 
             equity = Decimal(balance) + profit
             free_margin = equity - margin
@@ -486,10 +612,77 @@ class InMemoryPropMonitoring:
             logger.debug(f"Error updating account equity: {str(err)}")
             traceback.print_exc()
 
+    def _revalue_exposure(self, login: int, leverage: Decimal) -> Tuple[Decimal, Decimal]:
+        """Closed-form revaluation over the per-symbol net exposure, returns (floating profit, margin)"""
+        profit = 0.0
+        notional = 0.0
+        for symbol, exposure in self.exposure.symbols(login).items():
+            price = self.symbol.get(symbol)
+            if not price:
+                continue
+
+            # Validate tick data
+            if price.bid <= 0 or price.ask <= 0:
+                logger.warning(f"Invalid tick data for {symbol}: bid={price.bid}, ask={price.ask}")
+                continue
+
+            profit += exposure.pnl(price.bid, price.ask) * self._symbol_rate(symbol)
+            notional += exposure.notional(price.bid, price.ask)
+
+        return Decimal(repr(profit)), Decimal(repr(notional)) / leverage
+
+    def _fill_position_profits(self, positions):
+        """Per-position profit is not written on every tick, fill it in when it is read"""
+        for pos in positions:
+            if self.revaluation:
+                pos.profit = self.revaluation.position_profit(pos.symbol, pos.position_id)
+                continue
+
+            price = self.symbol.get(pos.symbol)
+            if not price or price.bid <= 0 or price.ask <= 0:
+                continue
+            units = self.symbol_specs.units(pos)
+            if pos.action == 0:  # BUY
+                pnl = (price.bid - pos.price_open) * units
+            else:  # SELL
+                pnl = (pos.price_open - price.ask) * units
+            pos.profit = pnl * self._symbol_rate(pos.symbol)
+
+    def _revalue_columnar(self, login: int, leverage: Decimal) -> Tuple[Decimal, Decimal]:
+        """Read per-login totals from the columnar backend, Decimal is only built here"""
+        pnl, notional = self.revaluation.login_totals(login)
+        return Decimal(repr(pnl)), Decimal(repr(notional)) / leverage
+
+    def _reprice_symbol(self, symbol: str, tick: TickData):
+        if tick.bid <= 0 or tick.ask <= 0:
+            logger.warning(f"Invalid tick data for {symbol}: bid={tick.bid}, ask={tick.ask}")
+            return
+        self.revaluation.reprice(symbol, tick.bid, tick.ask, self._symbol_rate(symbol))
+
+    def apply_symbol_spec(self, spec: SymbolSpecData):
+        """Store a symbol spec, open positions on the symbol are re-sized when its contract size changed"""
+        if self.symbol_specs.update(spec):
+            self._retrack_symbol(spec.symbol)
+        self.converter.define(spec.symbol, spec.currency_base, spec.currency_profit)
+
+    def remove_symbol_spec(self, symbol: str):
+        if self.symbol_specs.remove(symbol):
+            self._retrack_symbol(symbol)
+
+    def _retrack_symbol(self, symbol: str):
+        for login in self.symbol_index.logins(symbol):
+            for pos in self.positions.get(login, {}).values():
+                if pos.symbol == symbol:
+                    self._track_position(pos, False)
+
+    def _symbol_rate(self, symbol: str) -> float:
+        """Quote currency -> USD multiplier for a symbol (1 when no rate is known yet)"""
+        return self.converter.factor(symbol)
+
     def update_drawdown(self, login: int):
         try:
             # print("Updating Drawdown")
-            today = now().date()
+            today = self.today
             account = self.local_accounts.get(login)
             if not account:
                 return None  # no account to update
@@ -518,7 +711,7 @@ class InMemoryPropMonitoring:
 
             # Recalculate drawdown %
             if dd.equity_high > 0:
-                dd.drawdown_percent = (account.equity - dd.equity_high) / dd.equity_high * 100
+                dd.drawdown_percent = (dd.equity_high - account.equity) / dd.equity_high * 100
             # if dd.equity_high > 0:
             #     dd.drawdown_percent = (
             #         (dd.equity_high - dd.equity_low) / dd.equity_high * 100
@@ -571,7 +764,7 @@ class InMemoryPropMonitoring:
 
             # Recalculate drawdown %
             if td.equity_peak > 0:
-                td.drawdown_percent = (Decimal(account.equity) - Decimal(td.equity_peak) / Decimal(td.equity_peak) * Decimal(100))
+                td.drawdown_percent = (Decimal(td.equity_peak) - Decimal(account.equity)) / Decimal(td.equity_peak) * Decimal(100)
                 # td.drawdown_percent = ((Decimal(td.equity_peak) - Decimal(td.equity_low)) / Decimal(td.equity_peak)) * 100
 
             # print(f"FINAL: PEAK-{td.equity_peak} LOW-{td.equity_low}")
@@ -656,10 +849,7 @@ class InMemoryPropMonitoring:
 
     def cleanup_unused_symbols(self):
         """Remove tick data for symbols not in any active positions"""
-        used_symbols = set()
-        for positions in self.positions.values():
-            for pos in positions:
-                used_symbols.add(pos.symbol)
+        used_symbols = self.symbol_index.symbols
         
         # Keep a small buffer for recently used symbols
         symbols_to_remove = []
@@ -673,6 +863,34 @@ class InMemoryPropMonitoring:
                 del self.symbol[symbol]
             logger.info(f"Cleaned up {len(symbols_to_remove[:50])} unused symbols")
 
+    def memory_report(self, top: int = 20) -> dict:
+        """Approximate bytes held by deal-based rule state, per login and in total"""
+        def record_size(obj) -> int:
+            size = sys.getsizeof(obj)
+            if hasattr(obj, "__dict__"):
+                size += sys.getsizeof(obj.__dict__)
+            return size
+
+        logins = {}
+        for login, deal_entry in self.deals.items():
+            size = sys.getsizeof(deal_entry) + sum(record_size(d) for d in deal_entry.values())
+            tracker = self.strategies.get(login)
+            if tracker:
+                size += sys.getsizeof(tracker.keys) + sys.getsizeof(tracker.entries) + sys.getsizeof(tracker.key_of)
+            window = self.trade_rates.get(login)
+            if window:
+                size += sys.getsizeof(window.minute) + sys.getsizeof(window.hour)
+            logins[login] = {"deals": len(deal_entry), "evicted": deal_entry.evicted, "bytes": size}
+
+        largest = sorted(logins.items(), key=lambda item: item[1]["bytes"], reverse=True)[:top]
+        report = {
+            "logins": len(logins),
+            "total_bytes": sum(item["bytes"] for item in logins.values()),
+            "largest": dict(largest),
+        }
+        logger.info(f"Deal state memory: {report['total_bytes']} bytes over {report['logins']} logins")
+        return report
+
 
 
 
@@ -685,8 +903,8 @@ class InMemoryPropMonitoring:
         try:
             stats = self.account_stat(login)
             
-            # Add drawdown data
-            today = now().date()
+            # Add drawdown data, for the same day update_drawdown enforces
+            today = self.today
             account = self.local_accounts.get(login, None)
             daily_dd = self.daily_drawdowns.get(login, {}).get(today)
             total_dd = self.total_drawdown.get(login)
@@ -708,14 +926,13 @@ class InMemoryPropMonitoring:
             })
             
             group_name = f"account_{login}"
-            async_to_sync(channel_layer.group_send)(
+            self.broadcaster.publish(
                 group_name,
                 {
                     "type": "account_update",  # This maps to consumer handler
                     "data": json.dumps(stats, default=decimal_default),
                 }
             )
-            print("Broadcasted:", login)
             
         except Exception as e:
             logger.error(f"Error broadcasting stats for {login}: {e}")
@@ -730,20 +947,25 @@ class InMemoryPropMonitoring:
             'balance': 0, 'equity': 0,
             'avg_winning_trade': 0, 'avg_losing_trade': 0,
             'profit_target': 0, 'profit': 0,
-            'win_ratio': 0, 'profit_factor': 0
+            'win_ratio': 0, 'profit_factor': 0,
+            'trades_last_minute': 0, 'trades_last_hour': 0
         }
 
         acc = self.local_accounts.get(login)
         if not acc:
             return data
+        if self.breach_index is not None and login in self.breach_index:
+            # Parked accounts are not revalued on every tick
+            self.update_account_equity(login)
 
         winning = Decimal(0)
         losing = Decimal(0)
         winning_count = 0
         losing_count = 0
 
-        positions = self.positions.get(login, [])
-        for pos in positions:
+        positions = self.positions.get(login, {})
+        self._fill_position_profits(positions.values())
+        for pos in positions.values():
             if pos.profit > 0:
                 winning += Decimal(pos.profit)
                 winning_count += 1
@@ -768,6 +990,8 @@ class InMemoryPropMonitoring:
         else:
             profit_factor = winning / abs(losing)
 
+        trades_last_minute, trades_last_hour = self.trade_rates[login].counts() if login in self.trade_rates else (0, 0)
+
         data.update({
             'balance': acc.balance,
             'equity': acc.equity,
@@ -777,6 +1001,8 @@ class InMemoryPropMonitoring:
             'profit': acc.profit,
             'win_ratio': win_ratio,
             'profit_factor': profit_factor,
+            'trades_last_minute': trades_last_minute,
+            'trades_last_hour': trades_last_hour,
         })
 
         return data
@@ -889,8 +1115,8 @@ class InMemoryPropMonitoring:
         """
         try:
             # logger.info(f"Broadcasting: {login} ")
-            # Get competition UUID from Redis
-            competition_uuid = redis_client.hget(f"user:{login}", "competition_uuid")
+            # Get competition UUID (cached from Redis)
+            competition_uuid = self.metrics.competition_of(login)
             # logger.info(f"Competition uuid: {competition_uuid}")
             if not competition_uuid:
                 return  # Not in competition
@@ -906,21 +1132,13 @@ class InMemoryPropMonitoring:
             if not stats:
                 return
             
-            # Update Redis (fast - ~0.1ms)
-            redis_client.hset(f"user:{login}", mapping={
+            # Queue the Redis writes, the leaderboard is broadcast after the next flush
+            self.metrics.set_user(login, {
                 k: str(v) for k, v in stats.items()
             })
             
             # Update leaderboard sorted set
-            redis_client.zadd(
-                f"competition:{competition_uuid}:leaderboard",
-                {login: stats["score"]}
-            )
-            
-            # logger.info("Rounding up broadcasting")
-            # Broadcast to frontend via Channels
-            self.broadcast_competition_leaderboard(competition_uuid)
-            # logger.info("Broadcasted")
+            self.metrics.set_score(competition_uuid, login, stats["score"])
 
         except Exception as e:
             traceback.print_exc()
@@ -947,9 +1165,8 @@ class InMemoryPropMonitoring:
             
             max_drawdown = abs(total_dd.drawdown_percent) if total_dd else Decimal("0")
             
-            # Trade stats from Redis
-            total_trades = int(redis_client.hget(f"user:{login}", "total_trades") or 0)
-            winning_trades = int(redis_client.hget(f"user:{login}", "winning_trades") or 0)
+            # Trade stats (kept in memory by the metrics buffer)
+            total_trades, winning_trades = self.metrics.trade_counts(login)
             win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else Decimal("0")
             
             # Competition score (return / drawdown ratio)
@@ -978,13 +1195,14 @@ class InMemoryPropMonitoring:
 
     def is_competition_active(self, competition_uuid: str) -> bool:
         """Check if competition is still active"""
-        status = redis_client.hget(f"competition:{competition_uuid}:meta", "status")
+        meta = self.metrics.competition_meta(competition_uuid)
+        status = meta.get("status")
         
         if status != "active":
             return False
         
         # Check end date
-        end_date_str = redis_client.hget(f"competition:{competition_uuid}:meta", "end_date")
+        end_date_str = meta.get("end_date")
         if end_date_str:
             end_date = datetime.fromisoformat(end_date_str)
             if datetime.now(timezone.utc) > end_date:
@@ -1008,9 +1226,14 @@ class InMemoryPropMonitoring:
                 withscores=True
             )
             
+            # One round-trip for all the user hashes
+            pipe = redis_client.pipeline(transaction=False)
+            for login, _ in top_logins:
+                pipe.hgetall(f"user:{login}")
+            users_data = pipe.execute() if top_logins else []
+
             leaderboard = []
-            for rank, (login, score) in enumerate(top_logins, 1):
-                user_data = redis_client.hgetall(f"user:{login}")
+            for rank, ((login, score), user_data) in enumerate(zip(top_logins, users_data), 1):
                 
                 if user_data:
                     leaderboard.append({
@@ -1026,7 +1249,7 @@ class InMemoryPropMonitoring:
                         "score": float(score)
                     })
             
-            async_to_sync(channel_layer.group_send)(
+            self.broadcaster.publish(
                 f"competition_{competition_uuid}",
                 {
                     "type": "leaderboard_update",
@@ -1041,128 +1264,565 @@ class InMemoryPropMonitoring:
             traceback.print_exc()
             logger.error(f"Error broadcasting leaderboard for {competition_uuid}: {e}")
 
+    #===============================================================================================
+    # ADMIN ACTIONS
+    #===============================================================================================
+    def finalize_competition(self, competition_uuid: str):
+        """
+        Finalize competition - save final results from Redis to database
+        Called when admin sends Kafka signal. Every instance receives it (broadcast
+        topic) and flushes its scores, only the one taking the finalize lock persists
+        the results and notifies viewers.
+        """
+        lock = f"competition:{competition_uuid}:finalized"
+        locked = False
+        try:
+            logger.info(f"Finalizing competition {competition_uuid}")
+            # Pending scores must be in the leaderboard before it is read
+            self.metrics.flush()
+            self.metrics.forget_competition(competition_uuid)
+            locked = bool(redis_client.set(lock, "1", nx=True, ex=self.COMPETITION_RESULTS_TTL))
+            if not locked:
+                logger.info(f"Competition {competition_uuid} is finalized by another instance")
+                return
+            ended_at = datetime.now(timezone.utc).isoformat()
+            # 1. Mark as ended in Redis
+            redis_client.hset(f"competition:{competition_uuid}:meta", "status", "ended")
+            redis_client.hset(f"competition:{competition_uuid}:meta", "ended_at", ended_at)
+            
+            # 2. Get ALL participants from Redis leaderboard
+            all_participants = redis_client.zrevrange(
+                f"competition:{competition_uuid}:leaderboard",
+                0, -1,  # ALL participants
+                withscores=True
+            )
+            
+            if not all_participants:
+                logger.warning(f"No participants found for competition {competition_uuid}")
+                return
+            
+            # 3. Queue database persistence via Celery (async, doesn't block)
+            persist_competition_results_task.delay(
+                competition_uuid=competition_uuid,
+                participants_data=self._prepare_results_data(all_participants)
+            )
+            
+            # 4. Broadcast to frontend
+            self.broadcast_competition_ended(competition_uuid, len(all_participants))
+            
+            logger.info(f"Competition {competition_uuid} finalized with {len(all_participants)} participants")
+            
+        except Exception as e:
+            logger.error(f"Error finalizing competition {competition_uuid}: {e}", exc_info=True)
+            # Let a resent finalize signal try again
+            if locked:
+                redis_client.delete(lock)
+
 
+    def _prepare_results_data(self, participants: list) -> list:
+        """Prepare results data for database persistence"""
+        results = []
+        
+        for rank, (login, score) in enumerate(participants, 1):
+            user_data = redis_client.hgetall(f"user:{login}")
+            
+            if user_data:
+                results.append({
+                    "rank": rank,
+                    "login": int(login),
+                    "username": user_data.get("username", ""),
+                    "starting_balance": float(user_data.get("starting_balance", 0)),
+                    "final_equity": float(user_data.get("current_equity", 0)),
+                    "profit": float(user_data.get("profit", 0)),
+                    "return_percent": float(user_data.get("return_percent", 0)),
+                    "max_drawdown": float(user_data.get("max_drawdown", 0)),
+                    "total_trades": int(user_data.get("total_trades", 0)),
+                    "winning_trades": int(user_data.get("winning_trades", 0)),
+                    "win_rate": float(user_data.get("win_rate", 0)),
+                    "score": float(score)
+                })
+        
+        return results
 
 
+    def cleanup_competition_memory(self, competition_uuid: str):
+        """
+        Clean up in-memory state for ended competition
+        Free up RAM by removing competition-related data
+        """
+        try:
+            logger.info(f"Cleaning up in-memory state for competition {competition_uuid}")
+            
+            # 1. Find all accounts in this competition
+            accounts_to_cleanup = []
+            for login, competition in self.account_competition.items():
+                if str(competition.uuid) == competition_uuid:
+                    accounts_to_cleanup.append(login)
+            
+            # 2. Remove competition references from memory
+            for login in accounts_to_cleanup:
+                # Remove from account_competition mapping
+                if login in self.account_competition:
+                    del self.account_competition[login]
+                    logger.debug(f"Removed competition reference for account {login}")
+                
+                # Clear competition_uuid from Redis user hash
+                redis_client.hdel(f"user:{login}", "competition_uuid")
+                self.metrics.leave(login)
+            
+            # 3. Optional: Keep Redis data for some time (7 days) then cleanup
+            # Or immediately delete if you want to free Redis memory
+            ttl_seconds = self.COMPETITION_RESULTS_TTL
+            ttl_days = ttl_seconds // (24 * 60 * 60)
+            
+            # Set expiry on competition data
+            redis_client.expire(f"competition:{competition_uuid}:meta", ttl_seconds)
+            redis_client.expire(f"competition:{competition_uuid}:leaderboard", ttl_seconds)
+            
+            logger.info(f"Cleaned up {len(accounts_to_cleanup)} accounts from competition {competition_uuid}")
+            logger.info(f"Redis data will expire in {ttl_days} days")
+            
+        except Exception as e:
+            logger.error(f"Error cleaning up competition memory: {e}", exc_info=True)
 
+    
+    def broadcast_competition_ended(self, competition_uuid: str, total_participants: int):
+        """Notify all viewers that competition has ended"""
+        self.broadcaster.publish(
+            f"competition_{competition_uuid}",
+            {
+                "type": "competition_ended",
+                "data": {
+                    "message": "Competition has ended. Final results have been saved.",
+                    "total_participants": total_participants,
+                    "ended_at": datetime.now(timezone.utc).isoformat()
+                }
+            }
+        )
 
-c = Consumer({
-    "bootstrap.servers": "localhost:9092",
-    "group.id": "rule-engine",
-    "auto.offset.reset": "earliest",
-    "enable.auto.commit": True,
-    "auto.commit.interval.ms": 5000
-})
+    #===============================================================================================
+    # BREACH INDEX
+    #===============================================================================================
+    def _park(self, login: int):
+        """
+        Put a login whose equity follows a single price (one side of one USD-quoted symbol)
+        in the breach index, with the price band inside which no loss floor is breached and
+        no high (which the floors follow) moves. Lows are display stats, they are sampled
+        whenever the account is evaluated. Anything else stays on the per-tick path.
+        """
+        if self.breach_index is None or login in self.account_competition:
+            return
+        symbols = self.exposure.symbols(login)
+        if len(symbols) != 1:
+            return
+        (symbol, exposure), = symbols.items()
+        tick = self.symbol.get(symbol)
+        if not tick or self.converter.get_quote_currency(symbol) != "USD":
+            return
 
-c.subscribe([
-    "account_challenge_initiate", "account_competition_initiate", "market.ticks", 
-    "accounts.state", "accounts.load", 
-    "accounts.position", "accounts.position.remove", "accounts.position.update",
-    "accounts.deal", "accounts.deal.remove", "accounts.deal.update",
-])
+        account = self.local_accounts.get(login)
+        plan = self.rule_plans.get(login)
+        dd = self.daily_drawdowns.get(login, {}).get(self.today)
+        td = self.total_drawdown.get(login)
+        watermark = self.account_watermarks.get(login)
+        if not (account and plan and dd and td and watermark):
+            return
 
-monitor = InMemoryPropMonitoring()
-while True:
-    msg = c.poll(1.0)
-    if msg is None:
-        continue
-    if msg.error():
-        print("Error:", msg.error())
-        continue
-    
-    try:
-        if msg.topic() == "market.ticks":
-            tick = TickData(**json.loads(msg.value().decode("utf-8")))
-            monitor.OnTick(tick.symbol, tick)
-            # print(f"Received tick {tick.symbol}")
-
-        elif msg.topic() == "accounts.state":
-            account = AccountData(**json.loads(msg.value().decode("utf-8")))
-            monitor.update_account(account)
-            print(f"Updated account {account.login}")
-
-        elif msg.topic() == 'account_competition_initiate':
-            data = json.loads(msg.value().decode("utf-8"))
-            login=data['login']
-            competition = CompetitionData.from_dict(data['competition'])
-            # print(competition)
-            monitor.account_competition[login] = competition
-
-            competition_uuid = str(competition.uuid)
-            # Store competition UUID for this account in Redis
-            redis_client.hset(f"user:{login}", "competition_uuid", competition_uuid)
-            # Initialize trade counters
-            redis_client.hset(f"user:{login}", mapping={
-                "total_trades": "0",
-                "winning_trades": "0",
-                "username": f"Trader_{login}"
-            })  
-            # Initialize competition metadata (if first participant)
-            if not redis_client.exists(f"competition:{competition_uuid}:meta"):
-                redis_client.hset(f"competition:{competition_uuid}:meta", mapping={
-                    "uuid": competition_uuid,
-                    "name": competition.name,
-                    "status": "active",
-                    "start_date": competition.start_date.isoformat(),
-                    "end_date": competition.end_date.isoformat(),
-                    "starting_balance": str(competition.starting_balance)
-                })
+        lower = max(plan.daily_floor, plan.total_floor)
+        upper = min(float(dd.equity_high), float(td.equity_peak), float(watermark.hwm_equity))
+        balance = float(account.balance)
+        if exposure.buy_units > 0 and exposure.sell_units < 1e-9:
+            # equity = balance + units * bid - cost
+            side, price, units = BreachIndex.BID, tick.bid, exposure.buy_units
+            low = (lower - balance + exposure.buy_cost) / units
+            high = (upper - balance + exposure.buy_cost) / units
+        elif exposure.sell_units > 0 and exposure.buy_units < 1e-9:
+            # equity = balance + cost - units * ask
+            side, price, units = BreachIndex.ASK, tick.ask, exposure.sell_units
+            low = (balance + exposure.sell_cost - upper) / units
+            high = (balance + exposure.sell_cost - lower) / units
+        else:
+            return  # hedged on the symbol, equity moves with the spread
 
-            print(f"Account {login} registered to competition {competition_uuid}")
-
-        elif msg.topic() == "account_challenge_initiate":
-            data = json.loads(msg.value().decode("utf-8"))
-            login=data['login']
-            account_data = data['account']
-            challenge = PropFirmChallengeData(**data['challenge'])
-
-            #Update Vital account data
-            monitor.local_accounts.get(login).created_at = account_data['created_at']
-            monitor.local_accounts.get(login).active = account_data['active']
-            monitor.local_accounts.get(login).step = account_data['step']
-            #Map the account challenge
-            monitor.account_challenge[login] = challenge
-            print(f"Account challenge received {login}")
-
-        elif msg.topic() == "accounts.position":
-            pos = PositionData(**json.loads(msg.value().decode("utf-8")))
-            monitor.add_position(pos)
-            print(f"Added Position {pos.login}")
-
-        elif msg.topic() == "accounts.position.update":
-            pos = PositionData(**json.loads(msg.value().decode("utf-8")))
-            monitor.update_position(pos)
-            print(f"Added Position {pos.login}")
-        
-        elif msg.topic() == "accounts.position.remove":
-            pos = PositionData(**json.loads(msg.value().decode("utf-8")))
-            monitor.remove_position(pos)
+        # Reach the edges a hair early, float revaluation may round either way
+        slack = price * 1e-9
+        self.breach_index.place(login, symbol, side, low + slack, high - slack)
+        if not self.scheduler.pending(login, "refresh"):
+            # Parked accounts still get revalued (stats, broadcasts) now and then
+            self.scheduler.schedule(login, "refresh", time.time() + self.BREACH_REFRESH_INTERVAL)
 
-            # 1. Update trade counters in Redis (FAST)
-            redis_client.hincrby(f"user:{pos.login}", "total_trades", 1)
-            if float(pos.profit) > 0:
-                redis_client.hincrby(f"user:{pos.login}", "winning_trades", 1)
-            # 2. Remove from local positions
-            monitor.remove_position(pos)
+    def _unpark(self, login: int):
+        if self.breach_index is not None:
+            self.breach_index.remove(login)
 
-            print(f"Position Removed {pos.position_id}, , Profit: {pos.profit}")
+    def _refresh_parked(self, login: int):
+        if self.breach_index is None or login not in self.breach_index:
+            return
+        self._unpark(login)
+        account = self.local_accounts.get(login)
+        if account:
+            self._evaluate_account(account)
 
-        
-        elif msg.topic() == "accounts.deal":
-            deal = DealData(**json.loads(msg.value().decode("utf-8")))
-            monitor.add_deal(deal)
-            print(f"Added Deal {deal.login}")
-        
-        elif msg.topic() == "accounts.deal.update":
-            deal = DealData(**json.loads(msg.value().decode("utf-8")))
-            monitor.update_deal(deal)
-            print(f"Updated Deal {deal.login}")
-
-        elif msg.topic() == "accounts.deal.remove":
-            deal = DealData(**json.loads(msg.value().decode("utf-8")))
-            monitor.remove_deal(deal)
-            print(f"Deal Removed {deal.login}")
-    
-    except Exception as err:
-        print(f"ERROR OCCURED: {str(err)}")
-        traceback.print_exc()
\ No newline at end of file
+    #===============================================================================================
+    # CALENDAR RULES
+    #===============================================================================================
+    def _schedule_calendar_rules(self, login: int):
+        """(Re)arm the trading-period deadline of a login, it fires once when its day starts"""
+        self.scheduler.cancel(login, "max_days")
+        challenge = self.account_challenge.get(login)
+        started = self.challenge_start.get(login)
+        if not challenge or not started:
+            return
+        #Funded accounts have no trading period
+        if challenge.challenge_class in ['skill_check_funding', 'challenge_funding']:
+            return
+
+        # Rules compare whole days elapsed since the start date: "> allowed" first holds
+        # at the start of day started + allowed + 1
+        total_allowed_days = (challenge.max_trading_days or 0) + (challenge.additional_trading_days or 0)
+        self.scheduler.schedule(login, "max_days", day_start(started + timedelta(days=total_allowed_days + 1)))
+
+    def run_scheduled(self):
+        """Fire the calendar rules whose deadline has passed"""
+        for login, kind in self.scheduler.pop_due(time.time()):
+            try:
+                if kind == "day_rollover":
+                    self._roll_day()
+                elif kind == "max_days":
+                    self._max_days_due(login)
+                elif kind == "refresh":
+                    self._refresh_parked(login)
+                else:
+                    for evaluator in self.evaluators:
+                        evaluator.fire(login, kind)
+            except Exception as err:
+                logger.error(f"Error running {kind} for {login}: {err}", exc_info=True)
+
+    def _roll_day(self):
+        self.today = now().date()
+        if self.breach_index is not None:
+            # Bands were solved against yesterday's highs and lows
+            self.breach_index.clear()
+        self.cleanup_old_daily_drawdowns()
+        self.scheduler.schedule(None, "day_rollover", day_start(self.today + timedelta(days=1)))
+        logger.info(f"Daily drawdown rolled over to {self.today}")
+
+    def _max_days_due(self, login: int):
+        account = self.local_accounts.get(login)
+        challenge = self.account_challenge.get(login)
+        if not account or not challenge:
+            return
+        if login in self.lock_account:
+            # Account is being passed/failed right now, look again shortly
+            self.scheduler.schedule(login, "max_days", time.time() + 60)
+            return
+
+        violations = self.rule_checker._check_max_days(account, challenge, self.challenge_start.get(login))
+        if not violations:
+            return
+        self.lock_account.add(login)
+        try:
+            self._handle_account_rules_violation(login, violations)
+            self._challenge_failed(login, violations, challenge)
+        finally:
+            self.lock_account.discard(login)
+
+    #===============================================================================================
+    # SNAPSHOT
+    #===============================================================================================
+    def snapshot_state(self) -> dict:
+        return {name: getattr(self, name) for name in self.SNAPSHOT_FIELDS}
+
+    def restore_state(self, state: dict):
+        """Load snapshot fields and rebuild the indexes derived from open positions"""
+        for name in self.SNAPSHOT_FIELDS:
+            if name in state:
+                setattr(self, name, state[name])
+        for positions in self.positions.values():
+            for pos in positions.values():
+                self._track_position(pos, True)
+        for deals in self.deals.values():
+            for deal in deals.values():
+                self._track_deal(deal)
+        for login in self.account_challenge:
+            self._schedule_calendar_rules(login)
+            self._compile_rule_plan(login)
+        logger.info(f"Restored {len(self.local_accounts)} accounts from snapshot")
+
+    #===============================================================================================
+    # CONSUMER
+    #===============================================================================================
+    def run(self, sharded: Optional[bool] = None):
+        sharded = settings.MONITOR_SHARDED if sharded is None else sharded
+        config = {
+            "bootstrap.servers": "localhost:9092",
+            "group.id": "rule-engine",
+            "auto.offset.reset": "earliest",
+            "enable.auto.commit": True,
+            "auto.commit.interval.ms": 5000,
+            **telemetry.consumer_stats(),
+        }
+        telemetry.start(settings.MONITOR_METRICS_PORT)
+        broadcast = None
+        topics = list(self.ACCOUNT_TOPICS)
+        for evaluator in self.evaluators:
+            topics.extend(evaluator.topics)
+
+        snapshot = None
+        restored = None
+        if settings.MONITOR_SNAPSHOT_PATH:
+            snapshot = MonitorSnapshot(settings.MONITOR_SNAPSHOT_PATH, settings.MONITOR_SNAPSHOT_INTERVAL)
+            restored = snapshot.load()
+            if restored:
+                self.restore_state(restored["state"])
+        if sharded or snapshot:
+            self.ownership = PartitionOwnership(
+                self.cleanup_completed_account,
+                rebuild=sharded,
+                start_offsets=restored["offsets"] if restored else None,
+                login_partition=restored["login_partition"] if restored else None,
+            )
+
+        if sharded:
+            # Account topics are split across the instances of the "rule-engine" group.
+            # Range assignment keeps the same partition number of every topic on one instance.
+            config["partition.assignment.strategy"] = "range"
+            c = Consumer(config)
+            c.subscribe([topic for topic in topics if topic not in self.BROADCAST_TOPICS],
+                        **self._assignment_callbacks())
+
+            # Every instance needs every tick, all partitions are assigned to it directly
+            broadcast = Consumer({
+                "bootstrap.servers": "localhost:9092",
+                "group.id": "rule-engine-ticks",
+                "enable.auto.commit": False,
+                **telemetry.consumer_stats(),
+            })
+            assign_all(broadcast, ["market.ticks"] + [topic for topic in topics if topic in self.BROADCAST_TOPICS], OFFSET_END)
+            logger.info(f"Rule engine running sharded as {instance_id()}")
+        else:
+            c = Consumer(config)
+            c.subscribe(["market.ticks"] + topics, **self._assignment_callbacks())
+
+        # Symbol specs are compacted, every instance reads all of them on start
+        specs = Consumer({
+            "bootstrap.servers": "localhost:9092",
+            "group.id": "rule-engine-specs",
+            "enable.auto.commit": False,
+        })
+        assign_all(specs, ["symbols.spec"], OFFSET_BEGINNING)
+
+        batch_size = settings.MONITOR_CONSUME_BATCH_SIZE
+        batch_wait = settings.MONITOR_CONSUME_WAIT
+        sampled = 0.0
+
+        while True:
+            messages = c.consume(num_messages=batch_size, timeout=batch_wait)
+            self.run_scheduled()
+            if broadcast is not None:
+                messages = list(messages) + broadcast.consume(num_messages=batch_size, timeout=0)
+            messages = list(messages) + specs.consume(num_messages=batch_size, timeout=0)
+            if messages:
+                self.process_batch(messages)
+            self.flush_metrics()
+            if time.monotonic() - sampled >= self.METRICS_SAMPLE_INTERVAL:
+                sampled = time.monotonic()
+                self.sample_metrics()
+            if snapshot:
+                snapshot.maybe_save(self.snapshot_state(), self.ownership.offsets, self.ownership.login_partition)
+
+    def flush_metrics(self, force: bool = False):
+        competitions = self.metrics.flush() if force else self.metrics.maybe_flush()
+        for competition_uuid in competitions:
+            self.broadcast_competition_leaderboard(competition_uuid)
+
+    def sample_metrics(self):
+        telemetry.ACCOUNTS.set(len(self.local_accounts))
+        telemetry.POSITIONS.set(sum(len(positions) for positions in self.positions.values()))
+
+    def _assignment_callbacks(self) -> dict:
+        if self.ownership is None:
+            return {}
+        return {
+            "on_assign": self.ownership.on_assign,
+            "on_revoke": self.ownership.on_revoke,
+            "on_lost": self.ownership.on_lost,
+        }
+
+    def process_batch(self, messages):
+        """
+        Apply account/position/deal events in arrival order, then run OnTick once per
+        symbol with the latest tick of the batch. Older ticks are superseded and skipped.
+        """
+        latest_ticks: Dict[str, TickData] = {}
+        consumed: Dict[str, int] = {}
+        for msg in messages:
+            if msg.error():
+                print("Error:", msg.error())
+                continue
+            consumed[msg.topic()] = consumed.get(msg.topic(), 0) + 1
+
+            if msg.topic() == "market.ticks":
+                try:
+                    tick = wire.decode(msg, TickData)
+                except Exception as err:
+                    print(f"ERROR OCCURED: {str(err)}")
+                    traceback.print_exc()
+                    continue
+                current = latest_ticks.get(tick.symbol)
+                # Ticks of one symbol can come from different partitions, keep the newest
+                if current is None or tick.datetime_msc >= current.datetime_msc:
+                    latest_ticks[tick.symbol] = tick
+                continue
+
+            replay = False
+            if self.ownership is not None and msg.topic() not in self.BROADCAST_TOPICS:
+                self.ownership.track(msg)
+                replay = self.ownership.is_replay(msg)
+            self.handle_message(msg, replay)
+
+        for topic, count in consumed.items():
+            telemetry.MESSAGES.labels(topic).inc(count)
+
+        for symbol, tick in latest_ticks.items():
+            started = time.perf_counter()
+            try:
+                self.OnTick(symbol, tick)
+            except Exception as err:
+                print(f"ERROR OCCURED: {str(err)}")
+                traceback.print_exc()
+            telemetry.ONTICK_SECONDS.observe(time.perf_counter() - started)
+
+    def handle_message(self, msg, replay: bool = False):
+        """Apply one message, replayed messages (see PartitionOwnership) only rebuild in-memory state"""
+        try:
+            if msg.topic() == "market.ticks":
+                tick = wire.decode(msg, TickData)
+                self.OnTick(tick.symbol, tick)
+
+            elif msg.topic() == "symbols.spec":
+                if msg.value() is None:
+                    self.remove_symbol_spec(msg.key().decode("utf-8"))
+                else:
+                    self.apply_symbol_spec(SymbolSpecData(**json.loads(msg.value().decode("utf-8"))))
+                # print(f"Received tick {tick.symbol}")
+
+            elif msg.topic() == "accounts.state":
+                account = wire.decode(msg, AccountData)
+                if replay:
+                    self.local_accounts[account.login] = account
+                else:
+                    self.update_account(account)
+                print(f"Updated account {account.login}")
+
+            elif msg.topic() == 'account_competition_initiate':
+                data = json.loads(msg.value().decode("utf-8"))
+                login=data['login']
+                competition = CompetitionData.from_dict(data['competition'])
+                # print(competition)
+                self.account_competition[login] = competition
+                if replay:
+                    return
+
+                competition_uuid = str(competition.uuid)
+                # Store competition UUID for this account in Redis
+                redis_client.hset(f"user:{login}", "competition_uuid", competition_uuid)
+                # Initialize trade counters
+                redis_client.hset(f"user:{login}", mapping={
+                    "total_trades": "0",
+                    "winning_trades": "0",
+                    "username": f"Trader_{login}"
+                })  
+                # Initialize competition metadata (if first participant)
+                if not redis_client.exists(f"competition:{competition_uuid}:meta"):
+                    redis_client.hset(f"competition:{competition_uuid}:meta", mapping={
+                        "uuid": competition_uuid,
+                        "name": competition.name,
+                        "status": "active",
+                        "start_date": competition.start_date.isoformat(),
+                        "end_date": competition.end_date.isoformat(),
+                        "starting_balance": str(competition.starting_balance)
+                    })
+
+                self.metrics.join(login, competition_uuid)
+
+                print(f"Account {login} registered to competition {competition_uuid}")
+
+            elif msg.topic() == "account_challenge_initiate":
+                data = json.loads(msg.value().decode("utf-8"))
+                login=data['login']
+                account_data = data['account']
+                challenge = PropFirmChallengeData(**data['challenge'])
+
+                #Update Vital account data
+                created_at = account_data['created_at']
+                if isinstance(created_at, str):
+                    created_at = parse_datetime(created_at)
+                self.local_accounts.get(login).created_at = created_at
+                self.local_accounts.get(login).active = account_data['active']
+                self.local_accounts.get(login).step = account_data['step']
+                #Map the account challenge
+                self.account_challenge[login] = challenge
+                self._resize_deal_retention(login)
+                self._compile_rule_plan(login)
+                if created_at:
+                    self.challenge_start[login] = created_at.date()
+                self._schedule_calendar_rules(login)
+                print(f"Account challenge received {login}")
+
+            elif msg.topic() == "accounts.position":
+                pos = wire.decode(msg, PositionRecord)
+                self.add_position(pos, replay)
+                print(f"Added Position {pos.login}")
+
+            elif msg.topic() == "accounts.position.update":
+                pos = wire.decode(msg, PositionRecord)
+                self.update_position(pos)
+                print(f"Added Position {pos.login}")
+
+            elif msg.topic() == "accounts.position.remove":
+                pos = wire.decode(msg, PositionRecord)
+                self.remove_position(pos)
+                if replay:
+                    return
+
+                # 1. Update trade counters (buffered, flushed to Redis in batches)
+                self.metrics.record_trade(pos.login, float(pos.profit) > 0)
+                # 2. Remove from local positions
+                self.remove_position(pos)
+
+                print(f"Position Removed {pos.position_id}, , Profit: {pos.profit}")
+
+
+            elif msg.topic() == "accounts.deal":
+                deal = wire.decode(msg, DealRecord)
+                self.add_deal(deal, replay)
+                print(f"Added Deal {deal.login}")
+
+            elif msg.topic() == "accounts.deal.update":
+                deal = wire.decode(msg, DealRecord)
+                self.update_deal(deal, replay)
+                print(f"Updated Deal {deal.login}")
+
+            elif msg.topic() == "accounts.deal.remove":
+                deal = wire.decode(msg, DealRecord)
+                self.remove_deal(deal)
+                print(f"Deal Removed {deal.login}")
+
+            elif msg.topic() == "competition.control":
+                control_msg = json.loads(msg.value().decode("utf-8"))
+
+                if control_msg.get("action") == "finalize_competition":
+                    competition_uuid = control_msg.get("competition_uuid")
+
+                    logger.info(f"Received finalize signal for competition {competition_uuid}")
+
+                    # Finalize competition immediately
+                    self.finalize_competition(competition_uuid)
+
+                    # Clean up in-memory state
+                    self.cleanup_competition_memory(competition_uuid)
+
+        except Exception as err:
+            print(f"ERROR OCCURED: {str(err)}")
+            traceback.print_exc()
@@ -0,0 +1,274 @@
+import json, os, random, sys, time
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+
+#===============================================================================================
+# MESSAGES
+#===============================================================================================
+class ReplayMessage:
+    """Stands in for a confluent_kafka Message, the monitor only reads these accessors"""
+    __slots__ = ('_topic', '_value', '_key', '_partition', '_offset', '_headers', 'timestamp')
+
+    def __init__(self, topic: str, value: Optional[bytes], key: Optional[bytes] = None,
+                 partition: int = 0, offset: int = 0, timestamp: float = 0.0, headers: Optional[list] = None):
+        self._topic = topic
+        self._value = value
+        self._key = key
+        self._partition = partition
+        self._offset = offset
+        self._headers = headers
+        self.timestamp = timestamp
+
+    def topic(self): return self._topic
+    def value(self): return self._value
+    def key(self): return self._key
+    def partition(self): return self._partition
+    def offset(self): return self._offset
+    def headers(self): return self._headers
+    def error(self): return None
+
+
+def _message(topic: str, value, key=None, timestamp: float = 0.0, partition: int = 0, offset: int = 0) -> ReplayMessage:
+    payload = None if value is None else json.dumps(value, default=str).encode("utf-8")
+    key = None if key is None else str(key).encode("utf-8")
+    return ReplayMessage(topic, payload, key, partition, offset, timestamp)
+
+
+def load_dumps(paths: Iterable[str]) -> List[ReplayMessage]:
+    """
+    Recorded topic dumps, one JSON object per line, merged in timestamp order.
+    A line is either an envelope {"timestamp": seconds, "value": ..., "key"?, "topic"?, "partition"?}
+    or a bare value (a tick's datetime_msc is then its timestamp). The topic defaults
+    to the file name, market.ticks.jsonl holds market.ticks.
+    """
+    messages = []
+    for path in paths:
+        default_topic = os.path.basename(path)
+        if default_topic.endswith(".jsonl"):
+            default_topic = default_topic[:-len(".jsonl")]
+        with open(path, "r", encoding="utf-8") as f:
+            for offset, line in enumerate(f):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if isinstance(record, dict) and "value" in record:
+                    messages.append(_message(
+                        record.get("topic", default_topic), record["value"], record.get("key"),
+                        float(record.get("timestamp", 0)), int(record.get("partition", 0)), offset,
+                    ))
+                else:
+                    timestamp = record.get("datetime_msc", 0) / 1000 if isinstance(record, dict) else 0
+                    messages.append(_message(default_topic, record, None, timestamp, 0, offset))
+    # Stable sort, messages of one timestamp keep their file order
+    messages.sort(key=lambda msg: msg.timestamp)
+    return messages
+
+
+SYMBOLS = {
+    "EURUSD.p": 1.0850, "GBPUSD.p": 1.2650, "AUDUSD.p": 0.6550, "NZDUSD.p": 0.6050,
+    "USDJPY.p": 151.20, "USDCHF.p": 0.8850, "USDCAD.p": 1.3550, "XAUUSD.p": 2350.0,
+}
+
+
+def synthetic_scenario(accounts: int, positions: int, ticks: int, tick_rate: float,
+                       symbols: Optional[int] = None, seed: int = 7) -> List[ReplayMessage]:
+    """
+    N two-step challenge accounts with M open positions each, then a random walk of
+    ticks spaced 1 / tick_rate seconds apart. Everything goes through the same topics
+    and payloads the bridge publishes.
+    """
+    from sub_manager.InMemoryData import PropFirmChallengeData
+
+    rng = random.Random(seed)
+    prices = dict(list(SYMBOLS.items())[:symbols or len(SYMBOLS)])
+    names = list(prices)
+    started = datetime.now(timezone.utc)
+    challenge = asdict(PropFirmChallengeData(
+        name="replay", firm_name="replay", description="", challenge_type="two_step",
+        account_size=100000, challenge_fee=1, max_daily_loss_percent=5, max_total_loss_percent=10,
+        profit_target_percent=8, phase_2_profit_target_percent=5, max_trades_per_minute=1000,
+        max_trades_per_hour=100000, min_trade_duration_seconds=0, max_orders_per_symbol=1000,
+    ))
+
+    messages = []
+
+    def tick(symbol: str, timestamp: float):
+        bid = prices[symbol]
+        msc = int(timestamp * 1000)
+        messages.append(_message("market.ticks", {
+            "symbol": symbol, "datetime": msc // 1000, "bid": bid, "ask": bid * 1.0001, "last": bid,
+            "volume": 0, "datetime_msc": msc, "volume_ext": 0,
+        }, symbol, timestamp))
+
+    # Conversion rates exist before the first account is revalued
+    for symbol in names:
+        tick(symbol, 0.0)
+
+    position_id = 0
+    for login in range(1, accounts + 1):
+        messages.append(_message("accounts.state", {
+            "login": login, "balance": 100000.0, "equity": 100000.0, "margin_leverage": 100,
+        }, login))
+        messages.append(_message("account_challenge_initiate", {
+            "login": login, "challenge": challenge,
+            "account": {"created_at": started.isoformat(), "active": True, "step": 1},
+        }, login))
+        for _ in range(positions):
+            position_id += 1
+            symbol = rng.choice(names)
+            messages.append(_message("accounts.position", {
+                "position_id": position_id, "login": login, "symbol": symbol,
+                "price_open": prices[symbol] * rng.uniform(0.999, 1.001),
+                "volume": rng.choice([100, 500, 1000]),
+                "contract_size": 100 if symbol.startswith("XAU") else 100000,
+                "action": rng.choice([0, 1]),
+            }, login))
+
+    for i in range(ticks):
+        symbol = rng.choice(names)
+        prices[symbol] *= 1 + rng.uniform(-0.0002, 0.0002)
+        tick(symbol, (i + 1) / tick_rate)
+    return messages
+
+
+#===============================================================================================
+# TRANSPORT
+#===============================================================================================
+class ReplayTransport:
+    """
+    In-process stand-in for Consumer.consume(): each call returns the messages whose
+    timestamps fall within one consume window of the first, at most batch_size of
+    them. Batches are cut the way the live loop sees them, so tick conflation in
+    process_batch behaves as it would at the recorded rate, replay itself is not paced.
+    """
+    def __init__(self, messages: List[ReplayMessage], window: float, batch_size: int):
+        self.messages = messages
+        self.window = window
+        self.batch_size = batch_size
+        self.position = 0
+
+    def consume(self) -> List[ReplayMessage]:
+        start = self.position
+        if start >= len(self.messages):
+            return []
+        end = start + 1
+        limit = self.messages[start].timestamp + self.window
+        while end < len(self.messages) and end - start < self.batch_size and self.messages[end].timestamp < limit:
+            end += 1
+        self.position = end
+        return self.messages[start:end]
+
+
+class RecordedTask:
+    """Celery task stand-in, delay() only counts the call"""
+    def __init__(self, name: str, calls: Dict[str, int]):
+        self.name = name
+        self.calls = calls
+
+    def delay(self, *args, **kwargs):
+        self.calls[self.name] = self.calls.get(self.name, 0) + 1
+
+
+class RecordedBroadcaster:
+    def __init__(self, calls: Dict[str, int]):
+        self.calls = calls
+
+    def publish(self, group: str, message: dict):
+        self.calls["broadcast"] = self.calls.get("broadcast", 0) + 1
+
+
+@contextmanager
+def offline_outbound(monitor, module):
+    """
+    Swap the Celery tasks the monitor module calls and the monitor's WebSocket
+    broadcaster for counters, a replay must not fail real accounts or push to
+    browsers. Redis stays as configured (calls fail fast when it is not running).
+    """
+    calls: Dict[str, int] = {}
+    tasks = {name: value for name, value in vars(module).items() if hasattr(value, "delay")}
+    broadcaster = monitor.broadcaster
+    for name in tasks:
+        setattr(module, name, RecordedTask(name, calls))
+    monitor.broadcaster = RecordedBroadcaster(calls)
+    try:
+        yield calls
+    finally:
+        for name, task in tasks.items():
+            setattr(module, name, task)
+        monitor.broadcaster = broadcaster
+
+
+#===============================================================================================
+# REPORT
+#===============================================================================================
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process, None when it cannot be read"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def replay(monitor, messages: List[ReplayMessage], window: float, batch_size: int) -> dict:
+    """Feed the messages through process_batch and time every OnTick call"""
+    import sub_manager.InMemoryPropMonitoring as monitor_module
+
+    latencies: List[float] = []
+    on_tick = monitor.OnTick
+
+    def timed_on_tick(symbol, tick):
+        started = time.perf_counter()
+        on_tick(symbol, tick)
+        latencies.append(time.perf_counter() - started)
+
+    monitor.OnTick = timed_on_tick
+    transport = ReplayTransport(messages, window, batch_size)
+    batches = 0
+    try:
+        with offline_outbound(monitor, monitor_module) as outbound:
+            started = time.perf_counter()
+            while True:
+                batch = transport.consume()
+                if not batch:
+                    break
+                monitor.process_batch(batch)
+                batches += 1
+            elapsed = time.perf_counter() - started
+    finally:
+        monitor.OnTick = on_tick
+
+    ticks = sum(1 for msg in messages if msg.topic() == "market.ticks")
+    return {
+        "messages": len(messages),
+        "ticks": ticks,
+        "batches": batches,
+        "on_tick_calls": len(latencies),
+        "elapsed_s": elapsed,
+        "events_per_s": len(messages) / elapsed if elapsed else 0.0,
+        "ticks_per_s": ticks / elapsed if elapsed else 0.0,
+        "on_tick_p50_ms": percentile(latencies, 50) * 1000,
+        "on_tick_p99_ms": percentile(latencies, 99) * 1000,
+        "on_tick_max_ms": max(latencies, default=0.0) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "accounts": len(monitor.local_accounts),
+        "outbound": dict(outbound),
+    }
@@ -0,0 +1,306 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from sub_manager.InMemoryData import PositionRecord
+
+try:
+    import numpy as np
+except ImportError:  # Optional backend, the monitor falls back to the per-position path
+    np = None
+
+
+def columnar_available() -> bool:
+    return np is not None
+
+
+def position_units(pos: PositionRecord) -> float:
+    """Lots (volume is in 1/10000 lot) times contract size, used when no symbol spec is known"""
+    return (pos.volume / 10000) * (pos.contract_size or 100000)
+
+
+class SymbolBlock:
+    """
+    Columnar storage of every open position on one symbol.
+    Rows are packed (swap-remove on delete) and every row points to a compact
+    per-block login slot so PnL/notional can be reduced per login with bincount.
+    """
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, symbol: str, units: Callable[[PositionRecord], float] = position_units):
+        self.symbol = symbol
+        self.position_units = units
+        self.size = 0
+        capacity = self.INITIAL_CAPACITY
+        self.units = np.zeros(capacity, dtype=np.float64)       # lots * contract size
+        self.price_open = np.zeros(capacity, dtype=np.float64)
+        self.side = np.zeros(capacity, dtype=np.float64)        # +1 buy, -1 sell
+        self.slot = np.zeros(capacity, dtype=np.int64)
+
+        self.row_of: Dict[int, int] = {}      # position_id -> row
+        self.row_ids: List[int] = []          # row -> position_id
+
+        self.slot_of: Dict[int, int] = {}     # login -> slot
+        self.slot_refs: List[int] = []        # slot -> open rows
+        self.free_slots: List[int] = []
+
+        # Last reduction results (account currency)
+        self.row_pnl = np.zeros(capacity, dtype=np.float64)
+        self.slot_pnl = np.zeros(0, dtype=np.float64)
+        self.slot_notional = np.zeros(0, dtype=np.float64)
+
+        self.prices: Tuple[float, float, float] = None  # bid, ask, rate of the last reprice
+        self.dirty = False
+
+    def _grow(self):
+        capacity = len(self.units) * 2
+        for name in ('units', 'price_open', 'side', 'slot', 'row_pnl'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _acquire_slot(self, login: int) -> int:
+        slot = self.slot_of.get(login)
+        if slot is None:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = len(self.slot_refs)
+                self.slot_refs.append(0)
+            self.slot_of[login] = slot
+        self.slot_refs[slot] += 1
+        return slot
+
+    def _release_slot(self, login: int):
+        slot = self.slot_of[login]
+        self.slot_refs[slot] -= 1
+        if self.slot_refs[slot] == 0:
+            del self.slot_of[login]
+            self.free_slots.append(slot)
+
+    def upsert(self, pos: PositionRecord):
+        row = self.row_of.get(pos.position_id)
+        if row is None:
+            if self.size == len(self.units):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.row_of[pos.position_id] = row
+            self.row_ids.append(pos.position_id)
+            self.slot[row] = self._acquire_slot(pos.login)
+
+        self.units[row] = self.position_units(pos)
+        self.price_open[row] = pos.price_open
+        self.side[row] = 1.0 if pos.action == 0 else -1.0
+        self.dirty = True
+
+    def remove(self, position_id: int, login: int) -> bool:
+        row = self.row_of.pop(position_id, None)
+        if row is None:
+            return False
+
+        last = self.size - 1
+        if row != last:
+            # Move the last row into the hole
+            for column in (self.units, self.price_open, self.side, self.slot, self.row_pnl):
+                column[row] = column[last]
+            moved_id = self.row_ids[last]
+            self.row_ids[row] = moved_id
+            self.row_of[moved_id] = row
+        self.row_ids.pop()
+        self.size = last
+        self._release_slot(login)
+        self.dirty = True
+        return True
+
+    def reprice(self, bid: float, ask: float, rate: float):
+        """Revalue every row in one pass and reduce PnL and margin notional per login slot"""
+        self.prices = (bid, ask, rate)
+        self.dirty = False
+        n = self.size
+        nslots = len(self.slot_refs)
+        if n == 0:
+            self.slot_pnl = np.zeros(nslots, dtype=np.float64)
+            self.slot_notional = np.zeros(nslots, dtype=np.float64)
+            return
+
+        units = self.units[:n]
+        side = self.side[:n]
+        is_buy = side > 0
+        # BUY closes at bid, SELL closes at ask; margin uses the opposite side
+        close_price = np.where(is_buy, bid, ask)
+        margin_price = np.where(is_buy, ask, bid)
+
+        pnl = side * (close_price - self.price_open[:n]) * units * rate
+        self.row_pnl[:n] = pnl
+
+        slots = self.slot[:n]
+        self.slot_pnl = np.bincount(slots, weights=pnl, minlength=nslots)
+        self.slot_notional = np.bincount(slots, weights=units * margin_price, minlength=nslots)
+
+    def refresh(self):
+        if self.dirty and self.prices is not None:
+            self.reprice(*self.prices)
+
+    def login_totals(self, login: int) -> Tuple[float, float]:
+        slot = self.slot_of.get(login)
+        if slot is None or self.prices is None or slot >= len(self.slot_pnl):
+            return 0.0, 0.0
+        return float(self.slot_pnl[slot]), float(self.slot_notional[slot])
+
+    def position_profit(self, position_id: int) -> float:
+        row = self.row_of.get(position_id)
+        if row is None or self.prices is None:
+            return 0.0
+        return float(self.row_pnl[row])
+
+
+class ColumnarRevaluation:
+    """
+    Vectorized revaluation backend for open positions.
+    Keeps one SymbolBlock per symbol; a tick reprices the whole block at once and
+    the monitor reads back per-login float totals. Decimal values are only built
+    by the caller when account state is written.
+    """
+    def __init__(self, units: Callable[[PositionRecord], float] = position_units):
+        if np is None:
+            raise RuntimeError("numpy is required for the columnar revaluation backend")
+        self.position_units = units
+        self.blocks: Dict[str, SymbolBlock] = {}
+        self.login_symbols: Dict[int, Dict[int, str]] = {}  # login -> position_id -> symbol
+
+    def upsert(self, pos: PositionRecord):
+        block = self.blocks.get(pos.symbol)
+        if block is None:
+            block = self.blocks[pos.symbol] = SymbolBlock(pos.symbol, self.position_units)
+        block.upsert(pos)
+        self.login_symbols.setdefault(pos.login, {})[pos.position_id] = pos.symbol
+
+    def remove(self, login: int, position_id: int):
+        symbol = self.login_symbols.get(login, {}).pop(position_id, None)
+        if symbol is None:
+            return
+        block = self.blocks.get(symbol)
+        if block:
+            block.remove(position_id, login)
+
+    def drop_login(self, login: int):
+        for position_id, symbol in list(self.login_symbols.pop(login, {}).items()):
+            block = self.blocks.get(symbol)
+            if block:
+                block.remove(position_id, login)
+
+    def reprice(self, symbol: str, bid: float, ask: float, rate: float):
+        block = self.blocks.get(symbol)
+        if block is not None:
+            block.reprice(bid, ask, rate)
+
+    def login_totals(self, login: int) -> Tuple[float, float]:
+        """Return (floating pnl, margin notional) summed over every symbol the login holds"""
+        profit = 0.0
+        notional = 0.0
+        for symbol in set(self.login_symbols.get(login, {}).values()):
+            block = self.blocks[symbol]
+            block.refresh()
+            pnl, margin_notional = block.login_totals(login)
+            profit += pnl
+            notional += margin_notional
+        return profit, notional
+
+    def position_profit(self, symbol: str, position_id: int) -> float:
+        block = self.blocks.get(symbol)
+        if block is None:
+            return 0.0
+        block.refresh()
+        return block.position_profit(position_id)
+
+
+class SymbolExposure:
+    """
+    Net exposure of one login on one symbol.
+    Units are lots * contract size, cost is units * open price, so the
+    volume-weighted open price of each side is cost / units.
+    """
+    __slots__ = ('buy_units', 'buy_cost', 'sell_units', 'sell_cost', 'positions')
+
+    def __init__(self):
+        self.buy_units = 0.0
+        self.buy_cost = 0.0
+        self.sell_units = 0.0
+        self.sell_cost = 0.0
+        self.positions = 0
+
+    def apply(self, side: int, units: float, price_open: float, sign: int):
+        if side > 0:
+            self.buy_units += sign * units
+            self.buy_cost += sign * units * price_open
+        else:
+            self.sell_units += sign * units
+            self.sell_cost += sign * units * price_open
+        self.positions += sign
+
+    @property
+    def buy_price(self) -> float:
+        return self.buy_cost / self.buy_units if self.buy_units else 0.0
+
+    @property
+    def sell_price(self) -> float:
+        return self.sell_cost / self.sell_units if self.sell_units else 0.0
+
+    def pnl(self, bid: float, ask: float) -> float:
+        """Floating PnL in quote currency: buys close at bid, sells close at ask"""
+        return (bid * self.buy_units - self.buy_cost) + (self.sell_cost - ask * self.sell_units)
+
+    def notional(self, bid: float, ask: float) -> float:
+        """Margin notional: buys are margined at ask, sells at bid"""
+        return self.buy_units * ask + self.sell_units * bid
+
+
+class ExposureBook:
+    """
+    Per login, per symbol net buy/sell aggregates maintained incrementally on
+    position add, update and remove. Revaluing an account is then O(symbols)
+    instead of O(positions).
+    """
+    def __init__(self, units: Callable[[PositionRecord], float] = position_units):
+        self.position_units = units
+        self.exposures: Dict[int, Dict[str, SymbolExposure]] = {}
+        # login -> position_id -> (symbol, side, units, price_open) as currently applied
+        self.applied: Dict[int, Dict[int, Tuple[str, int, float, float]]] = {}
+
+    def _terms(self, pos: PositionRecord) -> Tuple[str, int, float, float]:
+        side = 1 if pos.action == 0 else -1
+        return pos.symbol, side, self.position_units(pos), float(pos.price_open)
+
+    def _unapply(self, login: int, position_id: int):
+        terms = self.applied.get(login, {}).pop(position_id, None)
+        if terms is None:
+            return
+        symbol, side, units, price_open = terms
+        symbols = self.exposures.get(login, {})
+        exposure = symbols.get(symbol)
+        if exposure is None:
+            return
+        exposure.apply(side, units, price_open, -1)
+        if exposure.positions <= 0:
+            # Drop instead of keeping float residue around
+            del symbols[symbol]
+
+    def upsert(self, pos: PositionRecord):
+        self._unapply(pos.login, pos.position_id)
+        terms = self._terms(pos)
+        symbol, side, units, price_open = terms
+        symbols = self.exposures.setdefault(pos.login, {})
+        exposure = symbols.get(symbol)
+        if exposure is None:
+            exposure = symbols[symbol] = SymbolExposure()
+        exposure.apply(side, units, price_open, 1)
+        self.applied.setdefault(pos.login, {})[pos.position_id] = terms
+
+    def remove(self, login: int, position_id: int):
+        self._unapply(login, position_id)
+
+    def drop_login(self, login: int):
+        self.applied.pop(login, None)
+        self.exposures.pop(login, None)
+
+    def symbols(self, login: int) -> Dict[str, SymbolExposure]:
+        return self.exposures.get(login, {})
@@ -1,55 +1,82 @@
 
 from django.utils.timezone import now
 from decimal import Decimal
-from typing import List
+from dataclasses import dataclass
+from typing import List, Iterable, Optional
 from sub_manager.InMemoryData import *
+from sub_manager.InMemoryStore import StrategyTracker
 
 from sub_manager.logging_config import get_prop_logger
 import time
 logger = get_prop_logger('rules')
 
+@dataclass
+class RulePlan:
+    """
+    Compiled rules of one account's challenge step: the loss limits become absolute
+    equity floors so a tick is checked with plain float comparisons. Floors are only
+    recomputed when the day's high or the equity peak moves.
+    """
+    login: int
+    step: int
+    daily_limit_percent: Optional[float]  # None when the step has no daily loss rule
+    total_limit_percent: float
+    profit_target_balance: float
+    daily_high: float = 0.0
+    daily_floor: float = float("-inf")
+    equity_peak: float = 0.0
+    total_floor: float = float("-inf")
+
+    def observe(self, daily_high: float, equity_peak: float):
+        """Follow the tracked watermarks, floors = watermark * (1 - limit)"""
+        if daily_high != self.daily_high:
+            self.daily_high = daily_high
+            if self.daily_limit_percent is not None and daily_high > 0:
+                self.daily_floor = daily_high * (1 - self.daily_limit_percent / 100)
+        if equity_peak != self.equity_peak:
+            self.equity_peak = equity_peak
+            if equity_peak > 0:
+                self.total_floor = equity_peak * (1 - self.total_limit_percent / 100)
+
+
 class InMemoryRuleChecker:
     """In-memory rule checker that persists across bridge restarts"""
     
-    def check_account_rules(self, account: AccountData, challenge: PropFirmChallengeData, daily_drawdown:DailyDrawdownData=None, total_drawdown:AccountTotalDrawdownData=None) -> List[ViolationDict]:
-        """Check account-level rules (drawdown, daily loss)"""
+    def compile_plan(self, account: AccountData, challenge: PropFirmChallengeData) -> RulePlan:
+        """Turn the percentage rules of the account's current step into absolute thresholds"""
+        size = Decimal(str(challenge.account_size))
+        target_percent = challenge.phase_2_profit_target_percent if account.step == 2 else challenge.profit_target_percent
+        return RulePlan(
+            login=account.login,
+            step=account.step,
+            daily_limit_percent=None if account.step == 2 else float(challenge.max_daily_loss_percent),
+            total_limit_percent=float(
+                challenge.max_total_loss_percent if account.step == 1 else challenge.additional_phase_total_loss_percent
+            ),
+            profit_target_balance=float(size + size * Decimal(str(target_percent)) / Decimal(100)),
+        )
+
+    def check_account_rules(self, account: AccountData, plan: RulePlan) -> List[ViolationDict]:
+        """Check account-level rules (drawdown, daily loss) against the compiled plan"""
         violations:List[ViolationDict] = []
-        # print("Checking Violations")
-        if not challenge:
+        if not plan:
             return violations
         
         try:
-            #Check if the challenge class is a funded or not
-            if challenge.challenge_class not in ['skill_check_funding', 'challenge_funding']:
-                violations.extend(self._check_max_days(account, challenge))
-            if account.step != 2:
-                violations.extend(self._check_daily_drawdown(account, challenge, daily_drawdown))
-            # print("checking")
-            violations.extend(self._check_total_drawdown(account, challenge, total_drawdown))
-            # print("checking2")
-            # print("Done Checking Violations", account.login, violations)
+            # Max trading days is a calendar rule, the monitor's scheduler runs it when due
+            equity = float(account.equity)
+            if equity < plan.daily_floor:
+                violations.extend(self._check_daily_drawdown(equity, plan))
+            if equity < plan.total_floor:
+                violations.extend(self._check_total_drawdown(equity, plan))
             return violations
         except Exception as err:
             print("Error", str(err))
     
-    def _check_hft(self, deals: List[DealData], challenge: PropFirmChallengeData) -> List[ViolationDict]:
-        """Check for High Frequency Trading using provided deals list"""
+    def _check_hft(self, recent_trades_count_1_min: int, recent_trades_count_1_hr: int, challenge: PropFirmChallengeData) -> List[ViolationDict]:
+        """Check for High Frequency Trading from the login's sliding-window entry-deal counts"""
         violations: List[ViolationDict] = []
 
-        current_time_unix = int(time.time())
-        one_minute_ago = current_time_unix - 60
-        one_hour_ago = current_time_unix - 3600
-
-        # Filter only real entry deals (buy/sell with entry IN or INOUT)
-        deals = [
-            d for d in deals 
-            if (d.action in [0, 1]) and (d.entry in [0, 2])
-        ]
-
-        # Count deals in the last minute/hour for this login
-        recent_trades_count_1_min = sum(1 for d in deals if  d.time and d.time >= one_minute_ago)
-        recent_trades_count_1_hr = sum(1 for d in deals if d.time and d.time >= one_hour_ago)
-
         if recent_trades_count_1_min > challenge.max_trades_per_minute:
             violations.append(
                 {"type": "HFT_MINUTE_VIOLATION", "message": f"{recent_trades_count_1_min} trades in 1 minute (limit: {challenge.max_trades_per_minute})"}
@@ -63,7 +90,7 @@ class InMemoryRuleChecker:
         return violations
 
     
-    def _check_symbol_limit(self, position:PositionData, positions:List[PositionData], challenge: PropFirmChallengeData) -> List[ViolationDict]:
+    def _check_symbol_limit(self, position:PositionRecord, positions:Iterable[PositionRecord], challenge: PropFirmChallengeData) -> List[ViolationDict]:
         """Check positions per symbol using database"""
         violations:List[ViolationDict] = []
         
@@ -80,37 +107,21 @@ class InMemoryRuleChecker:
                 
         return violations
     
-    def _check_prohibited_strategies(self, deals: List[DealData], challenge: PropFirmChallengeData) -> List[ViolationDict]:
-        """Detects prohibited strategies such as Grid and Martingale. Returns a list of detected violations."""
+    def _check_prohibited_strategies(self, tracker: StrategyTracker, challenge: PropFirmChallengeData) -> List[ViolationDict]:
+        """Detects prohibited strategies such as Grid and Martingale from the login's streaming tracker. Returns a list of detected violations."""
 
         violations:List[ViolationDict] = []
 
-        # Filter only relevant "entry" deals (open/in-out trades)
-        open_deals = [
-            d for d in deals
-            if (d.action in [0, 1]) and (d.entry in [0, 2])  # buy/sell + entry
-        ]
-        if not open_deals:
-            return violations
-
-        #Sort by time to process sequentially
-        open_deals.sort(key=lambda d: d.time)
-
         # =========================================================
         # GRID DETECTION
         # Logic: multiple trades (3+) opened close in time with same lot size.
         # Often across same symbol, but we can check globally too.
         # =========================================================
-        if not challenge.grid_trading_allowed and len(open_deals) >= 3:
-            last_3 = open_deals[-3:]
-            volumes = [float(d.volume) for d in last_3]
-
-            if len(set(volumes)) == 1:
-                # optionally, you can check same symbol:
-                # symbols = {d.symbol for d in last_3}
-                # if len(symbols) == 1:
+        if not challenge.grid_trading_allowed:
+            volume = tracker.grid_volume()
+            if volume is not None:
                 violations.append(
-                    {"type": "GRID_DETECTED", "message": f"3+ trades with equal volume ({volumes[0]})"}
+                    {"type": "GRID_DETECTED", "message": f"3+ trades with equal volume ({volume})"}
                 )
 
         # =========================================================
@@ -118,16 +129,13 @@ class InMemoryRuleChecker:
         # Logic: lot size increases after a losing trade.
         # Classic martingale = "if previous trade lost, increase next volume".
         # =========================================================
-        if not challenge.martingale_allowed and len(open_deals) >= 2:
-            for prev, curr in zip(open_deals[:-1], open_deals[1:]):
-                prev_loss = prev.profit < 0
-                increased_lot = curr.volume > prev.volume
-
-                if prev_loss and increased_lot:
-                    violations.append(
-                        {"type": "MARTINGALE_DETECTED", "message": f"Lot increased from {prev.volume} - {curr.volume} after a loss"}
-                    )
-                    break  # one detection is enough
+        if not challenge.martingale_allowed:
+            pair = tracker.martingale_pair()
+            if pair:
+                prev, curr = pair
+                violations.append(
+                    {"type": "MARTINGALE_DETECTED", "message": f"Lot increased from {prev.volume} - {curr.volume} after a loss"}
+                )
 
         return violations
     
@@ -170,7 +178,7 @@ class InMemoryRuleChecker:
         # print("DONE CHECKING PERIOD")
         return violations
 
-    def _check_max_days(self, account: AccountData, challenge: PropFirmChallengeData) -> list[ViolationDict]:
+    def _check_max_days(self, account: AccountData, challenge: PropFirmChallengeData, started: Optional[date] = None) -> list[ViolationDict]:
         """Check if account has exceeded max trading days (including extensions)."""
         violations:List[ViolationDict] = []
 
@@ -178,7 +186,7 @@ class InMemoryRuleChecker:
         additional_days = challenge.additional_trading_days or 0
         total_allowed_days = max_days + additional_days
 
-        account_created_at = account.created_at.date()
+        account_created_at = started or account.created_at.date()
         today = now().date()
         days_elapsed = (today - account_created_at).days
 
@@ -189,70 +197,31 @@ class InMemoryRuleChecker:
 
         return violations
 
-    def _check_daily_drawdown(self, account: AccountData, challenge: PropFirmChallengeData, dd: DailyDrawdownData) -> list[ViolationDict]:
-        """Check drawdown limits using tracked high-watermark equity."""
-        # print("CHECKING DAILY DRAWSOWN", dd)
+    def _check_daily_drawdown(self, equity: float, plan: RulePlan) -> list[ViolationDict]:
+        """Check equity against the floor below the day's high-watermark equity."""
         violations:List[ViolationDict] = []
-        if not dd:
-            # No record yet, safe to assume no violation
-            return violations
-        
-        current_dd_percent = float(dd.drawdown_percent)
-        max_dd = float(challenge.max_daily_loss_percent)
-        if current_dd_percent > max_dd:
-            violations.append({ "type": "DAILY_DRAWDOWN_EXCEEDED", "message": f"{current_dd_percent:.2f}% (max: {max_dd}%)"})
-
-        # print("DONE CHECKING DAILY DRAWSOWN")
+        if equity < plan.daily_floor:
+            current_dd_percent = (plan.daily_high - equity) / plan.daily_high * 100
+            violations.append({ "type": "DAILY_DRAWDOWN_EXCEEDED", "message": f"{current_dd_percent:.2f}% (max: {plan.daily_limit_percent}%)"})
         return violations
         
-    def _check_total_drawdown(
-        self,
-        account: AccountData,
-        challenge: PropFirmChallengeData,
-        total_dd: AccountTotalDrawdownData
-    ) -> List[ViolationDict]:
+    def _check_total_drawdown(self, equity: float, plan: RulePlan) -> List[ViolationDict]:
         """
-        Check overall drawdown using AccountTotalDrawdown model.
+        Check equity against the floor below the all-time equity peak.
         """
         violations: List[ViolationDict] = []
-        if not total_dd:
-            # No record yet, safe to assume no violation
-            return violations
-
-        current_dd_percent = float(total_dd.drawdown_percent)
-        max_dd = (
-            float(challenge.max_total_loss_percent)
-            if account.step == 1
-            else float(challenge.additional_phase_total_loss_percent)
-        )
-
-        if current_dd_percent > max_dd:
+        if equity < plan.total_floor:
+            current_dd_percent = (plan.equity_peak - equity) / plan.equity_peak * 100
             violations.append(
                 {
                     "type": "TOTAL_DRAWDOWN_EXCEEDED",
-                    "message": f"{current_dd_percent:.2f}% (max: {max_dd}%)"
+                    "message": f"{current_dd_percent:.2f}% (max: {plan.total_limit_percent}%)"
                 }
             )
 
         return violations
 
     
-    def _check_profit(self, account: AccountData, challenge: PropFirmChallengeData) -> bool:
+    def _check_profit(self, account: AccountData, plan: RulePlan) -> bool:
         """Check if account has reached the profit target."""
-        # logger.info(f"CHECKING PROFIT {account.login}")
-        current_profit = Decimal(account.balance) - Decimal(challenge.account_size)
-        if account.step == 2:
-            target_profit_amount = (Decimal(challenge.phase_2_profit_target_percent) / Decimal(100)) * Decimal(challenge.account_size)
-        else:
-            target_profit_amount = (Decimal(challenge.profit_target_percent) / Decimal(100)) * Decimal(challenge.account_size)
-
-        # if (account.login == 4005):
-        #     logger.info(f"CURRENT PROFIT-{current_profit} TARGET PROFIT-{target_profit_amount}")
-        
-
-        # Check if profit target is reached
-        return current_profit >= target_profit_amount
-    
-
-    
-    
\ No newline at end of file
+        return float(account.balance) >= plan.profit_target_balance
@@ -0,0 +1,56 @@
+import heapq
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+
+def day_start(day: date) -> float:
+    """Unix timestamp of 00:00 UTC on a day, calendar rules roll over at UTC midnight"""
+    return datetime.combine(day, time.min, tzinfo=timezone.utc).timestamp()
+
+
+class DeadlineScheduler:
+    """
+    Min-heap of (deadline, login, kind) for rules that only change at calendar
+    boundaries. Each (login, kind) has at most one live deadline: rescheduling or
+    cancelling leaves the old heap entry behind and it is skipped when popped.
+    """
+    def __init__(self):
+        self.heap: List[Tuple[float, int, Optional[int], str]] = []
+        self.deadlines: Dict[Tuple[Optional[int], str], float] = {}
+        self.seq = 0
+
+    def schedule(self, login: Optional[int], kind: str, deadline: float):
+        self.deadlines[(login, kind)] = deadline
+        self.seq += 1
+        heapq.heappush(self.heap, (deadline, self.seq, login, kind))
+
+    def cancel(self, login: Optional[int], kind: str):
+        self.deadlines.pop((login, kind), None)
+
+    def cancel_login(self, login: int):
+        for key in [key for key in self.deadlines if key[0] == login]:
+            del self.deadlines[key]
+
+    def pending(self, login: Optional[int], kind: str) -> bool:
+        return (login, kind) in self.deadlines
+
+    def next_deadline(self) -> Optional[float]:
+        while self.heap:
+            deadline, _, login, kind = self.heap[0]
+            if self.deadlines.get((login, kind)) == deadline:
+                return deadline
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now: float) -> List[Tuple[Optional[int], str]]:
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, login, kind = heapq.heappop(self.heap)
+            if self.deadlines.get((login, kind)) != deadline:
+                continue  # cancelled or rescheduled
+            del self.deadlines[(login, kind)]
+            due.append((login, kind))
+        return due
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
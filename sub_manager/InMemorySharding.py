@@ -0,0 +1,125 @@
+import os, socket
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from confluent_kafka import OFFSET_BEGINNING, TopicPartition
+
+from sub_manager.logging_config import get_prop_logger
+
+logger = get_prop_logger('monitoring')
+
+
+def instance_id() -> str:
+    """Identity of this monitor process in the logs"""
+    return os.getenv("MONITOR_INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def assign_all(consumer, topics: Iterable[str], offset: int) -> List[TopicPartition]:
+    """
+    Read every partition of the topics from `offset` through assign(): the consumer never
+    joins its group and commits nothing, so restarts leave no consumer groups behind.
+    Partitions added to a topic later are only picked up on the next start.
+    """
+    metadata = consumer.list_topics(timeout=10)
+    partitions = []
+    for topic in topics:
+        meta = metadata.topics.get(topic)
+        if meta is None or meta.error is not None:
+            logger.warning(f"Topic {topic} is not available, it is not read")
+            continue
+        partitions.extend(TopicPartition(topic, partition, offset) for partition in sorted(meta.partitions))
+    consumer.assign(partitions)
+    return partitions
+
+
+class PartitionOwnership:
+    """
+    Tracks the account partitions, and the logins on them, owned by one monitor instance.
+
+    Account topics are keyed by login and share one partition count, so a login lives on
+    the same partition number in every topic and the range assignor hands all of them to
+    the same instance. On rebalance the logins of partitions that moved away are dropped,
+    and partitions gained are read again from the beginning to rebuild their state.
+    Messages below the group's committed offset were already acted on by the previous
+    owner, they are replayed for state only (see is_replay).
+
+    When the state was restored from a snapshot, start_offsets are the offsets it was
+    taken at: those partitions resume from there instead. With rebuild=False (single
+    unsharded instance) partitions without a snapshot offset keep the committed offset.
+    """
+    def __init__(self, drop_login: Callable[[int], None], rebuild: bool = True,
+                 start_offsets: Optional[Dict[Tuple[str, int], int]] = None,
+                 login_partition: Optional[Dict[int, int]] = None):
+        self.drop_login = drop_login
+        self.rebuild = rebuild
+        self.start_offsets: Dict[Tuple[str, int], int] = dict(start_offsets or {})
+        # Partitions the restored state covers, anything not assigned again gets dropped
+        self.partitions: Set[Tuple[str, int]] = set(self.start_offsets)
+        self.login_partition: Dict[int, int] = dict(login_partition or {})
+        self.replay_until: Dict[Tuple[str, int], int] = {}
+        # Next offset to consume per account partition, recorded in snapshots
+        self.offsets: Dict[Tuple[str, int], int] = {}
+
+    def on_assign(self, consumer, partitions):
+        assigned = {(tp.topic, tp.partition) for tp in partitions}
+
+        lost = {partition for _, partition in self.partitions - assigned}
+        lost -= {partition for _, partition in assigned}
+        if lost:
+            self._drop_partitions(lost)
+
+        gained = [tp for tp in partitions if (tp.topic, tp.partition) not in self.partitions]
+        resumed = [tp for tp in partitions if (tp.topic, tp.partition) in self.start_offsets]
+        rewound = resumed + (gained if self.rebuild else [])
+        if rewound:
+            for tp in consumer.committed(rewound):
+                if tp.offset >= 0:
+                    self.replay_until[(tp.topic, tp.partition)] = tp.offset
+            for tp in resumed:
+                tp.offset = self.start_offsets.pop((tp.topic, tp.partition))
+            if self.rebuild:
+                for tp in gained:
+                    tp.offset = OFFSET_BEGINNING
+
+        self.partitions = assigned
+        consumer.assign(partitions)
+        logger.info(f"Partitions assigned: {len(assigned)} ({len(gained)} new, {len(resumed)} from snapshot, {len(lost)} lost)")
+
+    def on_revoke(self, consumer, partitions):
+        # Eager rebalancing revokes everything first, state is only dropped once
+        # on_assign shows which partitions actually moved away
+        logger.info(f"Partitions revoked: {len(partitions)}")
+
+    def on_lost(self, consumer, partitions):
+        self._drop_partitions({tp.partition for tp in partitions})
+        self.partitions -= {(tp.topic, tp.partition) for tp in partitions}
+
+    def _drop_partitions(self, partitions: Set[int]):
+        logins = [login for login, partition in self.login_partition.items() if partition in partitions]
+        for login in logins:
+            self.login_partition.pop(login, None)
+            self.drop_login(login)
+        for key in [key for key in self.replay_until if key[1] in partitions]:
+            del self.replay_until[key]
+        for key in [key for key in self.offsets if key[1] in partitions]:
+            del self.offsets[key]
+        logger.info(f"Dropped {len(logins)} accounts from partitions {sorted(partitions)}")
+
+    def track(self, msg):
+        """Record the consumed offset and which partition a keyed account message came from"""
+        self.offsets[(msg.topic(), msg.partition())] = msg.offset() + 1
+        key = msg.key()
+        if not key:
+            return
+        try:
+            self.login_partition[int(key)] = msg.partition()
+        except ValueError:
+            pass
+
+    def is_replay(self, msg) -> bool:
+        until = self.replay_until.get((msg.topic(), msg.partition()))
+        if until is None:
+            return False
+        if msg.offset() >= until:
+            # Caught up with the previous owner
+            del self.replay_until[(msg.topic(), msg.partition())]
+            return False
+        return True
@@ -0,0 +1,79 @@
+import os, pickle, threading, time, traceback
+from typing import Dict, Optional, Tuple
+
+from sub_manager.logging_config import get_prop_logger
+
+logger = get_prop_logger('monitoring')
+
+SNAPSHOT_VERSION = 1
+
+
+class MonitorSnapshot:
+    """
+    Periodic binary (pickle) snapshot of the monitor state together with the Kafka
+    offsets it reflects.
+
+    The state is pickled to bytes on the consumer thread, so the snapshot is the
+    state at that instant, and a background thread writes the bytes to disk (fsync,
+    then an atomic rename). The process is never forked: librdkafka, the broadcaster
+    and the Redis / Celery clients all run threads whose locks a child would inherit.
+    """
+    def __init__(self, path: str, interval: float = 60.0):
+        self.path = path
+        self.interval = interval
+        self.last_saved = time.monotonic()
+        self.writer: Optional[threading.Thread] = None
+
+    def load(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("version") != SNAPSHOT_VERSION:
+                logger.warning(f"Ignoring snapshot {self.path} with version {data.get('version')}")
+                return None
+            logger.info(f"Loaded snapshot {self.path} taken at {time.ctime(data['created_at'])}")
+            return data
+        except Exception as err:
+            logger.warning(f"Failed to load snapshot {self.path}: {str(err)}")
+            return None
+
+    def _idle(self) -> bool:
+        """True when no snapshot is still being written"""
+        return self.writer is None or not self.writer.is_alive()
+
+    def maybe_save(self, state: dict, offsets: Dict[Tuple[str, int], int], login_partition: Dict[int, int]):
+        if time.monotonic() - self.last_saved < self.interval or not self._idle():
+            return
+        self.last_saved = time.monotonic()
+        self.save(state, offsets, login_partition)
+
+    def save(self, state: dict, offsets: Dict[Tuple[str, int], int], login_partition: Dict[int, int]):
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.time(),
+            "offsets": offsets,
+            "login_partition": login_partition,
+            "state": state,
+        }
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        self.writer = threading.Thread(target=self._write_safely, args=(payload,), name="snapshot-writer", daemon=True)
+        self.writer.start()
+
+    def _write_safely(self, payload: bytes):
+        started = time.monotonic()
+        try:
+            self._write(payload)
+            logger.info(f"Snapshot written ({len(payload) / 2 ** 20:.1f} MB in {time.monotonic() - started:.2f}s)")
+        except Exception:
+            logger.error(f"Failed to write snapshot {self.path}")
+            traceback.print_exc()
+
+    def _write(self, payload: bytes):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
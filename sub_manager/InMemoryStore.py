@@ -0,0 +1,298 @@
+import bisect, sys, time
+from collections import deque, OrderedDict
+from typing import Deque, Dict, Set, List, Optional, Tuple
+from sub_manager.InMemoryData import DealRecord, PositionRecord, SymbolSpecData
+from sub_manager.InMemoryRevaluation import position_units
+
+
+class SymbolIndex:
+    """
+    Reverse index of symbol -> logins holding an open position on it.
+    Each login carries a reference count (number of open positions on the symbol)
+    so the entry is only dropped when the last position on that symbol goes away.
+    """
+    def __init__(self):
+        self.symbols: Dict[str, Dict[int, int]] = {}
+        self.login_symbols: Dict[int, Set[str]] = {}
+
+    def add(self, symbol: str, login: int):
+        holders = self.symbols.setdefault(symbol, {})
+        holders[login] = holders.get(login, 0) + 1
+        self.login_symbols.setdefault(login, set()).add(symbol)
+
+    def remove(self, symbol: str, login: int):
+        holders = self.symbols.get(symbol)
+        if not holders or login not in holders:
+            return
+
+        holders[login] -= 1
+        if holders[login] <= 0:
+            del holders[login]
+            symbols = self.login_symbols.get(login)
+            if symbols:
+                symbols.discard(symbol)
+                if not symbols:
+                    del self.login_symbols[login]
+        if not holders:
+            del self.symbols[symbol]
+
+    def drop_login(self, login: int):
+        """Remove every reference held by a login (positions cleared / account cleaned up)"""
+        for symbol in self.login_symbols.pop(login, set()):
+            holders = self.symbols.get(symbol)
+            if holders is None:
+                continue
+            holders.pop(login, None)
+            if not holders:
+                del self.symbols[symbol]
+
+    def logins(self, symbol: str) -> List[int]:
+        # Copy so callers can mutate the index while iterating (e.g. failing an account)
+        return list(self.symbols.get(symbol, ()))
+
+    def logins_except(self, symbol: str, excluded: Set[int]) -> List[int]:
+        """Holders of a symbol that are not in `excluded` (set difference, no per-login loop)"""
+        return list(self.symbols.get(symbol, {}).keys() - excluded)
+
+    def symbols_for(self, login: int) -> Set[str]:
+        return self.login_symbols.get(login, set())
+
+    def count(self, symbol: str, login: int) -> int:
+        return self.symbols.get(symbol, {}).get(login, 0)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.symbols
+
+
+class SymbolSpecTable:
+    """
+    Interned symbol -> spec table fed from the symbols.spec topic, with the per-symbol
+    volume multiplier (units per MT5 volume unit, volume is 1/10000 lot) precomputed.
+    Symbols without a spec fall back to the position's own contract size.
+    """
+    def __init__(self):
+        self.specs: Dict[str, SymbolSpecData] = {}
+        self.multipliers: Dict[str, float] = {}
+
+    def update(self, spec: SymbolSpecData) -> bool:
+        """Store a spec, True when the volume multiplier of the symbol changed"""
+        spec.symbol = sys.intern(spec.symbol)
+        self.specs[spec.symbol] = spec
+        previous = self.multipliers.get(spec.symbol)
+        if spec.contract_size > 0:
+            self.multipliers[spec.symbol] = spec.contract_size / 10000
+        else:
+            self.multipliers.pop(spec.symbol, None)
+        return self.multipliers.get(spec.symbol) != previous
+
+    def remove(self, symbol: str) -> bool:
+        self.specs.pop(symbol, None)
+        return self.multipliers.pop(symbol, None) is not None
+
+    def get(self, symbol: str) -> Optional[SymbolSpecData]:
+        return self.specs.get(symbol)
+
+    def units(self, pos: PositionRecord) -> float:
+        """Position size in units of the base asset"""
+        multiplier = self.multipliers.get(pos.symbol)
+        if multiplier is None:
+            return position_units(pos)
+        return pos.volume * multiplier
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+
+class TradeRateWindow:
+    """
+    Sliding one minute / one hour windows of entry-deal timestamps for one login.
+    Timestamps older than the window are trimmed on insert and on read, so the
+    counts are O(1) amortized instead of a scan over the full deal history.
+    """
+    MINUTE = 60
+    HOUR = 3600
+
+    def __init__(self):
+        self.minute: Deque[int] = deque()
+        self.hour: Deque[int] = deque()
+
+    @staticmethod
+    def _insert(window: Deque[int], timestamp: int):
+        if not window or timestamp >= window[-1]:
+            window.append(timestamp)
+        else:
+            # Late deal, keep the window sorted
+            window.insert(bisect.bisect_right(window, timestamp), timestamp)
+
+    def _trim(self, now: int):
+        while self.minute and self.minute[0] < now - self.MINUTE:
+            self.minute.popleft()
+        while self.hour and self.hour[0] < now - self.HOUR:
+            self.hour.popleft()
+
+    def add(self, timestamp: int, now: Optional[int] = None):
+        now = int(time.time()) if now is None else now
+        if timestamp < now - self.HOUR:
+            return
+        self._insert(self.hour, timestamp)
+        if timestamp >= now - self.MINUTE:
+            self._insert(self.minute, timestamp)
+        self._trim(now)
+
+    def counts(self, now: Optional[int] = None) -> Tuple[int, int]:
+        """Return (trades in the last minute, trades in the last hour)"""
+        self._trim(int(time.time()) if now is None else now)
+        return len(self.minute), len(self.hour)
+
+
+class StrategyTracker:
+    """
+    Entry deals of one login kept in time order with the running state of the grid and
+    martingale detectors. Ties are broken by deal ticket: MT5 assigns tickets in arrival
+    order, which is the order the old stable sort over the deal dict kept, also for a
+    deal that an update turns into an entry (or back).
+
+    In-order deals are appended and only compared with the previous entry, O(1).
+    A late, updated or removed deal marks the martingale state dirty and it is
+    rescanned once on the next read.
+
+    With a capacity only the newest entries are kept (grid needs the last GRID_SIZE,
+    martingale the previous entry), a rescan then only sees the retained window.
+    """
+    GRID_SIZE = 3
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity
+        self.keys: List[Tuple[int, int]] = []       # (time, deal ticket), sorted
+        self.entries: List[DealRecord] = []
+        self.key_of: Dict[int, Tuple[int, int]] = {}  # deal id -> key
+        # First consecutive (prev, curr) pair where the lot increased after a loss
+        self.martingale: Optional[Tuple[DealRecord, DealRecord]] = None
+        self.dirty = False
+
+    @staticmethod
+    def is_entry(deal: DealRecord) -> bool:
+        # buy/sell with entry IN or INOUT
+        return deal.action in [0, 1] and deal.entry in [0, 2]
+
+    @staticmethod
+    def _is_martingale(prev: DealRecord, curr: DealRecord) -> bool:
+        return prev.profit < 0 and curr.volume > prev.volume
+
+    def _insert(self, key: Tuple[int, int], deal: DealRecord):
+        self.key_of[deal.deal] = key
+        if not self.keys or key > self.keys[-1]:
+            if self.entries and self.martingale is None and self._is_martingale(self.entries[-1], deal):
+                self.martingale = (self.entries[-1], deal)
+            self.keys.append(key)
+            self.entries.append(deal)
+            self._evict()
+            return
+
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.entries.insert(i, deal)
+        self.dirty = True
+        self._evict()
+
+    def _evict(self):
+        # Trim in chunks so eviction stays amortized O(1)
+        if self.capacity is None or len(self.entries) <= 2 * self.capacity:
+            return
+        drop = len(self.entries) - self.capacity
+        for deal in self.entries[:drop]:
+            self.key_of.pop(deal.deal, None)
+        del self.keys[:drop]
+        del self.entries[:drop]
+
+    def _pop(self, deal_id: int) -> Optional[Tuple[int, int]]:
+        key = self.key_of.pop(deal_id, None)
+        if key is None:
+            return None
+        i = bisect.bisect_left(self.keys, key)
+        del self.keys[i]
+        del self.entries[i]
+        self.dirty = True
+        return key
+
+    def add(self, deal: DealRecord):
+        if deal.deal in self.key_of:
+            self.update(deal)
+            return
+        self._insert((deal.time or 0, deal.deal), deal)
+
+    def update(self, deal: DealRecord):
+        key = self._pop(deal.deal)
+        if key is None:
+            self.add(deal)
+            return
+        self._insert((deal.time or 0, deal.deal), deal)
+        self.dirty = True
+
+    def remove(self, deal_id: int):
+        self._pop(deal_id)
+
+    def _refresh(self):
+        if not self.dirty:
+            return
+        self.martingale = None
+        for prev, curr in zip(self.entries[:-1], self.entries[1:]):
+            if self._is_martingale(prev, curr):
+                self.martingale = (prev, curr)
+                break
+        self.dirty = False
+
+    def grid_volume(self) -> Optional[float]:
+        """Volume of the last GRID_SIZE entries when they are all equal"""
+        if len(self.entries) < self.GRID_SIZE:
+            return None
+        volumes = {float(d.volume) for d in self.entries[-self.GRID_SIZE:]}
+        return volumes.pop() if len(volumes) == 1 else None
+
+    def martingale_pair(self) -> Optional[Tuple[DealRecord, DealRecord]]:
+        self._refresh()
+        return self.martingale
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class DealRing(OrderedDict):
+    """
+    Fixed-capacity deal store of one login (deal id -> deal) in arrival order.
+    Adding a new deal past the capacity evicts the oldest one, updates keep their slot.
+    The ids of the last `capacity` evicted deals are remembered, so a re-delivered deal
+    that already left the ring is still recognised as seen.
+    """
+    def __init__(self, capacity: int):
+        super().__init__()
+        self.capacity = capacity
+        self.evicted = 0
+        self.evicted_ids: Dict[int, None] = {}  # insertion ordered, oldest first
+
+    def __setitem__(self, key, value):
+        is_new = key not in self
+        super().__setitem__(key, value)
+        if is_new:
+            self._evict()
+
+    def __reduce__(self):
+        # OrderedDict pickles without constructor arguments
+        state = {"evicted": self.evicted, "evicted_ids": self.evicted_ids}
+        return self.__class__, (self.capacity,), state, None, iter(self.items())
+
+    def seen(self, deal_id: int) -> bool:
+        """Deal is in the ring or was one of the recently evicted ones"""
+        return deal_id in self or deal_id in self.evicted_ids
+
+    def resize(self, capacity: int):
+        self.capacity = capacity
+        self._evict()
+
+    def _evict(self):
+        while len(self) > self.capacity:
+            deal_id, _ = self.popitem(last=False)
+            self.evicted += 1
+            self.evicted_ids[deal_id] = None
+        while len(self.evicted_ids) > self.capacity:
+            del self.evicted_ids[next(iter(self.evicted_ids))]
@@ -1,59 +1,166 @@
+from collections import deque
 from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
 import logging
 
+
+class ConversionSlot:
+    """Quote currency -> USD factor of one symbol, updated in place as rates move"""
+    __slots__ = ('symbol', 'quote', 'factor')
+
+    def __init__(self, symbol: str, quote: Optional[str], factor: float = 1.0):
+        self.symbol = symbol
+        self.quote = quote
+        self.factor = factor
+
+
 class USDCurrencyConverter:
-    """Allowed Currency Pair are:
-       EURUSD, GBPUSD, AUDUSD, NZDUSD, USDJPY, USDCHF, USDCAD, XAUUSD
+    """
+    Quote currency -> USD rates derived from every currency pair seen on the tick
+    stream. Pairs are edges of a currency graph, each currency converts to USD along
+    its shortest path of pairs (so EURGBP or GBPJPY positions are converted through
+    whatever GBPUSD / USDJPY ticks exist). Paths are only searched again when a new
+    pair shows up, a tick re-multiplies the paths running through its pair.
+
+    Revaluation reads a per-symbol ConversionSlot: a float factor, no string work.
+    Symbols that are not currency pairs, and currencies without a path to USD yet,
+    convert at 1. define() takes the currencies from the symbol spec instead of the name.
     """
     def __init__(self):
-        self.rates = {
-            "USD": Decimal("1.0"),
-        }
+        self.pairs: Dict[str, Optional[Tuple[str, str]]] = {}     # symbol -> (base, quote), None if not a pair
+        self.quotes: Dict[str, str] = {}                          # symbol -> profit currency from its spec
+        self.prices: Dict[str, float] = {}                        # pair symbol -> last bid
+        self.edges: Dict[str, Dict[str, Tuple[str, bool]]] = {}   # currency -> currency -> (symbol, inverted)
+        self.paths: Dict[str, List[Tuple[str, bool]]] = {"USD": []}  # currency -> hops to USD
+        self.users: Dict[str, Set[str]] = {}                      # pair symbol -> currencies whose path uses it
+        self.rates: Dict[str, float] = {"USD": 1.0}               # currency -> USD per unit
+        self.slots: Dict[str, ConversionSlot] = {}
+        self.slots_by_quote: Dict[str, List[ConversionSlot]] = {}
         self.logger = logging.getLogger(__name__)
-    
+
+    def parse(self, symbol: str) -> Optional[Tuple[str, str]]:
+        """(base, quote) of a currency pair symbol, broker suffixes (EURUSD.p) are ignored"""
+        pair = self.pairs.get(symbol, False)
+        if pair is not False:
+            return pair
+        name = symbol.split('.', 1)[0].upper()
+        pair = (name[:3], name[3:]) if len(name) == 6 and name.isalpha() else None
+        self.pairs[symbol] = pair
+        return pair
+
+    def define(self, symbol: str, base: str, quote: str):
+        """Use the currencies of a symbol spec, e.g. an index CFD has no pair in its name"""
+        base, quote = base.upper(), quote.upper()
+        pair = (base, quote) if base and quote and base != quote else None
+        if quote:
+            self.quotes[symbol] = quote
+        if self.pairs.get(symbol, False) != pair:
+            self.pairs[symbol] = pair
+            if symbol in self.prices:
+                self._rebuild_edges()
+        slot = self.slots.get(symbol)
+        if slot is not None and slot.quote != self._quote(symbol):
+            if slot.quote is not None:
+                self.slots_by_quote[slot.quote].remove(slot)
+            slot.quote = self._quote(symbol)
+            slot.factor = self.rates.get(slot.quote, 1.0)
+            if slot.quote is not None:
+                self.slots_by_quote.setdefault(slot.quote, []).append(slot)
+
+    def _quote(self, symbol: str) -> Optional[str]:
+        quote = self.quotes.get(symbol)
+        if quote is None:
+            pair = self.parse(symbol)
+            quote = pair[1] if pair else None
+        return quote
+
+    def _rebuild_edges(self):
+        self.edges = {}
+        for symbol in self.prices:
+            pair = self.pairs.get(symbol)
+            if pair is None:
+                continue
+            base, quote = pair
+            self.edges.setdefault(base, {}).setdefault(quote, (symbol, False))
+            self.edges.setdefault(quote, {}).setdefault(base, (symbol, True))
+        self._search_paths()
+
     def update_from_tick(self, symbol: str, bid: float, ask: float):
-        """Update conversion rates from USD-based pairs"""
+        """Record the pair's price and refresh the rates whose path runs through it"""
         try:
-            symbol_clean = symbol.replace('.p', '')
-            bid_decimal = Decimal(str(bid))
-            
-            # Direct USD pairs (quote currency is USD)
-            if symbol_clean == "EURUSD":
-                self.rates["EUR"] = bid_decimal
-            elif symbol_clean == "GBPUSD":
-                self.rates["GBP"] = bid_decimal
-            elif symbol_clean == "AUDUSD":
-                self.rates["AUD"] = bid_decimal
-            elif symbol_clean == "NZDUSD":
-                self.rates["NZD"] = bid_decimal
-            
-            # USD base pairs (base currency is USD, need to invert)
-            elif symbol_clean == "USDJPY":
-                self.rates["JPY"] = Decimal("1.0") / bid_decimal
-            elif symbol_clean == "USDCHF":
-                self.rates["CHF"] = Decimal("1.0") / bid_decimal
-            elif symbol_clean == "USDCAD":
-                self.rates["CAD"] = Decimal("1.0") / bid_decimal
-            
-            # Gold and Silver (already in USD, no conversion needed)
-            # XAUUSD, XAGUSD - PnL will be directly in USD
-                
+            pair = self.parse(symbol)
+            if pair is None or bid <= 0:
+                return
+            known = symbol in self.prices
+            self.prices[symbol] = bid
+            if not known:
+                base, quote = pair
+                self.edges.setdefault(base, {}).setdefault(quote, (symbol, False))
+                self.edges.setdefault(quote, {}).setdefault(base, (symbol, True))
+                self._search_paths()
+            else:
+                for currency in self.users.get(symbol, ()):
+                    self._refresh_rate(currency)
         except Exception as e:
             self.logger.warning(f"Error updating rate for {symbol}: {e}")
-    
+
+    def _search_paths(self):
+        """Breadth-first from USD, every reachable currency gets its fewest-hops path"""
+        paths: Dict[str, List[Tuple[str, bool]]] = {"USD": []}
+        queue = deque(["USD"])
+        while queue:
+            currency = queue.popleft()
+            for neighbour, (symbol, inverted) in self.edges.get(currency, {}).items():
+                if neighbour in paths:
+                    continue
+                # Walking USD -> neighbour, so converting neighbour -> USD uses the pair the other way
+                paths[neighbour] = [(symbol, not inverted)] + paths[currency]
+                queue.append(neighbour)
+
+        self.paths = paths
+        self.users = {}
+        for currency, hops in paths.items():
+            for symbol, _ in hops:
+                self.users.setdefault(symbol, set()).add(currency)
+        for currency in paths:
+            self._refresh_rate(currency)
+
+    def _refresh_rate(self, currency: str):
+        rate = 1.0
+        for symbol, inverted in self.paths[currency]:
+            price = self.prices[symbol]
+            rate = rate / price if inverted else rate * price
+        self.rates[currency] = rate
+        for slot in self.slots_by_quote.get(currency, ()):
+            slot.factor = rate
+
+    def slot(self, symbol: str) -> ConversionSlot:
+        """Conversion slot of a symbol, created (and kept up to date) from the first position on it"""
+        slot = self.slots.get(symbol)
+        if slot is None:
+            quote = self._quote(symbol)
+            slot = self.slots[symbol] = ConversionSlot(symbol, quote, self.rates.get(quote, 1.0))
+            if quote is not None:
+                self.slots_by_quote.setdefault(quote, []).append(slot)
+        return slot
+
+    def factor(self, symbol: str) -> float:
+        """Quote currency -> USD multiplier of a symbol"""
+        slot = self.slots.get(symbol)
+        return slot.factor if slot is not None else self.slot(symbol).factor
+
     def to_usd(self, amount: Decimal, from_currency: str) -> Decimal:
         """Convert amount from any supported currency to USD"""
         if from_currency == "USD":
             return amount
-        
+
         rate = self.rates.get(from_currency)
         if rate is None:
             self.logger.error(f"No conversion rate available for {from_currency}")
             return amount  # Return unconverted as fallback
-        
-        return amount * rate
-    
-    def get_quote_currency(self, symbol: str) -> str:
-        """Extract quote currency from symbol"""
-        symbol_clean = symbol.replace('.p', '')
-        return symbol_clean[-3:]  # Last 3 characters
\ No newline at end of file
+
+        return amount * Decimal(repr(rate))
+
+    def get_quote_currency(self, symbol: str) -> Optional[str]:
+        """Profit currency of a symbol, from its spec or its name"""
+        return self._quote(symbol)
@@ -9,11 +9,16 @@ from .sinks.account import AccountSink, save_mt5_account
 from .sinks.summary import SummarySink
 from .sinks.daily import DailySink
 from .sinks.tick import TickSink
+from .sinks.symbol import SymbolSink
+from .sinks.refresh import AccountRefresher
 from enum import Enum
 from typing import List, Dict
 
 from .transformer import *
 from .producer import p
+from .telemetry import PRODUCED
+from . import wire
+from django.conf import settings
 
 from sub_manager.logging_config import get_prop_logger
 logger = get_prop_logger('bridge')
@@ -28,6 +33,12 @@ class MetaTraderBridge:
         self.password = password
         self.user_group = user_group
         self.manager = MT5Manager.ManagerAPI()
+        # "binary" (see sub_manager/wire) or "json", the rule engine reads both
+        self.wire_format = settings.KAFKA_WIRE_FORMAT
+        # Kept across reconnects, its flush thread publishes the latest tick per symbol
+        self.tick_sink = TickSink(self, interval=settings.BRIDGE_TICK_FLUSH_INTERVAL)
+        # Position and deal events mark their login, the account is refreshed once per window
+        self.account_refresher = AccountRefresher(self, window=settings.BRIDGE_ACCOUNT_REFRESH_WINDOW)
         # self.in_memory_monitor = None
         self.count = 0
 
@@ -41,6 +52,7 @@ class MetaTraderBridge:
         )
         # self.in_memory_monitor = InMemoryPropMonitoring(self)
 
+        self.broadcast_symbols()
         self.broadcast_accounts()
 
         if not connected:
@@ -55,11 +67,25 @@ class MetaTraderBridge:
         return self.manager.Disconnect()
     
     def flush(self):
+        self.tick_sink.flush()
         p.flush()
         print("Kafka flushed")
 
+    def _produce(self, topic, value, key=None, headers=None):
+        if headers:
+            p.produce(topic, value, key=key, headers=headers)
+        else:
+            p.produce(topic, value, key=key)
+        PRODUCED.labels(topic).inc()
+
+    def _publish(self, topic, record, key=None):
+        """Produce a tick/position/deal/account record in the configured wire format"""
+        value, headers = wire.encode(record, self.wire_format)
+        self._produce(topic, value, key=key, headers=headers)
+
     def _subscribe_sinks(self):
         """Subscribe to all data sinks with bridge reference"""
+        self.account_refresher.start()
         if not self.manager.UserSubscribe(UserSink()):
             logger.debug(f"UserSubscribe failed: {MT5Manager.LastError()}")
 
@@ -72,10 +98,15 @@ class MetaTraderBridge:
         # if not self.manager.OrderSubscribe(OrderSink()):
         #     logger.debug(f"OrderSubscribe failed: {MT5Manager.LastError()}")
 
-        # if not self.manager.UserAccountSubscribe(AccountSink(self)):
-        #     logger.debug(f"AccountSubscribe failed: {MT5Manager.LastError()}")
+        # Account state is pushed when the subscription works, trade events poll it otherwise
+        if not self.manager.UserAccountSubscribe(AccountSink(self)):
+            logger.debug(f"AccountSubscribe failed, polling account state: {MT5Manager.LastError()}")
+
+        if not self.manager.SymbolSubscribe(SymbolSink(self)):
+            logger.debug(f"SymbolSubscribe failed: {MT5Manager.LastError()}")
 
-        if not self.manager.TickSubscribe(TickSink(self)):
+        self.tick_sink.start()
+        if not self.manager.TickSubscribe(self.tick_sink):
             logger.debug(f"TickSubscribe failed: {MT5Manager.LastError()}")
 
         logger.info("All sinks subscribed successfully")
@@ -88,6 +119,14 @@ class MetaTraderBridge:
     
     def get_account(self, login)->MT5Manager.MTAccount:
         return self.manager.UserAccountGet(login)
+
+    def refresh_account(self, login):
+        """Debounced: save the account and publish accounts.state from the refresher thread"""
+        self.account_refresher.mark(login)
+
+    def push_account(self, account:MT5Manager.MTAccount):
+        """Account sent by the UserAccountSubscribe sink, saved and published the same way"""
+        self.account_refresher.push(account)
     
     def get_position(self, login)->List[MT5Manager.MTPosition]:
         return self.manager.PositionGet(login)
@@ -198,76 +237,89 @@ class MetaTraderBridge:
     def tick(self, symbol, tick:MT5Manager.MTTickShort):
         try:
             tick_data = transform_tick(symbol, tick)
-            p.produce(
-                "market.ticks", 
-                json.dumps(asdict(tick_data), cls=EnhancedJSONEncoder).encode("utf-8")
-            )
+            self._publish("market.ticks", tick_data)
         except Exception as err:
             print("Error onTick")
             traceback.print_exc()
 
+    def publish_ticks(self, ticks: List[TickData]):
+        """One flush of the tick sink: the latest tick of every symbol that moved"""
+        for tick_data in ticks:
+            try:
+                self._publish("market.ticks", tick_data)
+            except BufferError:
+                # Producer queue full: serve delivery reports and retry once
+                p.poll(0.1)
+                self._publish("market.ticks", tick_data)
+        p.poll(0)
+
+    def publish_symbol(self, symbol:MT5Manager.MTConSymbol):
+        # symbols.spec is compacted: the latest spec per symbol key is kept
+        spec = transform_symbol(symbol)
+        self._produce(
+            "symbols.spec",
+            json.dumps(asdict(spec), cls=EnhancedJSONEncoder).encode("utf-8"),
+            key=spec.symbol
+        )
+        logger.info(f"calling Bridge Publish symbol {spec.symbol}")
+
+    def remove_symbol(self, symbol: str):
+        # Tombstone, compaction drops the symbol's spec
+        self._produce("symbols.spec", None, key=symbol)
+        logger.info(f"calling Bridge Remove symbol {symbol}")
+
+    def broadcast_symbols(self):
+        try:
+            print("dispatching symbol specs to kafka")
+            for pos in range(self.manager.SymbolTotal()):
+                symbol = self.manager.SymbolNext(pos)
+                if symbol:
+                    self.publish_symbol(symbol)
+            print("done dispatching symbol specs to kafka")
+        except Exception as err:
+            print(f"Failed to dispatch symbol specs: {str(err)}")
+            traceback.print_exc()
+
     def add_memory_position(self, position:MT5Manager.MTPosition):
         pos_data = transform_position(position)
-        p.produce(
-            "accounts.position", 
-            json.dumps(asdict(pos_data), cls=EnhancedJSONEncoder).encode("utf-8")
-        )
+        self._publish("accounts.position", pos_data, key=str(pos_data.login))
         logger.info(f"calling Bridge Add position {position.Login}")
     
     def update_memory_position(self, position:MT5Manager.MTPosition):
         pos_data = transform_position(position)
-        p.produce(
-            "accounts.position.update", 
-            json.dumps(asdict(pos_data), cls=EnhancedJSONEncoder).encode("utf-8")
-        )
+        self._publish("accounts.position.update", pos_data, key=str(pos_data.login))
         logger.info(f"calling Bridge Update position {position.Login}")
 
     def remove_memory_position(self, position:MT5Manager.MTPosition):
         pos_data = transform_position(position)
-        p.produce(
-            "accounts.position.remove", 
-            json.dumps(asdict(pos_data), cls=EnhancedJSONEncoder).encode("utf-8")
-        )
+        self._publish("accounts.position.remove", pos_data, key=str(pos_data.login))
         logger.info(f"calling Bridge Remove position {position.Login}")
 
     def add_memory_deal(self, deal:MT5Manager.MTDeal):
         deal_data = transform_deal(deal)
-        p.produce(
-            "accounts.deal", 
-            json.dumps(asdict(deal_data), cls=EnhancedJSONEncoder).encode("utf-8")
-        )
+        self._publish("accounts.deal", deal_data, key=str(deal_data.login))
         logger.info(f"calling Bridge Add deal {deal.Login}")
     
     def update_memory_deal(self, deal:MT5Manager.MTDeal):
         deal_data = transform_deal(deal)
-        p.produce(
-            "accounts.deal.update", 
-            json.dumps(asdict(deal_data), cls=EnhancedJSONEncoder).encode("utf-8")
-        )
+        self._publish("accounts.deal.update", deal_data, key=str(deal_data.login))
         logger.info(f"calling Bridge Update deal {deal.Login}")
 
     def remove_memory_deal(self, deal:MT5Manager.MTDeal):
         deal_data = transform_deal(deal)
-        p.produce(
-            "accounts.deal.remove", 
-            json.dumps(asdict(deal_data), cls=EnhancedJSONEncoder).encode("utf-8")
-        )
+        self._publish("accounts.deal.remove", deal_data, key=str(deal_data.login))
         logger.info(f"calling Bridge Remove deal {deal.Login}")
 
     def update_memory_account(self, account:MT5Manager.MTAccount):
-        account_data = transform_account(account)
-        p.produce(
-            "accounts.state", 
-            json.dumps(asdict(account_data), cls=EnhancedJSONEncoder).encode("utf-8")
-        )
-        logger.info(f"calling Bridge Update Account {account.Login}")
+        self.publish_account(transform_account(account))
+
+    def publish_account(self, account_data: AccountData):
+        self._publish("accounts.state", account_data, key=str(account_data.login))
+        logger.info(f"calling Bridge Update Account {account_data.login}")
     
     def add_memory_account(self, account:MT5Manager.MTAccount):
         account_data = transform_account(account)
-        p.produce(
-            "accounts.state",
-            json.dumps(asdict(account_data), cls=EnhancedJSONEncoder).encode("utf-8")
-        )
+        self._publish("accounts.state", account_data, key=str(account_data.login))
         logger.info(f"calling Bridge Add Account {account.Login}")
     
     def broadcast_accounts(self):
@@ -276,17 +328,11 @@ class MetaTraderBridge:
             accounts:List[MT5Manager.MTAccount] = self.manager.UserAccountGetByGroup(self.user_group)
             for account in accounts:
                 account_data = transform_account(account)
-                p.produce(
-                    "accounts.state", 
-                    json.dumps(asdict(account_data), cls=EnhancedJSONEncoder).encode("utf-8")
-                )
+                self._publish("accounts.state", account_data, key=str(account_data.login))
                 positions = self.manager.PositionGet(login=account.Login)
                 for pos in positions:
                     pos_data = transform_position(pos)
-                    p.produce(
-                        "accounts.position", 
-                        json.dumps(asdict(pos_data), cls=EnhancedJSONEncoder).encode("utf-8")
-                    )
+                    self._publish("accounts.position", pos_data, key=str(pos_data.login))
             print("done dispatching accounts to kafka")
         except Exception as err:
             print(f"Failed to dispatch accounts: {str(err)}")
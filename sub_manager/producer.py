@@ -2,8 +2,10 @@ import redis
 from django.conf import settings
 from confluent_kafka import Producer
 from channels.layers import get_channel_layer
+from sub_manager.telemetry import PRODUCER_QUEUE, TimedRedis
 
 p = Producer({"bootstrap.servers": "localhost:9092"})
+PRODUCER_QUEUE.set_function(lambda: len(p))
 
 # Create connection pool
 redis_pool = redis.ConnectionPool.from_url(
@@ -13,6 +15,6 @@ redis_pool = redis.ConnectionPool.from_url(
 )
 
 # Create client from pool
-redis_client = redis.Redis(connection_pool=redis_pool)
+redis_client = TimedRedis(connection_pool=redis_pool)
 
 channel_layer = get_channel_layer()
\ No newline at end of file
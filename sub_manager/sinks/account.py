@@ -39,27 +39,34 @@ def save_mt5_account(account_obj: MT5Manager.MTAccount):
 class AccountSink:
     def __init__(self, bridge=None):
         self.bridge = bridge
-    
+
+    def push(self, account: MT5Manager.MTAccount):
+        # Coalesced per login, saved and published to accounts.state off the pump thread
+        try:
+            if self.bridge:
+                self.bridge.push_account(account)
+            else:
+                save_mt5_account(account)
+        except Exception as err:
+            print(f"Error pushing account {account.Login}: {str(err)}")
+
     def OnAccountMarginCallEnter(self, account: MT5Manager.MTAccount, group: MT5Manager.MTConGroup):
         print("Account entering the Margin Call state", account.Login)
-        # Save account state and create history record
-        save_mt5_account(account)
+        self.push(account)
 
     def OnAccountMarginCallLeave(self, account: MT5Manager.MTAccount, group: MT5Manager.MTConGroup):
         print("Account exiting the Margin Call state", account.Login)
-        save_mt5_account(account)
+        self.push(account)
 
 
     def OnAccountStopOutEnter(self, account: MT5Manager.MTAccount, group: MT5Manager.MTConGroup):
         print("Account entering the Stop Out state", account.Login)
-        save_mt5_account(account)
+        self.push(account)
     
     def OnAccountStopOutLeave(self, account: MT5Manager.MTAccount, group: MT5Manager.MTConGroup):
         print("Account exiting the Stop Out state", account.Login)
-        save_mt5_account(account)
+        self.push(account)
     
     def OnAccountUpdate(self, account: MT5Manager.MTAccount):
-        """Handle general account updates - add this if MT5 provides this callback"""
-        # Save account state (history will be created if significant change)
-        print("Account update", account.Login)
-        save_mt5_account(account)
\ No newline at end of file
+        """Account state pushed by the server, trade events then need no UserAccountGet"""
+        self.push(account)
\ No newline at end of file
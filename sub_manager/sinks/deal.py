@@ -2,7 +2,7 @@ import MT5Manager, traceback
 from trading.models import MT5Deal
 import logging
 from stanum_web.tasks import *
-from sub_manager.toDict import account_to_dict, deal_to_dict
+from sub_manager.toDict import deal_to_dict
 
 logger = logging.getLogger(__name__)
 
@@ -11,28 +11,15 @@ class DealSink:
         self.bridge = bridge
     
     def update_user_account(self, login):
-        try:
-            if self.bridge:
-                account: MT5Manager.MTAccount = self.bridge.get_account(login)
-                if account:
-                    print(f"Retrieved Account info for {login}")
-                    save_mt5_account.delay(account_to_dict(account))
-                    return account
-                else:
-                    print(f"Failed to get account info for {login}")
-                    return None
-        except Exception as err:
-            print(f"Issue occured {str(err)}")
+        # Refreshed (saved and published to accounts.state) off the pump thread, once per burst
+        if self.bridge:
+            self.bridge.refresh_account(login)
             
     def OnDealAdd(self, deal: MT5Manager.MTDeal):
         try:
             print("Deal Added", deal.Print())
             save_mt5_deal.delay(deal_to_dict(deal))
-            acc = self.update_user_account(deal.Login)
-            if acc:
-                # if(acc.challenge_completed or acc.challenge_failed):
-                #     return
-                self.bridge.update_memory_account(acc)
+            self.update_user_account(deal.Login)
             self.bridge.add_memory_deal(deal)
         except Exception as err:
             print("Error Adding deal", str(err))
@@ -43,11 +30,7 @@ class DealSink:
             print("Deal Updated", deal.Print())
             # Save updated deal to database
             mt5_deal = save_mt5_deal.delay(deal_to_dict(deal))
-            acc = self.update_user_account(deal.Login)
-            if acc:
-                # if(acc.challenge_completed or acc.challenge_failed):
-                #     return
-                self.bridge.update_memory_account(acc)
+            self.update_user_account(deal.Login)
             self.bridge.update_memory_deal(mt5_deal)
         except Exception as err:
             print("Error Updating deal", str(err))
@@ -0,0 +1,132 @@
+import threading, time, traceback
+from typing import Dict, Tuple
+
+from sub_manager.InMemoryData import AccountData
+
+from sub_manager.logging_config import get_prop_logger
+from sub_manager.toDict import account_to_dict
+from sub_manager.transformer import transform_account
+from stanum_web.tasks import save_mt5_account
+
+logger = get_prop_logger('bridge')
+
+
+class AccountRefresher:
+    """
+    Debounced account state, off the MT5 pump thread.
+
+    Logins get dirty two ways: the position and deal sinks mark(login) after a trade
+    event, and the AccountSink push()es the account the server sent. A login dirtied
+    again while it is waiting is not queued twice: a worker thread handles it once
+    `window` seconds after it first got dirty, with one save_mt5_account task and one
+    accounts.state publish. The latest pushed account is used when it came after the
+    login's last mark, otherwise the login is polled (UserAccountGet), which is always
+    the case when the subscription is unavailable.
+    """
+    REPORT_INTERVAL = 60.0
+
+    def __init__(self, bridge, window: float = 0.5):
+        self.bridge = bridge
+        self.window = window
+        # login -> refresh deadline, insertion order is deadline order (constant window)
+        self.dirty: Dict[int, float] = {}
+        # login -> latest pushed (record published, row saved)
+        self.pushed: Dict[int, Tuple[AccountData, dict]] = {}
+        self.condition = threading.Condition()
+        self.thread = None
+
+        self.marked = 0
+        self.received = 0
+        self.refreshed = 0
+        self.polled = 0
+        self.failed = 0
+        self.last_report = time.monotonic()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="account-refresher", daemon=True)
+        self.thread.start()
+
+    def mark(self, login: int):
+        """Queue a refresh of the login, called from the pump thread"""
+        with self.condition:
+            self.marked += 1
+            # A push from before this trade event is stale, poll the post-trade state instead
+            self.pushed.pop(login, None)
+            self._dirty(login)
+
+    def push(self, account):
+        """Queue a pushed account, called from the pump thread"""
+        # The MT5 object is only valid during the callback, keep a copy of its values
+        state = (transform_account(account), account_to_dict(account))
+        with self.condition:
+            self.received += 1
+            self.pushed[state[0].login] = state
+            self._dirty(state[0].login)
+
+    def _dirty(self, login: int):
+        if login not in self.dirty:
+            self.dirty[login] = time.monotonic() + self.window
+            self.condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        with self.condition:
+            pending = len(self.dirty)
+        return {
+            "marked": self.marked,
+            "received": self.received,
+            "refreshed": self.refreshed,
+            "polled": self.polled,
+            "coalesced": self.marked + self.received - self.refreshed - self.failed - pending,
+            "failed": self.failed,
+            "pending": pending,
+        }
+
+    def _due(self):
+        """Logins whose window has passed, waits until there is at least one"""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                due = []
+                for login, deadline in self.dirty.items():
+                    if deadline > now:
+                        break
+                    due.append(login)
+                if due:
+                    for login in due:
+                        del self.dirty[login]
+                    return [(login, self.pushed.pop(login, None)) for login in due]
+                timeout = next(iter(self.dirty.values())) - now if self.dirty else None
+                self.condition.wait(timeout)
+
+    def _run(self):
+        while True:
+            for login, pushed in self._due():
+                self.refresh(login, pushed)
+            self._maybe_report()
+
+    def refresh(self, login: int, pushed=None):
+        try:
+            if pushed is None:
+                account = self.bridge.get_account(login)
+                self.polled += 1
+                if not account:
+                    print(f"Failed to get account info for {login}")
+                    self.failed += 1
+                    return
+                pushed = (transform_account(account), account_to_dict(account))
+            account_data, row = pushed
+            save_mt5_account.delay(row)
+            self.bridge.publish_account(account_data)
+            self.refreshed += 1
+        except Exception:
+            self.failed += 1
+            print(f"Error refreshing account {login}")
+            traceback.print_exc()
+
+    def _maybe_report(self):
+        if time.monotonic() - self.last_report < self.REPORT_INTERVAL:
+            return
+        self.last_report = time.monotonic()
+        logger.info(f"Account refresher stats: {self.stats()}")
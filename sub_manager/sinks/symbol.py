@@ -0,0 +1,23 @@
+import MT5Manager
+
+class SymbolSink:
+    def __init__(self, bridge=None):
+        self.bridge = bridge
+
+    def OnSymbolAdd(self, symbol:MT5Manager.MTConSymbol):
+        try:
+            self.bridge.publish_symbol(symbol)
+        except Exception as err:
+            print(f"Error publishing symbol add {str(err)}")
+
+    def OnSymbolUpdate(self, symbol:MT5Manager.MTConSymbol):
+        try:
+            self.bridge.publish_symbol(symbol)
+        except Exception as err:
+            print(f"Error publishing symbol update {str(err)}")
+
+    def OnSymbolDelete(self, symbol:MT5Manager.MTConSymbol):
+        try:
+            self.bridge.remove_symbol(symbol.Symbol)
+        except Exception as err:
+            print(f"Error publishing symbol delete {str(err)}")
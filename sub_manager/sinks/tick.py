@@ -1,14 +1,97 @@
-import MT5Manager, time
+import MT5Manager, threading, time, traceback
+from typing import Dict
+
+from sub_manager.InMemoryData import TickData
+from sub_manager.logging_config import get_prop_logger
+from sub_manager.transformer import transform_tick
+
+logger = get_prop_logger('bridge')
+
 
 class TickSink:
-    def __init__(self, bridge=None):
+    """
+    Conflating tick publisher.
+
+    OnTick runs on the MT5 pump thread and only stores the latest tick of the symbol
+    (a single dict assignment, no lock). A background thread wakes up every
+    `interval` seconds and publishes the symbols whose tick changed since its last
+    pass to market.ticks in one batch, so Kafka sees at most one tick per symbol per
+    interval and never a price older than that.
+    """
+    REPORT_INTERVAL = 60.0
+
+    def __init__(self, bridge=None, interval: float = 0.2):
         self.bridge = bridge
-        self.last_tick_time = {}  # store last processed time per symbol
-    
-    def OnTick(self, symbol: str, tick:MT5Manager.MTTick):
-        now = time.time()
-        last_time = self.last_tick_time.get(symbol, 0)
-
-        if now - last_time >= 30:
-            self.last_tick_time[symbol] = now
-            self.bridge.tick(symbol, tick)
+        self.interval = interval
+        self.latest: Dict[str, TickData] = {}  # written by the pump thread only
+        self.sent: Dict[str, TickData] = {}    # flush thread only
+        self.thread = None
+        self.stopping = threading.Event()
+
+        self.received = 0
+        self.published = 0
+        self.flush_max = 0.0
+        self.last_report = time.monotonic()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="tick-flusher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the flush thread after publishing what is pending"""
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+
+    def OnTick(self, symbol: str, tick: MT5Manager.MTTick):
+        # The MT5 object is only valid during the callback, keep a copy of its values
+        self.latest[symbol] = transform_tick(symbol, tick)
+        self.received += 1
+
+    def flush(self) -> int:
+        """Publish every symbol whose latest tick has not been sent, returns how many"""
+        # dict.copy() runs under the GIL, it cannot interleave with the pump's assignment
+        snapshot = self.latest.copy()
+        batch = [tick for symbol, tick in snapshot.items() if self.sent.get(symbol) is not tick]
+        if not batch:
+            return 0
+        self.bridge.publish_ticks(batch)
+        for tick in batch:
+            self.sent[tick.symbol] = tick
+        self.published += len(batch)
+        return len(batch)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "received": self.received,
+            "published": self.published,
+            "conflated": self.received - self.published,
+            "symbols": len(self.latest),
+            "max_flush_ms": self.flush_max * 1000,
+        }
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            self._flush_safely()
+        self._flush_safely()
+
+    def _flush_safely(self):
+        started = time.perf_counter()
+        try:
+            self.flush()
+        except Exception:
+            print("Error flushing ticks")
+            traceback.print_exc()
+        self.flush_max = max(self.flush_max, time.perf_counter() - started)
+        self._maybe_report()
+
+    def _maybe_report(self):
+        if time.monotonic() - self.last_report < self.REPORT_INTERVAL:
+            return
+        self.last_report = time.monotonic()
+        logger.info(f"Tick publisher stats: {self.stats()}")
@@ -0,0 +1,145 @@
+import json, threading, time
+import redis
+
+from sub_manager.logging_config import get_prop_logger
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
+except ImportError:  # Optional, without it every metric below is a no-op
+    Counter = Gauge = Histogram = start_http_server = None
+
+logger = get_prop_logger('monitoring')
+
+
+def telemetry_available() -> bool:
+    return start_http_server is not None
+
+
+class _NoMetric:
+    """Stands in for a prometheus metric when prometheus_client is not installed"""
+    def labels(self, *args, **kwargs): return self
+    def inc(self, amount: float = 1): pass
+    def set(self, value: float): pass
+    def set_function(self, fn): pass
+    def observe(self, value: float): pass
+
+
+def _metric(kind, name: str, documentation: str, labels=(), **kwargs):
+    if kind is None:
+        return _NoMetric()
+    return kind(name, documentation, labels, **kwargs)
+
+
+# Sub-millisecond up to seconds, OnTick on a busy symbol and Redis round-trips share the range
+LATENCY_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5)
+
+#===============================================================================================
+# RULE ENGINE
+#===============================================================================================
+ONTICK_SECONDS = _metric(Histogram, "monitor_ontick_seconds", "OnTick run time per (conflated) symbol tick",
+                         buckets=LATENCY_BUCKETS)
+MESSAGES = _metric(Counter, "monitor_messages", "Kafka messages consumed", ["topic"])
+CONSUMER_LAG = _metric(Gauge, "monitor_consumer_lag", "Messages behind the partition end, from librdkafka statistics",
+                       ["topic", "partition"])
+ACCOUNTS = _metric(Gauge, "monitor_accounts", "Accounts held in memory")
+POSITIONS = _metric(Gauge, "monitor_positions", "Open positions held in memory")
+CELERY_ENQUEUE_SECONDS = _metric(Histogram, "celery_enqueue_seconds", "Time to publish a Celery task to the broker",
+                                 ["task"], buckets=LATENCY_BUCKETS)
+REDIS_SECONDS = _metric(Histogram, "redis_call_seconds", "Redis command round-trip, pipelines as PIPELINE",
+                        ["command"], buckets=LATENCY_BUCKETS)
+CHANNEL_SECONDS = _metric(Histogram, "channel_layer_send_seconds", "channel_layer.group_send latency",
+                          buckets=LATENCY_BUCKETS)
+BROADCAST_PENDING = _metric(Gauge, "channel_broadcast_pending", "Broadcasts waiting for the sender thread")
+
+#===============================================================================================
+# BRIDGE
+#===============================================================================================
+PRODUCED = _metric(Counter, "bridge_messages_produced", "Kafka messages produced", ["topic"])
+PRODUCER_QUEUE = _metric(Gauge, "kafka_producer_queue_depth", "Messages waiting in the producer queue")
+
+# librdkafka statistics interval (ms) for consumers created with consumer_stats()
+STATS_INTERVAL_MS = 15000
+
+
+def start(port: int) -> bool:
+    """Serve /metrics on a background thread, port 0 leaves metrics off"""
+    if not port:
+        return False
+    if not telemetry_available():
+        logger.warning("Metrics port set but prometheus_client is not installed, metrics are disabled")
+        return False
+    start_http_server(port)
+    _connect_celery_signals()
+    logger.info(f"Metrics served on :{port}/metrics")
+    return True
+
+
+def consumer_stats() -> dict:
+    """Consumer config entries that feed CONSUMER_LAG from librdkafka's periodic statistics"""
+    if not telemetry_available():
+        return {}
+    return {"statistics.interval.ms": STATS_INTERVAL_MS, "stats_cb": _record_consumer_stats}
+
+
+def _record_consumer_stats(stats_json: str):
+    try:
+        stats = json.loads(stats_json)
+        for topic, topic_stats in stats.get("topics", {}).items():
+            for partition, partition_stats in topic_stats.get("partitions", {}).items():
+                lag = partition_stats.get("consumer_lag", -1)
+                # Partition -1 is librdkafka's internal unassigned queue, -1 lag is unknown
+                if partition == "-1" or lag < 0:
+                    continue
+                CONSUMER_LAG.labels(topic, partition).set(lag)
+    except Exception as err:
+        logger.debug(f"Unreadable consumer statistics: {err}")
+
+
+#===============================================================================================
+# CELERY / REDIS
+#===============================================================================================
+# Start of the publish in progress on this thread. Both signals fire in the publishing
+# thread around the broker write, a publish that raises never reaches after_task_publish
+# and its start time is simply overwritten by the next one, nothing accumulates
+_publishing = threading.local()
+
+
+def _connect_celery_signals():
+    from celery.signals import after_task_publish, before_task_publish
+    before_task_publish.connect(_before_publish, weak=False)
+    after_task_publish.connect(_after_publish, weak=False)
+
+
+def _before_publish(sender=None, **kwargs):
+    _publishing.started = time.perf_counter()
+
+
+def _after_publish(sender=None, **kwargs):
+    started = getattr(_publishing, "started", None)
+    _publishing.started = None
+    if started is not None:
+        CELERY_ENQUEUE_SECONDS.labels(sender or "unknown").observe(time.perf_counter() - started)
+
+
+class TimedRedis(redis.Redis):
+    """Redis client that records the round-trip of every command and pipeline"""
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_SECONDS.labels(str(args[0]).upper() if args else "unknown").observe(time.perf_counter() - started)
+
+    def pipeline(self, *args, **kwargs):
+        pipe = super().pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def timed_execute(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return execute(*a, **kw)
+            finally:
+                REDIS_SECONDS.labels("PIPELINE").observe(time.perf_counter() - started)
+
+        pipe.execute = timed_execute
+        return pipe
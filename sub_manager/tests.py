@@ -0,0 +1,461 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+#===============================================================================================
+# ACCOUNT REFRESHER
+#===============================================================================================
+def _mt5_account(login: int, balance: float):
+    return SimpleNamespace(
+        Login=login, CurrencyDigits=2, Balance=balance, Credit=0, Margin=0, MarginFree=0, MarginLeverage=100,
+        MarginInitial=0, MarginMaintenance=0, Profit=0, Storage=0, Commission=0, Floating=0, Equity=balance,
+        SOActivation=0, SOTime=0, SOLevel=0, SOEquity=0, SOMargin=0, BlockedCommission=0, BlockedProfit=0,
+        Assets=0, Liabilities=0,
+    )
+
+
+class _RefreshBridge:
+    def __init__(self):
+        self.polled = []
+        self.published = []
+
+    def get_account(self, login):
+        self.polled.append(login)
+        return _mt5_account(login, 1.0)
+
+    def publish_account(self, account_data):
+        self.published.append((account_data.login, account_data.balance))
+
+
+def _refresh_due(refresher):
+    # window=0: everything dirty is due, run the worker's step on this thread
+    for login, pushed in refresher._due():
+        refresher.refresh(login, pushed)
+
+
+@pytest.fixture
+def refresher(monkeypatch):
+    import sub_manager.sinks.refresh as refresh
+    monkeypatch.setattr(refresh, "save_mt5_account", SimpleNamespace(delay=lambda row: None))
+    return refresh.AccountRefresher(_RefreshBridge(), window=0)
+
+
+def test_refresher_uses_a_push_newer_than_the_trade(refresher):
+    refresher.mark(7)
+    refresher.push(_mt5_account(7, 80.0))
+    _refresh_due(refresher)
+    assert refresher.bridge.polled == []
+    assert refresher.bridge.published == [(7, 80.0)]
+
+
+def test_refresher_polls_when_a_trade_follows_the_push(refresher):
+    refresher.push(_mt5_account(7, 50.0))
+    refresher.mark(7)
+    _refresh_due(refresher)
+    assert refresher.bridge.polled == [7]
+    assert refresher.bridge.published == [(7, 1.0)]
+
+
+#===============================================================================================
+# RULE ENGINE
+#===============================================================================================
+@pytest.fixture
+def engine(request):
+    """Monitoring engine with Celery tasks and WebSocket broadcasts swapped for counters"""
+    import sub_manager.InMemoryPropMonitoring as monitor_module
+    from sub_manager.InMemoryReplay import offline_outbound
+
+    options = dict(columnar=False, breach_index=False, evaluators="challenge")
+    options.update(getattr(request, "param", {}))  # indirect parametrization overrides these
+    monitor = monitor_module.InMemoryPropMonitoring(**options)
+    with offline_outbound(monitor, monitor_module) as outbound:
+        monitor.outbound = outbound
+        yield monitor
+
+
+def _load(monitor, accounts: int = 1, positions: int = 0):
+    from sub_manager.InMemoryReplay import synthetic_scenario
+    for msg in synthetic_scenario(accounts, positions, ticks=0, tick_rate=1.0):
+        monitor.handle_message(msg)
+
+
+def test_profit_target_steps_up_without_waiting_for_min_days(engine):
+    _load(engine)
+    assert engine.scheduler.pending(1, "max_days")
+    assert not engine.scheduler.pending(1, "min_days")
+
+    account = engine.local_accounts[1]
+    account.balance = account.equity = 108000.0  # 8% target, on the challenge's first day
+    engine.update_account(account)
+
+    assert engine.local_accounts[1].step == 2
+    assert engine.outbound.get("move_account_to_step_2") == 1
+
+
+def test_drawdown_percent_is_the_drop_from_the_high(engine):
+    _load(engine)  # 100000 account size, equity starts at 100000
+    account = engine.local_accounts[1]
+    account.equity = 103000.0
+    engine.update_drawdown(1)
+    engine.update_total_drawdown(1)
+
+    account.equity = 97850.0
+    dd = engine.update_drawdown(1)
+    td = engine.update_total_drawdown(1)
+    # (high - equity) / high * 100, positive while under water
+    assert float(dd.drawdown_percent) == pytest.approx((103000 - 97850) / 103000 * 100)
+    assert float(td.drawdown_percent) == pytest.approx((103000 - 97850) / 103000 * 100)
+
+    account.equity = 104000.0
+    assert float(engine.update_drawdown(1).drawdown_percent) == 0
+    assert float(engine.update_total_drawdown(1).drawdown_percent) == 0
+
+
+def test_snapshot_round_trip(engine, tmp_path):
+    from sub_manager.InMemorySnapshot import MonitorSnapshot
+    _load(engine, accounts=3, positions=2)
+    snapshot = MonitorSnapshot(str(tmp_path / "monitor.snapshot"))
+    snapshot.save(engine.snapshot_state(), {("accounts.position", 0): 42}, {1: 0})
+    snapshot.writer.join()
+
+    restored = MonitorSnapshot(snapshot.path).load()
+    assert restored["offsets"] == {("accounts.position", 0): 42}
+    fresh = type(engine)(columnar=False, breach_index=False, evaluators="challenge")
+    fresh.restore_state(restored["state"])
+    assert fresh.local_accounts.keys() == engine.local_accounts.keys()
+    assert {login: set(positions) for login, positions in fresh.positions.items()} == \
+        {login: set(positions) for login, positions in engine.positions.items()}
+
+
+#===============================================================================================
+# DEAL RULES
+#===============================================================================================
+def _baseline_strategies(deals: dict):
+    """The pre-tracker scan: entry deals of the login's deal dict, stable-sorted by time"""
+    open_deals = [d for d in deals.values() if d.action in [0, 1] and d.entry in [0, 2]]
+    open_deals.sort(key=lambda d: d.time)
+    grid = None
+    if len(open_deals) >= 3:
+        volumes = {float(d.volume) for d in open_deals[-3:]}
+        grid = volumes.pop() if len(volumes) == 1 else None
+    martingale = None
+    for prev, curr in zip(open_deals[:-1], open_deals[1:]):
+        if prev.profit < 0 and curr.volume > prev.volume:
+            martingale = (prev.deal, curr.deal)
+            break
+    return grid, martingale
+
+
+def test_redelivered_deal_is_not_counted_after_eviction(engine):
+    import pickle, time
+    from sub_manager.InMemoryData import DealRecord
+    from sub_manager.InMemoryStore import DealRing
+
+    _load(engine)
+    engine.deals[1] = DealRing(3)
+    now = int(time.time())
+    deals = [DealRecord(deal=i, login=1, symbol="EURUSD.p", action=0, entry=0, volume=100, time=now) for i in range(1, 6)]
+    for deal in deals:
+        engine.add_deal(deal)
+    assert 1 not in engine.deals[1]
+    assert engine.trade_rates[1].counts() == (5, 5)
+
+    # Kafka re-delivers the first deals after a rebalance, past the ring window
+    engine.add_deal(deals[0])
+    engine.add_deal(deals[1])
+    assert engine.trade_rates[1].counts() == (5, 5)
+    assert len(engine.strategies[1]) == 5
+    assert list(engine.deals[1]) == [3, 4, 5]
+
+    restored = pickle.loads(pickle.dumps(engine.deals[1]))
+    assert restored.seen(1) and restored.seen(5) and not restored.seen(6)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_strategy_tracker_matches_the_sorted_scan(seed):
+    import random
+    from sub_manager.InMemoryData import DealRecord
+    from sub_manager.InMemoryStore import StrategyTracker
+
+    rng = random.Random(seed)
+    tracker = StrategyTracker()
+    deals = {}
+    clock, next_id = 1000, 1
+
+    def deal(deal_id, time):
+        return DealRecord(
+            deal=deal_id, login=1, symbol="EURUSD.p", action=rng.choice([0, 0, 1, 2]), entry=rng.choice([0, 0, 1, 2]),
+            volume=rng.choice([100, 100, 200, 300]), profit=rng.uniform(-50, 50), time=time,
+        )
+
+    for _ in range(300):
+        op = rng.random()
+        if op < 0.55 or not deals:  # in order (ties included)
+            clock += rng.choice([0, 0, 1, 5])
+            new = deal(next_id, clock)
+            next_id += 1
+        elif op < 0.7:  # late
+            new = deal(next_id, clock - rng.randint(1, 50))
+            next_id += 1
+        elif op < 0.9:  # update, same position in the deal dict, time may move
+            existing = deals[rng.choice(list(deals))]
+            new = deal(existing.deal, existing.time + rng.choice([0, 0, -3, 3]))
+        else:  # remove
+            deal_id = rng.choice(list(deals))
+            del deals[deal_id]
+            tracker.remove(deal_id)
+            new = None
+
+        if new is not None:
+            updating = new.deal in deals
+            deals[new.deal] = new
+            # as the monitor's add_deal / update_deal feed the tracker
+            if updating:
+                if StrategyTracker.is_entry(new):
+                    tracker.update(new)
+                else:
+                    tracker.remove(new.deal)
+            elif StrategyTracker.is_entry(new):
+                tracker.add(new)
+
+        pair = tracker.martingale_pair()
+        assert (tracker.grid_volume(), pair and (pair[0].deal, pair[1].deal)) == _baseline_strategies(deals)
+
+
+def test_trade_rate_window_boundaries_are_inclusive():
+    from sub_manager.InMemoryStore import TradeRateWindow
+
+    now = 100000
+    window = TradeRateWindow()
+    for timestamp in (now - 3601, now - 3600, now - 61, now - 60, now):
+        window.add(timestamp, now=now)
+    assert window.counts(now=now) == (2, 4)
+    # One second later the 60 s and 3600 s edge deals drop out
+    assert window.counts(now=now + 1) == (1, 3)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_trade_rate_window_matches_a_full_count(seed):
+    import random
+    from sub_manager.InMemoryStore import TradeRateWindow
+
+    rng = random.Random(seed)
+    now = 100000
+    window = TradeRateWindow()
+    timestamps = [now - rng.randint(0, 4000) for _ in range(500)]
+    for timestamp in timestamps:  # arrival order is random, late deals included
+        window.add(timestamp, now=now)
+    expected = (sum(1 for t in timestamps if t >= now - 60), sum(1 for t in timestamps if t >= now - 3600))
+    assert window.counts(now=now) == expected
+
+
+#===============================================================================================
+# WIRE FORMAT / CONVERSION
+#===============================================================================================
+@pytest.fixture(params=["json", "msgpack", "msgpack missing"])
+def wire_format(request, monkeypatch):
+    """Format the bridge encodes with: JSON, binary over msgpack, binary falling back to JSON"""
+    from sub_manager import wire
+    if request.param == "json":
+        return "json"
+    if request.param == "msgpack":
+        pytest.importorskip("msgpack")
+    else:
+        monkeypatch.setattr(wire, "msgpack", None)
+    return "binary"
+
+
+def _send(monitor, topic: str, record, fmt: str):
+    from sub_manager import wire
+    from sub_manager.InMemoryReplay import ReplayMessage
+    value, headers = wire.encode(record, fmt)
+    monitor.handle_message(ReplayMessage(topic, value, headers=headers))
+
+
+def test_cross_pair_is_valued_through_usd_pair(engine, wire_format):
+    from sub_manager.InMemoryData import PositionData, TickData
+    _load(engine)  # USDJPY.p ticks at 151.20, no JPY/USD pair on EURJPY
+    _send(engine, "market.ticks", TickData("EURJPY.p", 1, 163.0, 163.02, 163.0, 0, 1000, 0), wire_format)
+    _send(engine, "accounts.position", PositionData(
+        position_id=9, login=1, symbol="EURJPY.p", price_open=162.0, volume=10000, contract_size=100000, action=0,
+    ), wire_format)
+    _send(engine, "market.ticks", TickData("EURJPY.p", 2, 163.5, 163.52, 163.5, 0, 2000, 0), wire_format)
+
+    # 1 lot long, 1.5 JPY up: 150000 JPY at 1 / 151.20 USD per JPY
+    expected = (163.5 - 162.0) * 100000 / 151.20
+    assert engine.converter.factor("EURJPY.p") == pytest.approx(1 / 151.20)
+    assert float(engine.local_accounts[1].profit) == pytest.approx(expected)
+    assert float(engine.local_accounts[1].equity) == pytest.approx(100000 + expected)
+
+
+def _round_trip(record, cls, fmt: str):
+    from sub_manager import wire
+    value, headers = wire.encode(record, fmt)
+    return wire.decode_value(value, headers, cls)
+
+
+def test_wire_round_trips_an_account(wire_format):
+    from datetime import datetime, timezone
+    from decimal import Decimal
+    from sub_manager.InMemoryData import AccountData
+
+    created = datetime(2026, 3, 2, 9, 30, tzinfo=timezone.utc)
+    account = AccountData(
+        login=7, currency_digits=2, balance=Decimal("100250.5"), equity=Decimal("99875.25"), margin_leverage=100,
+        so_time=1767225600, active=False, step=2, created_at=created,
+    )
+    decoded = _round_trip(account, AccountData, wire_format)
+    # Decimals come back as floats and datetimes as isoformat, the same on every format
+    assert decoded == AccountData(
+        login=7, currency_digits=2, balance=100250.5, equity=99875.25, margin_leverage=100,
+        so_time=1767225600, active=False, step=2, created_at=created.isoformat(),
+    )
+    assert isinstance(decoded.balance, float)
+
+
+def test_wire_round_trips_a_tick(wire_format):
+    from sub_manager.InMemoryData import TickData
+    tick = TickData("USDJPY.p", 1767225600, 151.203, 151.215, 151.21, 3, 1767225600123, 3000000)
+    assert _round_trip(tick, TickData, wire_format) == tick
+
+
+def test_wire_round_trips_a_position_into_its_record(wire_format):
+    from sub_manager.InMemoryData import PositionData, PositionRecord
+    position = PositionData(
+        position_id=11, login=7, symbol="EURJPY.p", comment="grid", price_open=162.5, price_sl=160.0,
+        volume=2500, contract_size=100000.0, profit=-12.5, action=1, reason=3,
+    )
+    assert _round_trip(position, PositionRecord, wire_format) == PositionRecord(
+        position_id=11, login=7, symbol="EURJPY.p", action=1, volume=2500, contract_size=100000.0,
+        price_open=162.5, profit=-12.5,
+    )
+
+
+def test_wire_round_trips_a_deal_into_its_record(wire_format):
+    from sub_manager.InMemoryData import DealData, DealRecord
+    deal = DealData(
+        deal=31, login=7, order=30, action=0, entry=None, symbol="EURUSD.p", price=1.0851, volume=1000,
+        profit=4.25, position_id=11, time=1767225600, time_msc=1767225600500,
+    )
+    assert _round_trip(deal, DealRecord, wire_format) == DealRecord(
+        deal=31, login=7, position_id=11, symbol="EURUSD.p", action=0, entry=None, volume=1000, profit=4.25,
+        time=1767225600,
+    )
+
+
+#===============================================================================================
+# BREACH INDEX
+#===============================================================================================
+@pytest.mark.parametrize("side", [0, 1])
+def test_breach_index_due_takes_out_the_crossed_bands(side):
+    from sub_manager.InMemoryBreachIndex import BreachIndex
+
+    index = BreachIndex()
+    index.place(1, "EURUSD.p", side, 1.08, 1.09)
+    index.place(2, "EURUSD.p", side, 1.07, 1.10)
+    index.place(3, "GBPUSD.p", side, 1.08, 1.09)
+    inside = (1.085, 1.085)
+    assert index.due("EURUSD.p", *inside) == []
+
+    # The side's price (bid for buys, ask for sells) reaching an edge is due, the other price is not
+    below = (1.08, 1.075) if side == BreachIndex.BID else (1.075, 1.08)
+    assert index.due("EURUSD.p", *below) == [1]
+    assert 1 not in index and 2 in index and 3 in index
+
+    index.place(1, "EURUSD.p", side, 1.08, 1.09)
+    above = (1.10, 1.085) if side == BreachIndex.BID else (1.085, 1.10)
+    assert sorted(index.due("EURUSD.p", *above)) == [1, 2]
+    assert len(index) == 1 and 3 in index
+
+
+@pytest.mark.parametrize("engine", [{"breach_index": True}], indirect=True)
+@pytest.mark.parametrize("action, crash", [(0, (1.0, 1.0001)), (1, (1.17, 1.1701))])
+def test_parked_account_unparks_when_its_price_crosses_the_floor(engine, action, crash):
+    from sub_manager.InMemoryData import PositionData, TickData
+    _load(engine)
+    _send(engine, "accounts.position", PositionData(
+        position_id=9, login=1, symbol="EURUSD.p", price_open=1.0850, volume=10000, contract_size=100000, action=action,
+    ), "json")
+    _send(engine, "market.ticks", TickData("EURUSD.p", 1, 1.0851, 1.0852, 1.0851, 0, 1000, 0), "json")
+    assert 1 in engine.breach_index
+    assert engine.outbound.get("fail_account") is None
+
+    # 1 lot, 8.5 cents against it: past the 5% daily floor
+    bid, ask = crash
+    _send(engine, "market.ticks", TickData("EURUSD.p", 2, bid, ask, bid, 0, 2000, 0), "json")
+    assert 1 not in engine.breach_index
+    assert engine.outbound.get("fail_account") == 1
+
+
+#===============================================================================================
+# EXPOSURE BOOK
+#===============================================================================================
+@pytest.mark.parametrize("seed", range(5))
+def test_exposure_pnl_matches_the_per_position_sum(seed):
+    import random
+    from sub_manager.InMemoryData import PositionRecord
+    from sub_manager.InMemoryRevaluation import ExposureBook, position_units
+
+    rng = random.Random(seed)
+    book = ExposureBook()
+    positions = {}
+    for position_id in range(200):
+        op = rng.random()
+        if op < 0.7 or not positions:
+            login = rng.randint(1, 3)
+        elif op < 0.85:  # update: side, size, price or symbol may change
+            login, position_id = rng.choice(list(positions))
+        else:
+            login, position_id = rng.choice(list(positions))
+            del positions[(login, position_id)]
+            book.remove(login, position_id)
+            continue
+        pos = PositionRecord(
+            position_id=position_id, login=login, symbol=rng.choice(["EURUSD.p", "GBPUSD.p"]),
+            action=rng.choice([0, 1]), volume=rng.choice([100, 1000, 10000]), contract_size=100000,
+            price_open=rng.uniform(1.0, 1.3),
+        )
+        positions[(login, position_id)] = pos
+        book.upsert(pos)
+
+    prices = {"EURUSD.p": (1.0850, 1.0852), "GBPUSD.p": (1.2650, 1.2653)}
+    for login in (1, 2, 3):
+        expected = {}
+        for pos in (pos for pos in positions.values() if pos.login == login):
+            bid, ask = prices[pos.symbol]
+            units = position_units(pos)
+            # the per-position revaluation: buys close at bid, sells at ask
+            pnl = (bid - pos.price_open) * units if pos.action == 0 else (pos.price_open - ask) * units
+            expected[pos.symbol] = expected.get(pos.symbol, 0.0) + pnl
+        symbols = book.symbols(login)
+        assert symbols.keys() == expected.keys()
+        for symbol, exposure in symbols.items():
+            assert exposure.pnl(*prices[symbol]) == pytest.approx(expected[symbol], abs=1e-6)
+
+
+#===============================================================================================
+# SHARDING
+#===============================================================================================
+def test_assign_all_reads_every_partition_without_joining_a_group():
+    from confluent_kafka import OFFSET_BEGINNING
+    from sub_manager.InMemorySharding import assign_all
+
+    class Consumer:
+        assigned = None
+
+        def list_topics(self, timeout=None):
+            return SimpleNamespace(topics={
+                "market.ticks": SimpleNamespace(error=None, partitions={2: None, 0: None, 1: None}),
+            })
+
+        def assign(self, partitions):
+            self.assigned = partitions
+
+        def subscribe(self, *args, **kwargs):
+            raise AssertionError("subscribe() joins the consumer group")
+
+    consumer = Consumer()
+    assign_all(consumer, ["market.ticks", "symbols.spec"], OFFSET_BEGINNING)
+    assert [(tp.topic, tp.partition, tp.offset) for tp in consumer.assigned] == \
+        [("market.ticks", partition, OFFSET_BEGINNING) for partition in (0, 1, 2)]
@@ -60,6 +60,18 @@ def transform_tick(symbol, tick:MT5Manager.MTTickShort):
     )
     return data
 
+def transform_symbol(symbol:MT5Manager.MTConSymbol):
+    data = SymbolSpecData(
+        symbol=symbol.Symbol, digits=symbol.Digits, contract_size=float(symbol.ContractSize),
+        tick_size=float(symbol.TickSize), tick_value=float(symbol.TickValue),
+        currency_base=symbol.CurrencyBase, currency_profit=symbol.CurrencyProfit, currency_margin=symbol.CurrencyMargin,
+        calc_mode=int(symbol.CalcMode), margin_initial=float(symbol.MarginInitial), margin_maintenance=float(symbol.MarginMaintenance),
+        # Older servers have no per-symbol margin rates
+        margin_rate_initial=float(getattr(symbol, "MarginRateInitial", 1.0)),
+        margin_rate_maintenance=float(getattr(symbol, "MarginRateMaintenance", 1.0)),
+    )
+    return data
+
 def transform_propfirmchallenge(ch:PropFirmChallenge):
     data = PropFirmChallengeData(
         name=ch.name, firm_name=ch.firm_name, description=ch.description, challenge_type=ch.challenge_type,
@@ -0,0 +1,152 @@
+"""
+Wire format of the bridge -> rule engine topics.
+
+JSON (the default, readable with any console consumer) carries no header. The binary
+format puts "<schema>/<version>" in the "schema" header:
+
+  tick/1       fixed struct: datetime, bid, ask, last, volume, datetime_msc, volume_ext, then the symbol (utf-8)
+  position/1   msgpack array of the field values in the order listed below
+  deal/1       (same)
+  account/1    (same)
+
+The rule engine decodes positions and deals straight into the trimmed, slotted
+PositionRecord / DealRecord: only the fields those records have are picked from the
+JSON object or the msgpack array.
+
+A version's field list is frozen: a field added to a dataclass is not sent until a
+new version lists it. Decoders keep every version, so producers and consumers can be
+upgraded in any order. Decimals, datetimes and UUIDs are sent the way the JSON path
+sends them (float, isoformat, str), both formats decode to the same record.
+"""
+import json, struct, uuid
+from dataclasses import asdict, fields
+from datetime import datetime
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+try:
+    import msgpack
+except ImportError:  # Optional, records fall back to JSON without it (ticks do not need it)
+    msgpack = None
+
+from sub_manager.InMemoryData import AccountData, DealData, DealRecord, PositionData, PositionRecord, TickData
+
+FORMATS = ("json", "binary")
+HEADER = "schema"
+
+TICK_V1 = struct.Struct("<qdddqqq")
+
+FIELDS: Dict[Tuple[str, int], Tuple[str, ...]] = {
+    ("position", 1): (
+        'position_id', 'login', 'symbol', 'comment', 'price_open', 'price_current', 'price_sl', 'price_tp',
+        'price_gateway', 'volume', 'volume_ext', 'volume_gateway_ext', 'profit', 'storage', 'contract_size',
+        'rate_margin', 'rate_profit', 'expert_id', 'expert_position_id', 'dealer', 'external_id', 'time_create',
+        'time_update', 'action', 'reason', 'digits', 'digits_currency', 'obsolete_value', 'activation_flags',
+        'activation_mode', 'activation_price', 'activation_time', 'closed', 'created_at', 'updated_at',
+    ),
+    ("deal", 1): (
+        'deal', 'login', 'order', 'external_id', 'dealer', 'action', 'entry', 'symbol', 'comment', 'reason',
+        'action_gateway', 'gateway', 'price', 'price_sl', 'price_tp', 'price_position', 'price_gateway',
+        'market_bid', 'market_ask', 'market_last', 'volume', 'volume_ext', 'volume_closed', 'volume_closed_ext',
+        'volume_gateway_ext', 'profit', 'profit_raw', 'value', 'storage', 'commission', 'fee', 'contract_size',
+        'tick_value', 'tick_size', 'rate_profit', 'rate_margin', 'digits', 'digits_currency', 'expert_id',
+        'position_id', 'flags', 'modification_flags', 'deleted', 'time', 'time_msc', 'created_at', 'updated_at',
+    ),
+    ("account", 1): (
+        'login', 'currency_digits', 'balance', 'credit', 'margin', 'prev_margin', 'margin_free', 'prev_margin_free',
+        'margin_level', 'margin_leverage', 'margin_initial', 'margin_maintenance', 'profit', 'storage', 'commission',
+        'floating', 'equity', 'prev_equity', 'so_activation', 'so_time', 'so_level', 'so_equity', 'so_margin',
+        'blocked_commission', 'blocked_profit', 'assets', 'liabilities', 'active', 'step', 'created_at', 'updated_at',
+    ),
+}
+
+# Schema and version each record type is written with
+SCHEMAS: Dict[type, Tuple[str, int]] = {
+    TickData: ("tick", 1),
+    PositionData: ("position", 1),
+    DealData: ("deal", 1),
+    AccountData: ("account", 1),
+}
+
+_headers = {cls: [(HEADER, f"{name}/{version}".encode())] for cls, (name, version) in SCHEMAS.items()}
+_getters = {key: attrgetter(*names) for key, names in FIELDS.items()}
+# (schema version, record type) -> builds the record from the decoded value array
+_builders: Dict[Tuple[Tuple[str, int], type], Callable] = {}
+# Record types holding a subset of a schema's fields, JSON objects are trimmed to them
+TRIMMED = (PositionRecord, DealRecord)
+
+
+def _plain(obj):
+    """Same conversions as EnhancedJSONEncoder"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Cannot encode {type(obj).__name__}")
+
+
+def binary_available() -> bool:
+    return msgpack is not None
+
+
+def encode(record, fmt: str = "json") -> Tuple[bytes, Optional[List[Tuple[str, bytes]]]]:
+    """(value, headers) of a bridge record, headers are None for JSON"""
+    if fmt == "binary":
+        if type(record) is TickData:
+            return TICK_V1.pack(
+                record.datetime, record.bid, record.ask, record.last, record.volume,
+                record.datetime_msc, record.volume_ext,
+            ) + record.symbol.encode("utf-8"), _headers[TickData]
+        if msgpack is not None:
+            schema = SCHEMAS[type(record)]
+            return msgpack.packb(_getters[schema](record), default=_plain, use_bin_type=True), _headers[type(record)]
+    return json.dumps(asdict(record), default=_plain).encode("utf-8"), None
+
+
+def decode(msg, cls: Type):
+    """Record of a consumed message, whichever format it was written in"""
+    return decode_value(msg.value(), msg.headers(), cls)
+
+
+def decode_value(value: bytes, headers: Optional[List[Tuple[str, bytes]]], cls: Type):
+    schema = None
+    if headers:
+        for key, header in headers:
+            if key == HEADER:
+                schema = header
+                break
+    if schema is None:
+        data = json.loads(value.decode("utf-8"))
+        if cls in TRIMMED:
+            return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+        return cls(**data)
+
+    name, version = schema.decode().split("/")
+    key = (name, int(version))
+    if key == ("tick", 1):
+        dt, bid, ask, last, volume, msc, volume_ext = TICK_V1.unpack_from(value)
+        return TickData(value[TICK_V1.size:].decode("utf-8"), dt, bid, ask, last, volume, msc, volume_ext)
+    if key not in FIELDS or msgpack is None:
+        raise ValueError(f"Cannot decode {schema!r} messages" + ("" if msgpack else ", msgpack is not installed"))
+    values = msgpack.unpackb(value, raw=False, use_list=False)
+    builder = _builders.get((key, cls))
+    if builder is None:
+        builder = _builders[(key, cls)] = _builder(key, cls)
+    return builder(values)
+
+
+def _builder(key: Tuple[str, int], cls: Type) -> Callable:
+    names = FIELDS[key]
+    wanted = [f.name for f in fields(cls)]
+    if tuple(wanted) == names:
+        return lambda values: cls(*values)
+    if all(name in names for name in wanted):
+        # Trimmed record (or reordered fields): pick its fields by position
+        pick = itemgetter(*[names.index(name) for name in wanted])
+        return lambda values: cls(*pick(values))
+    # An older version without some of the record's fields: those keep their defaults
+    index = [(name, names.index(name)) for name in wanted if name in names]
+    return lambda values: cls(**{name: values[i] for name, i in index})
@@ -0,0 +1,128 @@
+from django.core.management.base import BaseCommand
+from decimal import Decimal
+import logging, random, time
+
+
+SYMBOLS = {
+    "EURUSD.p": 1.0850, "GBPUSD.p": 1.2650, "AUDUSD.p": 0.6550, "NZDUSD.p": 0.6050,
+    "USDJPY.p": 151.20, "XAUUSD.p": 2350.0,
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark OnTick with and without the breach-price index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=10000)
+        parser.add_argument("--multi", type=float, default=0.2, help="Share of accounts trading several symbols")
+        parser.add_argument("--ticks", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        from sub_manager.InMemoryPropMonitoring import InMemoryPropMonitoring
+
+        logging.getLogger("monitoring").setLevel(logging.WARNING)
+
+        results = {}
+        for label, breach_index in (("per-tick", False), ("breach index", True)):
+            monitor = InMemoryPropMonitoring(breach_index=breach_index)
+            # Redis and the channel layer are out of scope here
+            monitor.should_broadcast = monitor.should_update_leaderboard = lambda login: False
+            self._populate(monitor, options)
+            results[label] = self._run_ticks(monitor, options)
+
+        for label, (elapsed, evaluated, parked, _) in results.items():
+            self.stdout.write(
+                f"{label:>13}: {elapsed * 1000 / options['ticks']:8.3f} ms/tick  "
+                f"{evaluated / options['ticks']:10.1f} accounts evaluated/tick  ({parked} parked)"
+            )
+        speedup = results["per-tick"][0] / results["breach index"][0]
+        self.stdout.write(self.style.SUCCESS(f"Breach index speedup: {speedup:.1f}x"))
+
+        mismatches = [
+            login for login, state in results["per-tick"][3].items()
+            if state != results["breach index"][3].get(login)
+        ]
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"{len(mismatches)} accounts differ, e.g. {mismatches[:5]}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Equity highs and failed accounts match"))
+
+    def _populate(self, monitor, options):
+        from sub_manager.InMemoryData import AccountData, PositionRecord, PropFirmChallengeData, TickData
+
+        rng = random.Random(options["seed"])
+        symbols = list(SYMBOLS)
+        for symbol, price in SYMBOLS.items():
+            tick = TickData(symbol=symbol, datetime=0, bid=price, ask=price * 1.0001, last=price,
+                            volume=0, datetime_msc=0, volume_ext=0)
+            monitor.symbol[symbol] = tick
+            monitor.converter.update_from_tick(symbol, tick.bid, tick.ask)
+
+        challenge = PropFirmChallengeData(
+            name="bench", firm_name="bench", description="", challenge_type="two_step",
+            account_size=100000, challenge_fee=1, max_daily_loss_percent=5, max_total_loss_percent=10,
+            profit_target_percent=8, phase_2_profit_target_percent=5,
+        )
+        position_id = 0
+        for login in range(1, options["accounts"] + 1):
+            monitor.local_accounts[login] = AccountData(
+                login=login, balance=Decimal("100000"), equity=Decimal("100000"), margin_leverage=100, step=1
+            )
+
+            multi = rng.random() < options["multi"]
+            symbol, action = rng.choice(symbols), rng.choice([0, 1])
+            for _ in range(rng.randint(1, 3)):
+                if multi:
+                    symbol, action = rng.choice(symbols), rng.choice([0, 1])
+                position_id += 1
+                monitor.add_position(PositionRecord(
+                    position_id=position_id, login=login, symbol=symbol,
+                    price_open=SYMBOLS[symbol] * rng.uniform(0.999, 1.001),
+                    volume=rng.choice([100, 500, 1000]),
+                    contract_size=100 if symbol.startswith("XAU") else 100000,
+                    action=action,
+                ))
+            # Mapped after the positions so the trade rules (and their Celery calls) stay out of it
+            monitor.account_challenge[login] = challenge
+            monitor._compile_rule_plan(login)
+
+    def _run_ticks(self, monitor, options):
+        from sub_manager.InMemoryData import TickData
+
+        rng = random.Random(options["seed"] + 1)
+        prices = dict(SYMBOLS)
+        symbols = list(SYMBOLS)
+
+        evaluated = 0
+        evaluate = monitor._evaluate_account
+
+        def counted(acc):
+            nonlocal evaluated
+            evaluated += 1
+            evaluate(acc)
+        monitor._evaluate_account = counted
+
+        started = time.perf_counter()
+        for _ in range(options["ticks"]):
+            symbol = rng.choice(symbols)
+            prices[symbol] *= 1 + rng.uniform(-0.0002, 0.0002)
+            bid = prices[symbol]
+            monitor.OnTick(symbol, TickData(symbol=symbol, datetime=0, bid=bid, ask=bid * 1.0001, last=bid,
+                                            volume=0, datetime_msc=0, volume_ext=0))
+        elapsed = time.perf_counter() - started
+        parked = len(monitor.breach_index) if monitor.breach_index is not None else 0
+
+        state = {}
+        for login in range(1, options["accounts"] + 1):
+            dd = monitor.daily_drawdowns.get(login, {}).get(monitor.today)
+            td = monitor.total_drawdown.get(login)
+            watermark = monitor.account_watermarks.get(login)
+            # Lows are only sampled when a parked account is evaluated, they are not compared
+            state[login] = (
+                login in monitor.local_accounts,
+                round(float(dd.equity_high), 6) if dd else None,
+                round(float(td.equity_peak), 6) if td else None,
+                round(float(watermark.hwm_equity), 6) if watermark else None,
+            )
+        return elapsed, evaluated, parked, state
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+import gc, random, tracemalloc
+
+
+class Command(BaseCommand):
+    help = "Memory per in-memory position and deal: full wire dataclasses vs the engine's slotted records"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=50000)
+        parser.add_argument("--format", choices=("json", "binary"), default="binary", help="Wire format decoded from")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        from sub_manager import wire
+        from sub_manager.InMemoryData import DealData, DealRecord, PositionData, PositionRecord
+
+        n = options["records"]
+        messages = self._messages(n, options["format"], options["seed"])
+        for label, full, trimmed in (("position", PositionData, PositionRecord), ("deal", DealData, DealRecord)):
+            before = self._bytes_per_record(messages[full], full, wire)
+            after = self._bytes_per_record(messages[full], trimmed, wire)
+            self.stdout.write(
+                f"{label:>9}: {full.__name__} {before:6.0f} bytes -> {trimmed.__name__} {after:6.0f} bytes "
+                f"({before / after:.1f}x smaller, {(before - after) * n / 2 ** 20:.1f} MB saved per {n})"
+            )
+
+    def _bytes_per_record(self, encoded, cls, wire) -> float:
+        """Bytes allocated and still held per decoded record, field values included"""
+        gc.collect()
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        records = [wire.decode_value(value, headers, cls) for value, headers in encoded]
+        held = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+        # The list holding them is not part of a record
+        return (held - len(records) * 8) / len(records)
+
+    def _messages(self, n: int, fmt: str, seed: int):
+        from sub_manager import wire
+        from sub_manager.InMemoryData import DealData, PositionData
+
+        rng = random.Random(seed)
+        positions, deals = [], []
+        for i in range(n):
+            login, price = 40000 + i % 5000, rng.uniform(1.0, 2400.0)
+            positions.append(wire.encode(PositionData(
+                position_id=1000000 + i, login=login, symbol=rng.choice(["EURUSD.p", "XAUUSD.p", "GBPUSD.p"]),
+                comment="", price_open=price, price_current=price * 1.0005, price_sl=price * 0.99, price_tp=price * 1.02,
+                volume=rng.choice([100, 1000, 10000]), volume_ext=10000000, profit=rng.uniform(-500, 500),
+                contract_size=100000.0, rate_margin=1.0, rate_profit=1.0, external_id="",
+                time_create=1760000000 + i, time_update=1760000100 + i, action=rng.choice([0, 1]), digits=5, digits_currency=2,
+            ), fmt))
+            deals.append(wire.encode(DealData(
+                deal=5000000 + i, login=login, order=7000000 + i, external_id="", dealer=0, action=rng.choice([0, 1]),
+                entry=0, symbol="EURUSD.p", comment="", reason=0, price=price, price_position=price,
+                market_bid=price, market_ask=price * 1.0001, volume=rng.choice([100, 1000, 10000]), volume_ext=10000000.0,
+                profit=rng.uniform(-500, 500), value=price * 100000, commission=-3.5, contract_size=100000.0,
+                tick_value=1.0, tick_size=0.00001, rate_profit=1.0, rate_margin=1.0, digits=5, digits_currency=2,
+                position_id=1000000 + i, time=1760000000 + i, time_msc=1760000000000 + i,
+            ), fmt))
+        return {PositionData: positions, DealData: deals}
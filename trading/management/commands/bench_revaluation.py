@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand
+from decimal import Decimal
+import logging, random, time
+
+
+SYMBOLS = {
+    "EURUSD.p": 1.0850, "GBPUSD.p": 1.2650, "AUDUSD.p": 0.6550, "NZDUSD.p": 0.6050,
+    "USDJPY.p": 151.20, "USDCHF.p": 0.8850, "USDCAD.p": 1.3550, "XAUUSD.p": 2350.0,
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark exposure-aggregate vs columnar (numpy) revaluation of open positions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=10000)
+        parser.add_argument("--positions", type=int, default=5, help="Open positions per account")
+        parser.add_argument("--ticks", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        from sub_manager.InMemoryPropMonitoring import InMemoryPropMonitoring
+        from sub_manager.InMemoryRevaluation import columnar_available
+
+        # add_position logs every position, keep the benchmark output readable
+        logging.getLogger("monitoring").setLevel(logging.WARNING)
+
+        if not columnar_available():
+            self.stdout.write(self.style.ERROR("numpy is not installed, columnar backend unavailable"))
+            return
+
+        results = {}
+        for label, columnar in (("exposure", False), ("columnar", True)):
+            monitor = InMemoryPropMonitoring(columnar=columnar)
+            self._populate(monitor, options)
+            results[label] = self._run_ticks(monitor, options)
+
+        for label, (elapsed, ticks, revalued, equity) in results.items():
+            self.stdout.write(
+                f"{label:>13}: {elapsed * 1000 / ticks:8.3f} ms/tick  "
+                f"{revalued / elapsed:12.0f} accounts/s  (sum equity {equity:.2f})"
+            )
+        speedup = results["exposure"][0] / results["columnar"][0]
+        self.stdout.write(self.style.SUCCESS(f"Columnar speedup: {speedup:.1f}x"))
+
+    def _populate(self, monitor, options):
+        from sub_manager.InMemoryData import AccountData, PositionRecord, TickData
+
+        rng = random.Random(options["seed"])
+        symbols = list(SYMBOLS)
+        for symbol, price in SYMBOLS.items():
+            tick = TickData(symbol=symbol, datetime=0, bid=price, ask=price * 1.0001, last=price,
+                            volume=0, datetime_msc=0, volume_ext=0)
+            monitor.symbol[symbol] = tick
+            monitor.converter.update_from_tick(symbol, tick.bid, tick.ask)
+
+        position_id = 0
+        for login in range(1, options["accounts"] + 1):
+            monitor.local_accounts[login] = AccountData(login=login, balance=Decimal("100000"), margin_leverage=100)
+            for _ in range(options["positions"]):
+                position_id += 1
+                symbol = rng.choice(symbols)
+                monitor.add_position(PositionRecord(
+                    position_id=position_id, login=login, symbol=symbol,
+                    price_open=SYMBOLS[symbol] * rng.uniform(0.995, 1.005),
+                    volume=rng.choice([100, 500, 1000, 10000]),
+                    contract_size=100 if symbol.startswith("XAU") else 100000,
+                    action=rng.choice([0, 1]),
+                ))
+
+    def _run_ticks(self, monitor, options):
+        from sub_manager.InMemoryData import TickData
+
+        rng = random.Random(options["seed"] + 1)
+        prices = dict(SYMBOLS)
+        symbols = list(SYMBOLS)
+        revalued = 0
+
+        started = time.perf_counter()
+        for _ in range(options["ticks"]):
+            symbol = rng.choice(symbols)
+            prices[symbol] *= 1 + rng.uniform(-0.0005, 0.0005)
+            bid = prices[symbol]
+            tick = TickData(symbol=symbol, datetime=0, bid=bid, ask=bid * 1.0001, last=bid,
+                            volume=0, datetime_msc=0, volume_ext=0)
+
+            # Revaluation part of OnTick (rules, Redis and broadcasts are left out)
+            monitor.symbol[symbol] = tick
+            monitor.converter.update_from_tick(symbol, tick.bid, tick.ask)
+            if monitor.revaluation:
+                monitor._reprice_symbol(symbol, tick)
+            for login in monitor.symbol_index.logins(symbol):
+                monitor.update_account_equity(login)
+                revalued += 1
+        elapsed = time.perf_counter() - started
+
+        equity = sum(float(acc.equity) for acc in monitor.local_accounts.values())
+        return elapsed, options["ticks"], revalued, equity
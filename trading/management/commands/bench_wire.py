@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+import json, time
+from dataclasses import asdict
+
+
+class Command(BaseCommand):
+    help = "Benchmark JSON vs binary (msgpack / struct) encoding of the bridge's Kafka records"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=100000, help="Encodes and decodes per record type")
+
+    def handle(self, *args, **options):
+        from sub_manager import wire
+        from sub_manager.transformer import EnhancedJSONEncoder
+
+        if not wire.binary_available():
+            self.stdout.write(self.style.WARNING("msgpack is not installed, only ticks have a binary encoding"))
+
+        n = options["records"]
+        mismatches = []
+        for record in self._samples():
+            cls = type(record)
+
+            def json_encode():
+                return json.dumps(asdict(record), cls=EnhancedJSONEncoder).encode("utf-8")
+
+            def binary_encode():
+                return wire.encode(record, "binary")
+
+            json_value = json_encode()
+            binary_value, headers = binary_encode()
+
+            def json_decode():
+                return cls(**json.loads(json_value.decode("utf-8")))
+
+            def binary_decode():
+                return wire.decode_value(binary_value, headers, cls)
+
+            if json_decode() != binary_decode():
+                mismatches.append(cls.__name__)
+
+            rates = [self._rate(fn, n) for fn in (json_encode, binary_encode, json_decode, binary_decode)]
+            self.stdout.write(
+                f"{cls.__name__:>12}: encode {rates[0]:10.0f} -> {rates[1]:10.0f} msg/s ({rates[1] / rates[0]:4.1f}x)  "
+                f"decode {rates[2]:10.0f} -> {rates[3]:10.0f} msg/s ({rates[3] / rates[2]:4.1f}x)  "
+                f"size {len(json_value):5d} -> {len(binary_value):4d} bytes"
+            )
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"Binary and JSON decode differ for {', '.join(mismatches)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Binary and JSON decode to the same records"))
+
+    def _rate(self, fn, n: int) -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return n / (time.perf_counter() - started)
+
+    def _samples(self):
+        from decimal import Decimal
+        from sub_manager.InMemoryData import AccountData, DealData, PositionData, TickData
+
+        return [
+            TickData(symbol="EURUSD.p", datetime=1760000000, bid=1.08512, ask=1.08519, last=0.0,
+                     volume=0, datetime_msc=1760000000123, volume_ext=0),
+            PositionData(position_id=48213377, login=40123, symbol="XAUUSD.p", comment="", price_open=2351.37,
+                         price_current=2352.08, price_sl=2340.0, price_tp=2370.0, volume=10000, volume_ext=100000000,
+                         profit=71.0, contract_size=100.0, rate_margin=1.0, rate_profit=1.0, external_id="",
+                         time_create=1760000000, time_update=1760000456, action=0, reason=0, digits=2, digits_currency=2),
+            DealData(deal=99182736, login=40123, order=55123987, external_id="", dealer=0, action="0", entry="0",
+                     symbol="XAUUSD.p", comment="", reason="0", price=2351.37, price_position=2351.37,
+                     market_bid=2351.30, market_ask=2351.44, volume=10000, volume_ext=100000000.0, profit=0.0,
+                     value=235137.0, commission=-3.5, contract_size=100.0, tick_value=1.0, tick_size=0.01,
+                     rate_profit=1.0, rate_margin=1.0, digits=2, digits_currency=2, position_id=48213377,
+                     time=1760000000, time_msc=1760000000123),
+            AccountData(login=40123, currency_digits=2, balance=100000.0, credit=0.0, margin=2351.37,
+                        margin_free=97719.63, margin_level=4252.6, margin_leverage=100, profit=71.0,
+                        equity=100071.0, so_level=Decimal("0"), step=1),
+        ]
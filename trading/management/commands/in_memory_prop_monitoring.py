@@ -4,13 +4,19 @@ from stanum_web.tasks import *
 class Command(BaseCommand):
     help = "Run in-memory prop monitoring service"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--evaluators",
+            help="Comma separated evaluators to run (challenge, competition, rating), defaults to MONITOR_EVALUATORS",
+        )
+
     def handle(self, *args, **options):
         # === Your old script logic here ===
         self.stdout.write(self.style.SUCCESS("Starting InMemoryPropMonitoring..."))
 
         # Example: if you had a class
         from sub_manager.InMemoryPropMonitoring import InMemoryPropMonitoring
-        monitor = InMemoryPropMonitoring()
+        monitor = InMemoryPropMonitoring(evaluators=options["evaluators"])
         monitor.run()   # or whatever entry method you had
 
         self.stdout.write(self.style.SUCCESS("InMemoryPropMonitoring finished."))
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import logging
+
+
+class Command(BaseCommand):
+    help = "Replay recorded topic dumps or a synthetic scenario through the monitoring engine and report throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dump", nargs="+", help="JSONL topic dumps (market.ticks.jsonl, accounts.position.jsonl, ...)")
+        parser.add_argument("--accounts", type=int, default=5000, help="Synthetic: challenge accounts")
+        parser.add_argument("--positions", type=int, default=3, help="Synthetic: open positions per account")
+        parser.add_argument("--symbols", type=int, default=8, help="Synthetic: symbols traded")
+        parser.add_argument("--ticks", type=int, default=20000, help="Synthetic: ticks after the accounts are loaded")
+        parser.add_argument("--tick-rate", type=float, default=1000.0, help="Synthetic: ticks per second")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--window", type=float, default=settings.MONITOR_CONSUME_WAIT,
+                            help="Seconds of messages per batch, the live consume wait")
+        parser.add_argument("--batch-size", type=int, default=settings.MONITOR_CONSUME_BATCH_SIZE)
+        parser.add_argument("--evaluators", help="Evaluators to run, defaults to MONITOR_EVALUATORS")
+        parser.add_argument("--columnar", action="store_true", help="Columnar (numpy) revaluation")
+        parser.add_argument("--breach-index", action="store_true", help="Park single-symbol accounts in the breach index")
+        parser.add_argument("--fail-under", type=float, help="Exit with an error below this many events/s")
+        parser.add_argument("--max-p99", type=float, help="Exit with an error above this p99 OnTick latency (ms)")
+
+    def handle(self, *args, **options):
+        from sub_manager.InMemoryPropMonitoring import InMemoryPropMonitoring
+        from sub_manager.InMemoryReplay import load_dumps, replay, synthetic_scenario
+
+        # Every message is logged at INFO, keep the report readable
+        logging.getLogger("monitoring").setLevel(logging.WARNING)
+
+        if options["dump"]:
+            messages = load_dumps(options["dump"])
+        else:
+            messages = synthetic_scenario(
+                options["accounts"], options["positions"], options["ticks"], options["tick_rate"],
+                symbols=options["symbols"], seed=options["seed"],
+            )
+        monitor = InMemoryPropMonitoring(
+            columnar=options["columnar"], breach_index=options["breach_index"], evaluators=options["evaluators"],
+        )
+        report = replay(monitor, messages, options["window"], options["batch_size"])
+
+        rss = report["peak_rss_mb"]
+        self.stdout.write(
+            f"{report['messages']} messages ({report['ticks']} ticks) in {report['batches']} batches, "
+            f"{report['elapsed_s']:.2f}s\n"
+            f"  events/s: {report['events_per_s']:12.0f}   ticks/s: {report['ticks_per_s']:10.0f}\n"
+            f"  OnTick:   {report['on_tick_calls']} calls  p50 {report['on_tick_p50_ms']:.3f} ms  "
+            f"p99 {report['on_tick_p99_ms']:.3f} ms  max {report['on_tick_max_ms']:.3f} ms\n"
+            f"  peak RSS: {'n/a' if rss is None else f'{rss:.1f} MB'}   accounts left: {report['accounts']}\n"
+            f"  outbound: {report['outbound'] or 'none'}"
+        )
+
+        failures = []
+        if options["fail_under"] is not None and report["events_per_s"] < options["fail_under"]:
+            failures.append(f"{report['events_per_s']:.0f} events/s is under {options['fail_under']:.0f}")
+        if options["max_p99"] is not None and report["on_tick_p99_ms"] > options["max_p99"]:
+            failures.append(f"p99 OnTick {report['on_tick_p99_ms']:.3f} ms is over {options['max_p99']:.3f} ms")
+        if failures:
+            raise CommandError("Performance regression: " + "; ".join(failures))
+        self.stdout.write(self.style.SUCCESS("Replay finished"))
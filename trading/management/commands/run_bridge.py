@@ -22,6 +22,10 @@ class Command(BaseCommand):
             user_group=settings.METATRADER_USERGROUP,
         )
 
+        # Prometheus /metrics (off unless BRIDGE_METRICS_PORT is set)
+        from sub_manager import telemetry
+        telemetry.start(settings.BRIDGE_METRICS_PORT)
+
         # --- APScheduler setup ---
         scheduler = BackgroundScheduler(timezone="UTC")
 
@@ -1,3 +1,41 @@
+import logging, os
+
+import pytest
 from django.test import TestCase
 
+from sub_manager.InMemoryReplay import replay, synthetic_scenario
+
 # Create your tests here.
+
+
+#===============================================================================================
+# RULE ENGINE THROUGHPUT (pytest-benchmark, see also the replay_monitor command)
+#===============================================================================================
+# Floors for the synthetic replay below, raise them as the engine gets faster
+REPLAY_MIN_EVENTS_PER_S = float(os.getenv("REPLAY_MIN_EVENTS_PER_S", 1000))
+REPLAY_MAX_P99_MS = float(os.getenv("REPLAY_MAX_P99_MS", 100))
+
+
+@pytest.mark.parametrize("breach_index", [False, True], ids=["full", "breach_index"])
+def test_replay_throughput(benchmark, breach_index):
+    from sub_manager.InMemoryPropMonitoring import InMemoryPropMonitoring
+
+    # Every message is logged at INFO, that would be most of the measured time
+    logging.getLogger("monitoring").setLevel(logging.WARNING)
+    reports = []
+
+    def setup():
+        monitor = InMemoryPropMonitoring(columnar=False, breach_index=breach_index, evaluators="challenge,competition")
+        messages = synthetic_scenario(accounts=500, positions=3, ticks=2000, tick_rate=1000.0)
+        return (monitor, messages), {}
+
+    def run(monitor, messages):
+        reports.append(replay(monitor, messages, window=0.1, batch_size=500))
+
+    benchmark.pedantic(run, setup=setup, rounds=3)
+
+    best = max(reports, key=lambda report: report["events_per_s"])
+    benchmark.extra_info.update({key: best[key] for key in ("events_per_s", "on_tick_p99_ms", "peak_rss_mb")})
+    assert best["accounts"] == 500, "accounts were failed or lost during the replay"
+    assert best["events_per_s"] >= REPLAY_MIN_EVENTS_PER_S, f"{best['events_per_s']:.0f} events/s"
+    assert best["on_tick_p99_ms"] <= REPLAY_MAX_P99_MS, f"p99 OnTick {best['on_tick_p99_ms']:.3f} ms"